@@ -1,34 +1,109 @@
+import collections
 import logging
 import random
 import pickle
-import time
+import uuid
 
 from comnsense_agent.serverstream import ServerStream
-from comnsense_agent.worker import create_new_worker
+from comnsense_agent.pool import WorkerPool, MultiplexedWorkerPool
+from comnsense_agent.pool import ThreadWorkerPool, ForkedWorkerPool
 from comnsense_agent.message import Message
-from comnsense_agent.data import Signal
+from comnsense_agent.data import Event, Signal
 from comnsense_agent.socket import ZMQRouter, ZMQDealer
+from comnsense_agent.worker import Worker
 
 
 logger = logging.getLogger(__name__)
 
 
 class Agent(object):
-    def __init__(self, frontend_bind, server_address, loop):
-        self.frontend, _ = Agent.create_frontend_socket(loop, frontend_bind)
-        self.backend, self.backend_bind = Agent.create_backend_socket(loop)
+    """
+    Agent routes events from addins to workers and answers back.
+
+    :param pool_size:     number of idle workers started in advance,
+                          or number of processes in ``multiplexed`` mode
+    :param ready_timeout: seconds to wait `Signal.Code.Ready`
+                          from assigned worker
+    :param max_pending:   maximum number of events held for one addin
+                          while its worker is not ready
+    :param mode:          one of `Agent.MODES`: ``dedicated`` - process
+                          per workbook, ``multiplexed`` - fixed number
+                          of processes shared by workbooks,
+                          ``threaded`` - thread per workbook in the agent
+                          process connected by ``inproc://`` transport,
+                          ``forked`` - process per workbook forked from
+                          template process with imported modules
+    :param heartbeat_interval: seconds between heartbeats, worker which
+                          missed `Agent.HEARTBEAT_LIVENESS` heartbeats
+                          is restarted and its contexts are restored,
+                          worker stops itself if the agent missed
+                          as many heartbeats, but not earlier than in
+                          `Worker.AGENT_TIMEOUT` seconds
+    :param idle_timeout:  seconds without events after which workbook
+                          context is saved and its runtime is stopped
+    :param max_resident:  maximum number of workbooks with runtimes,
+                          least recently used workbooks are evicted
+    :param zero_copy:     receive frontend and backend messages without
+                          copying, so payloads are forwarded as is
+    """
+
+    READY_TIMEOUT = 10
+    MAX_PENDING = 100
+    HEARTBEAT_INTERVAL = 1
+    HEARTBEAT_LIVENESS = 5
+    IDLE_TIMEOUT = 1800
+    MAX_RESIDENT = 100
+
+    MODES = {
+        "dedicated": WorkerPool,
+        "multiplexed": MultiplexedWorkerPool,
+        "threaded": ThreadWorkerPool,
+        "forked": ForkedWorkerPool,
+    }
+
+    def __init__(self, frontend_bind, server_address, loop,
+                 pool_size=None, ready_timeout=None, max_pending=None,
+                 mode=None, heartbeat_interval=None, idle_timeout=None,
+                 max_resident=None, zero_copy=False):
+        inproc = Agent.MODES[mode or "dedicated"].INPROC
+        self.frontend, _ = Agent.create_frontend_socket(
+            loop, frontend_bind, zero_copy)
+        self.backend, self.backend_bind = Agent.create_backend_socket(
+            loop, inproc, zero_copy)
         self.client, _ = Agent.create_client_socket(loop, server_address)
 
         self.frontend.on_recv(self.frontend_routine)
         self.backend.on_recv(self.backend_routine)
         self.client.on_recv(self.client_routine)
 
-        self.workers = {}
+        self.workers = {}  # addin ident -> worker
+        self.clients = {}  # worker ident -> set of addin idents
+        self.pending = {}  # addin ident -> messages before worker is ready
+        self.ready_timeouts = {}  # worker ident -> timeout handle
+        self.heartbeats = {}  # worker ident -> time of last message
+        self.workbooks = {}  # addin ident -> workbook id
+        self.protocols = {}  # addin ident -> protocol of addin
+        self.activity = collections.OrderedDict()  # addin ident -> time
         self.loop = loop
 
+        self.ready_timeout = ready_timeout or Agent.READY_TIMEOUT
+        self.max_pending = max_pending or Agent.MAX_PENDING
+        self.heartbeat_interval = \
+            heartbeat_interval or Agent.HEARTBEAT_INTERVAL
+        self.idle_timeout = idle_timeout or Agent.IDLE_TIMEOUT
+        self.max_resident = max_resident or Agent.MAX_RESIDENT
+
+        agent_timeout = max(
+            Worker.AGENT_TIMEOUT,
+            self.heartbeat_interval * Agent.HEARTBEAT_LIVENESS)
+        self.pool = Agent.create_worker_pool(
+            mode, self.backend_bind, loop, pool_size,
+            {"agent_timeout": agent_timeout})
+        self.pool.start()
+
     @staticmethod
-    def create_frontend_socket(loop, bind_str):
-        frontend = ZMQRouter()
+    def create_frontend_socket(loop, bind_str, zero_copy=False):
+        frontend = ZMQRouter(copy=not zero_copy)
         frontend.bind(bind_str, loop)
         logger.info("frontend socket bind: %s", bind_str)
         return frontend, bind_str
@@ -40,31 +115,213 @@ class Agent(object):
         return client, address
 
     @staticmethod
-    def create_backend_socket(loop):
-        backend = ZMQRouter()
-        bind_str = backend.bind_unused_port(loop)
+    def create_backend_socket(loop, inproc=False, zero_copy=False):
+        backend = ZMQRouter(copy=not zero_copy)
+        if inproc:
+            bind_str = "inproc://comnsense-backend-%s" % uuid.uuid4().hex
+            backend.bind(bind_str, loop)
+        else:
+            bind_str = backend.bind_unused_port(loop)
         logger.info("backend socket bind: %s", bind_str)
         return backend, bind_str
 
+    @staticmethod
+    def create_worker_pool(mode, connection, loop, size, options=None):
+        pool = Agent.MODES[mode or "dedicated"](
+            connection, loop, size, options=options)
+        logger.info("worker pool: %s, size: %d",
+                    pool.__class__.__name__, pool.size)
+        return pool
+
     def frontend_routine(self, msg):
         if msg.is_event():
             logger.debug("receive from addin: %s", msg)
 
-            if msg.ident not in self.workers or \
-                    not self.workers[msg.ident].is_alive():
-                worker = create_new_worker(msg.ident, self.backend_bind)
-                self.workers[msg.ident] = worker
-                # TODO redo this
-                time.sleep(3)
+            self.touch(msg.ident)
+            worker = self.workers.get(msg.ident)
+            if worker is None or not worker.is_alive():
+                event = self.remember_workbook(msg)
+                worker = self.assign_worker(msg.ident)
+                self.revive_workbook(worker, msg.ident, event)
+                self.reap()
+
+            self.send_to_worker(worker, msg)
+
+    def remember_workbook(self, msg):
+        try:
+            event = msg.get_event()
+            self.workbooks[msg.ident] = event.workbook
+            if event.type == Event.Type.WorkbookOpen:
+                self.protocols[msg.ident] = event.protocol
+            return event
+        except Exception, e:
+            logger.warn("unable to get workbook of ident %s: %s",
+                        msg.ident, e)
+
+    def revive_workbook(self, worker, ident, event):
+        """
+        Sends `Event.Type.WorkbookOpen` with saved protocol of addin
+        to new *worker* of evicted *ident*, before *event* which
+        starts its runtime, as `restart_worker` does. Otherwise the
+        runtime would take protocol from *event*, i.e. JSON.
+        """
+        if event is None or event.type == Event.Type.WorkbookOpen:
+            return
+        if ident not in self.protocols:
+            return
+        logger.info("revive workbook of ident %s", ident)
+        event = Event(Event.Type.WorkbookOpen, event.workbook, None, None,
+                      None, self.protocols[ident])
+        self.send_to_worker(worker, Message.event(event, ident))
+
+    def assign_worker(self, ident):
+        previous = self.workers.get(ident)
+        if previous is not None:
+            self.clients.get(previous.ident, set()).discard(ident)
+            if not self.clients.get(previous.ident):
+                self.clients.pop(previous.ident, None)
+                self.pool.release(previous)
+
+        worker = self.pool.acquire(ident)
+        self.workers[ident] = worker
+        self.clients.setdefault(worker.ident, set()).add(ident)
+        logger.info("worker %s is assigned to ident %s", worker.ident, ident)
 
+        if not worker.ready and worker.ident not in self.ready_timeouts:
+            self.ready_timeouts[worker.ident] = self.loop.call_later(
+                self.ready_timeout, self.on_ready_timeout, worker)
+        return worker
+
+    def send_to_worker(self, worker, msg):
+        msg.route = worker.ident
+        if worker.ready:
             self.backend.send(msg)
+            return
+
+        pending = self.pending.setdefault(msg.ident, collections.deque())
+        if len(pending) >= self.max_pending:
+            logger.warn("worker %s is not ready, %d events are pending, "
+                        "event is dropped", worker.ident, len(pending))
+            return
+        pending.append(msg)
+
+    def flush_pending(self, worker):
+        timeout = self.ready_timeouts.pop(worker.ident, None)
+        if timeout is not None:
+            self.loop.remove_timeout(timeout)
+
+        for ident in self.clients.get(worker.ident, ()):
+            for msg in self.pending.pop(ident, []):
+                self.backend.send(msg)
+
+    def on_ready_timeout(self, worker):
+        self.ready_timeouts.pop(worker.ident, None)
+        if worker.ready:
+            return
+
+        for ident in self.clients.pop(worker.ident, ()):
+            pending = self.pending.pop(ident, [])
+            logger.error("worker %s is not ready in %s seconds, "
+                         "%d events of ident %s are dropped",
+                         worker.ident, self.ready_timeout,
+                         len(pending), ident)
+            if self.workers.get(ident) is worker:
+                del self.workers[ident]
+        self.pool.release(worker)
+
+    def touch(self, ident):
+        self.activity.pop(ident, None)
+        self.activity[ident] = self.loop.time()
+
+    def reap(self):
+        """
+        Evicts workbooks which are idle longer than *idle_timeout*
+        and least recently used workbooks above *max_resident*.
+        """
+        deadline = self.loop.time() - self.idle_timeout
+        for ident, seen in self.activity.items():
+            if seen >= deadline and len(self.activity) <= self.max_resident:
+                break
+            self.evict(ident)
+
+    def evict(self, ident):
+        """
+        Stops runtime of *ident*, worker saves its context before.
+        Next event of *ident* starts new runtime with saved context.
+        """
+        worker = self.workers.get(ident)
+        logger.info("evict ident %s from worker %s", ident,
+                    worker.ident if worker is not None else None)
+        if worker is not None and worker.ready:
+            stop = Message.signal(Signal.stop(), ident)
+            stop.route = worker.ident
+            self.backend.send(stop)
+        self.forget(ident)
+
+    def forget(self, ident):
+        self.activity.pop(ident, None)
+        self.workbooks.pop(ident, None)
+        self.pending.pop(ident, None)
+        worker = self.workers.pop(ident, None)
+        if worker is not None:
+            self.clients.get(worker.ident, set()).discard(ident)
+            if not self.clients.get(worker.ident):
+                self.clients.pop(worker.ident, None)
+
+    def heartbeat(self):
+        now = self.loop.time()
+        deadline = now - self.heartbeat_interval * Agent.HEARTBEAT_LIVENESS
+        for worker in self.pool.workers.values():
+            if not worker.ready:
+                continue
+            seen = self.heartbeats.setdefault(worker.ident, now)
+            if not worker.is_alive() and not self.clients.get(worker.ident):
+                logger.debug("worker %s is stopped", worker.ident)
+                self.heartbeats.pop(worker.ident, None)
+                self.pool.release(worker)
+            elif not worker.is_alive() or seen < deadline:
+                self.restart_worker(worker)
+            else:
+                self.backend.send(
+                    Message.signal(Signal.heartbeat(), worker.ident))
+        self.reap()
+        self.loop.call_later(self.heartbeat_interval, self.heartbeat)
+
+    def restart_worker(self, worker):
+        """
+        Replaces dead or hung *worker*. New worker for each addin ident
+        gets `Event.Type.WorkbookOpen`, so it reloads the last saved
+        context of the workbook, protocol of addin is kept.
+        """
+        idents = self.clients.pop(worker.ident, set())
+        logger.error("worker %s does not respond, restart it for idents: %s",
+                     worker.ident, ", ".join(idents) or "-")
+        self.heartbeats.pop(worker.ident, None)
+        self.pool.release(worker)
+
+        for ident in idents:
+            if self.workers.get(ident) is worker:
+                del self.workers[ident]
+            workbook = self.workbooks.get(ident)
+            if workbook is None:
+                continue
+            event = Event(Event.Type.WorkbookOpen, workbook, None, None,
+                          None, self.protocols.get(ident))
+            self.send_to_worker(self.assign_worker(ident),
+                                Message.event(event, ident))
 
     def backend_routine(self, msg):
-        if msg.is_action():
+        # message from worker is [worker, ident, kind, payload]
+        # or [worker, kind, payload]
+        self.heartbeats[msg.route or msg.ident] = self.loop.time()
+
+        if msg.is_action() or msg.is_actions():
             logger.debug("send to addin: %s", msg)
+            msg.route = Message.NO_ROUTE
             self.frontend.send(msg)
 
         elif msg.is_request():
+            msg.route = Message.NO_ROUTE
             self.client.send(msg)
 
         elif msg.is_log():
@@ -74,19 +331,31 @@ class Agent(object):
             signal = Signal.deserialize(msg.payload)
             if signal.code == Signal.Code.Ready:
                 logger.info("worker with ident %s is ready", msg.ident)
+                worker = self.pool.on_ready(msg.ident)
+                if worker is not None:
+                    self.flush_pending(worker)
+            elif signal.code == Signal.Code.Stop:
+                logger.info("runtime of ident %s is finished", msg.ident)
+                worker = self.workers.get(msg.ident)
+                if worker is not None and worker.ident == msg.route:
+                    # runtime is finished by WorkbookBeforeClose only,
+                    # protocol is kept while workbook is evicted
+                    self.protocols.pop(msg.ident, None)
+                    self.forget(msg.ident)
 
     def client_routine(self, msg):
         if msg.is_response():
+            worker = self.workers.get(msg.ident)
+            if worker is not None:
+                msg.route = worker.ident
             self.backend.send(msg)
 
     def start(self):
+        self.loop.call_later(self.heartbeat_interval, self.heartbeat)
         try:
             self.loop.start()
         finally:
-            for worker in self.workers.values():
-                if worker.is_alive():
-                    worker.kill()
-                    worker.join()
+            self.pool.close()
 
             self.frontend.close()
             self.backend.close()
@@ -0,0 +1,87 @@
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkPolicy(object):
+    """
+    Number of rows of the next range request of column scan.
+
+    Scan starts with *min_rows* to get first results fast, then
+    the chunk grows by *growth* after each response. It is capped
+    by *max_rows* and by *max_payload* bytes of response estimated
+    from size of received rows. If response took longer than
+    *max_latency* seconds, the chunk shrinks by *growth* instead.
+
+    Defaults could be changed for deployment by environment
+    variables ``COMNSENSE_SCAN_<NAME>``, e.g.
+    ``COMNSENSE_SCAN_MAX_ROWS=5000``, workers inherit them.
+    """
+
+    PREFIX = "COMNSENSE_SCAN_"
+    # bytes of cell besides its key and value: field names, format
+    CELL_OVERHEAD = 64
+
+    def __init__(self, min_rows=10, max_rows=1000, growth=2,
+                 max_payload=256 * 1024, max_latency=0.5):
+        self.min_rows = max(1, int(min_rows))
+        self.max_rows = max(self.min_rows, int(max_rows))
+        self.growth = max(1.0, float(growth))
+        self.max_payload = int(max_payload)
+        self.max_latency = float(max_latency)
+
+    @staticmethod
+    def from_environ(environ=None):
+        """
+        Returns policy with defaults overridden by *environ*,
+        default `os.environ`. Invalid values are ignored.
+        """
+        environ = os.environ if environ is None else environ
+        options = {}
+        for name in ("min_rows", "max_rows", "growth",
+                     "max_payload", "max_latency"):
+            value = environ.get(ChunkPolicy.PREFIX + name.upper())
+            if value is None:
+                continue
+            try:
+                options[name] = float(value)
+            except ValueError:
+                logger.warning("%s%s: invalid value: %s",
+                               ChunkPolicy.PREFIX, name.upper(), value)
+        return ChunkPolicy(**options)
+
+    def next(self, chunk, latency=None, row_size=None):
+        """
+        Returns chunk after response for *chunk* rows.
+
+        :param chunk:    rows in the last request
+        :param latency:  seconds from request to response or ``None``
+        :param row_size: mean bytes of received row or ``None``
+        """
+        if latency is not None and latency > self.max_latency:
+            chunk = int(chunk / self.growth)
+        else:
+            chunk = int(math.ceil(chunk * self.growth))
+        if row_size:
+            chunk = min(chunk, self.max_payload // row_size)
+        return max(self.min_rows, min(self.max_rows, chunk))
+
+    def get_row_size(self, cells):
+        """
+        Returns mean bytes of *cells* of one column in response.
+        """
+        if not cells:
+            return None
+        size = sum(len(x.key) + len(x.value or "") for x in cells)
+        return size // len(cells) + self.CELL_OVERHEAD
+
+    def __repr__(self):
+        return "ChunkPolicy {rows:%d..%d, growth:%s, " \
+            "payload:%d, latency:%s}" % (
+                self.min_rows, self.max_rows, self.growth,
+                self.max_payload, self.max_latency)
+
+
+DEFAULT = ChunkPolicy.from_environ()
@@ -4,53 +4,79 @@ from collections import defaultdict
 # TODO: some features, like frequency, require all the rows
 #        therefore this needs to accept the whole table
 
+N_LEVELS = 4
+
+# classes of characters do not intersect and cover all characters,
+# so one pass finds the same runs as separate substitutions
+# for italian maybe include \' to words
+# TODO ask Dmitry about punctuation
+RE_TOKEN = re.compile(r'(?P<w>[^\d\s\.\,\-\_\/]+)|(?P<n>\d+)|'
+                      r'(?P<s>\s+)|(?P<p>[\.\,\-\_\/]+)', re.U)
+SYMBOLS = {"w": "w", "n": "0", "s": " ", "p": "."}
+
+MAX_MEMO = 65536
+
+# memo of two generations: values used since the last rotation are
+# in the recent one, they survive rotation, others are dropped,
+# so it behaves like LRU without reordering on every hit
+_recent = {}
+_older = {}
+
+
+def get_patterns(value):
+    """
+    Returns tuple of patterns of *value* for all `N_LEVELS` levels.
+    Patterns of recently used values are memoized, at most `MAX_MEMO`
+    of them, values of real columns are repeated a lot.
+    """
+    global _recent, _older
+    # str and unicode are equal, but they are stripped differently
+    key = (type(value), value)
+    patterns = _recent.get(key)
+    if patterns is None:
+        patterns = _older.get(key)
+        if patterns is None:
+            patterns = extract_patterns(value)
+        if len(_recent) >= MAX_MEMO / 2:
+            _recent, _older = {}, _recent
+        _recent[key] = patterns
+    return patterns
+
+
+def extract_patterns(value):
+    symbols = [SYMBOLS[x.lastgroup] for x in RE_TOKEN.finditer(value)]
+    words, numbers = symbols.count("w"), symbols.count("0")
+
+    if words and numbers:
+        kind = 'both words and numbers'
+    elif words:
+        kind = 'words, no numbers'
+    elif numbers:
+        kind = 'numbers, no words'
+    else:
+        kind = None
+
+    return ('non-empty' if len(value.strip()) > 0 else 'empty',
+            kind,
+            '%d words %d numbers' % (words, numbers),
+            ''.join(symbols))
+
 
 class ColumnAnalyzer(object):
     ''' extract patterns from a column
     '''
 
-    N_LEVELS = 4
+    N_LEVELS = N_LEVELS
 
     def __init__(self, column, level=0):
-        # for italian maybe include \' to re_words
-        self.re_word = re.compile(r'[^\d\s\.\,\-\_\/]+', re.U)
-        self.re_number = re.compile(r'\d+', re.U)
-        self.re_white = re.compile(r'\s+', re.U)
-        # TODO ask Dmitry about it
-        self.re_punctuation = re.compile(r'[\.\,\-\_\/]+', re.U)
-
         self.patterns_dict = defaultdict(int)
         for value in column:
             pattern = self.get_pattern(value, level)
             self.patterns_dict[pattern] += 1
 
     def get_pattern(self, value, level=0):
-        if level == 0:
-            if len(value.strip()) > 0:
-                return 'non-empty'
-            else:
-                return 'empty'
-        elif level == 1:
-            has_words = len(self.re_word.findall(value)) > 0
-            has_numbers = len(self.re_number.findall(value)) > 0
-            if has_words and has_numbers:
-                return 'both words and numbers'
-            elif has_words:
-                return 'words, no numbers'
-            elif has_numbers:
-                return 'numbers, no words'
-        elif level == 2:
-            value = self.re_word.sub('w', value)
-            value = self.re_number.sub('0', value)
-            return '%d words %d numbers' % (
-                        len(re.findall('w', value)),
-                        len(re.findall('0', value)))
-        elif level == 3:
-            value = self.re_word.sub('w', value)
-            value = self.re_number.sub('0', value)
-            value = self.re_white.sub(' ', value)
-            value = self.re_punctuation.sub('.', value)
-            return value
+        if 0 <= level < N_LEVELS:
+            return get_patterns(value)[level]
 
     def get_rows_with_pattern(self, column, level, pattern):
         checker = (lambda v: self.get_pattern(v, level) == pattern)
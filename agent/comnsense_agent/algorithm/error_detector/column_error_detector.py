@@ -1,12 +1,15 @@
 import copy
 import enum
 import logging
-from collections import namedtuple
+import time
+from collections import Counter, namedtuple
 
 from comnsense_agent.data import Event, Action
 from comnsense_agent.utils.bit_array import BitArray
 
-from .column_analyzer import ColumnAnalyzer
+from . import chunk_policy
+from .column_analyzer import get_patterns
+from .pattern_stats import PatternStats
 
 
 logger = logging.getLogger(__name__)
@@ -15,8 +18,7 @@ logger = logging.getLogger(__name__)
 class ColumnErrorDetector(object):
     BINOM_THRESHOLD = 0.1
     MIN_POINTS_READY = int(1.0 / BINOM_THRESHOLD)
-
-    Stats = namedtuple("Stats", ("points", "stats"))
+    POLICY = chunk_policy.DEFAULT
 
     Interval = namedtuple("Interval", ("begin", "end"))
 
@@ -28,11 +30,46 @@ class ColumnErrorDetector(object):
     def __init__(self, column):
         self.column = column
         self.state = self.State.begin
-        self.stats = self.Stats(0, [])
+        self.stats = PatternStats()
         self.interval = self.Interval(0, 0)
         self.incorrect_cells = BitArray()
+        # rows which values are counted in stats
+        self.counted_cells = BitArray()
         self.incorrect_format = {"color": 3}
         self.correct_format = {"color": 0}
+        # rows of the next range request, see `ChunkPolicy`
+        self.chunk = self.POLICY.min_rows
+        # rows of range which is requested by scan or None
+        self.requested = None
+        self.requested_at = None
+
+    def __getstate__(self):
+        return {"column": self.column,
+                "state": self.state.value,
+                "stats": self.stats.__getstate__(),
+                "interval": list(self.interval),
+                "incorrect_cells": self.incorrect_cells.__getstate__(),
+                "counted_cells": self.counted_cells.__getstate__(),
+                "incorrect_format": self.incorrect_format,
+                "correct_format": self.correct_format,
+                "chunk": self.chunk,
+                "requested": self.requested}
+
+    def __setstate__(self, state):
+        self.column = state["column"]
+        self.state = self.State(state["state"])
+        self.stats = PatternStats.__new__(PatternStats)
+        self.stats.__setstate__(state["stats"])
+        self.interval = self.Interval(*state["interval"])
+        self.incorrect_cells = BitArray()
+        self.incorrect_cells.__setstate__(state["incorrect_cells"])
+        self.counted_cells = BitArray()
+        self.counted_cells.__setstate__(state["counted_cells"])
+        self.incorrect_format = state["incorrect_format"]
+        self.correct_format = state["correct_format"]
+        self.chunk = state.get("chunk", self.POLICY.min_rows)
+        self.requested = state.get("requested")
+        self.requested_at = None
 
     def handle(self, event, context):
         logger.debug("column %s: state: %s",
@@ -53,10 +90,8 @@ class ColumnErrorDetector(object):
 
     def handle_begin(self, event, context):
         cells = event.columns.get(self.column, [])
-        for cell in cells:
-            if cell.value:
-                self.add_value_to_stats(cell.value)
-            self.update_interval(int(cell.row))
+        self.add_cells_to_stats(cells)
+        self.update_interval_many([x.row_index for x in cells])
         self.state = self.State.waiting_response
         return [self.make_action_request(event, context)]
 
@@ -66,6 +101,10 @@ class ColumnErrorDetector(object):
         non_empty_range_end = len(cells)
         answer = []
 
+        if event.type == Event.Type.RangeResponse and \
+                self.is_scan_response(cells):
+            self.adapt_chunk(cells)
+
         try:
             non_empty_range_end = \
                 len(cells) - \
@@ -76,14 +115,14 @@ class ColumnErrorDetector(object):
         if event.type != Event.Type.RangeResponse:
             request_next_range = True
 
-        for cell in cells[:non_empty_range_end]:
-            if cell.value:
-                self.add_value_to_stats(cell.value)
-            self.update_interval(int(cell.row))
+        cells = cells[:non_empty_range_end]
+        self.add_cells_to_stats(cells)
+        self.update_interval_many([x.row_index for x in cells])
 
         if request_next_range:
             answer = [self.make_action_request(event, context)]
         else:
+            self.requested = None
             self.state = self.State.ready
 
         if self.stats.points >= self.MIN_POINTS_READY:
@@ -109,25 +148,32 @@ class ColumnErrorDetector(object):
             prev_cells = [None] * len(cells)
 
         for cell, prev_cell in zip(cells, prev_cells):
+            row = cell.row_index
             prev_value = prev_cell.value if prev_cell else ""
+            # only values of scanned or changed rows are in stats
+            if prev_value and self.counted_cells[row]:
+                self.remove_values_from_stats([prev_value], [row])
+            if cell.value:
+                self.add_values_to_stats([cell.value], [row])
 
-            if cell.value and prev_value and \
-                    self.incorrect_cells[int(cell.row)]:
+            if not cell.value:
+                if self.incorrect_cells[row]:
+                    self.incorrect_cells[row] = False
 
-                self.record_corrected(cell.value, prev_value)
+            # let's check new and overwritten values
+            elif self.check(cell.value) == 0:
+                self.incorrect_cells[row] = True
                 answer_cells.append(
-                    self.apply_format(cell, **self.correct_format))
-                self.incorrect_cells[int(cell.row)] = False
+                    self.apply_format(cell, **self.incorrect_format))
 
-            # let's check just new values
-            elif cell.value and not prev_value:
-                self.add_value_to_stats(cell.value)
-                if self.check(cell.value) == 0:
-                    self.incorrect_cells[int(cell.row)] = True
-                    answer_cells.append(
-                        self.apply_format(cell, **self.incorrect_format))
+            elif self.incorrect_cells[row]:
+                if prev_value:
+                    self.record_corrected(cell.value, prev_value)
+                answer_cells.append(
+                    self.apply_format(cell, **self.correct_format))
+                self.incorrect_cells[row] = False
 
-            self.update_interval(int(cell.row))
+            self.update_interval(row)
 
         if answer_cells:
             return [self.make_action_change(event, answer_cells)]
@@ -136,11 +182,41 @@ class ColumnErrorDetector(object):
 
     def handle_ready_response(self, event, context):
         cells = event.columns.get(self.column, [])
-        for cell in cells:
-            if cell.value and self.interval.end < int(cell.row):
-                self.add_value_to_stats(cell.value)
-            self.update_interval(int(cell.row))
-        return []
+        # only values below already seen rows are new
+        self.add_cells_to_stats(
+            [x for x in cells if self.interval.end < x.row_index])
+        self.update_interval_many([x.row_index for x in cells])
+
+        # scan goes on till the first empty cell
+        if not self.is_scan_response(cells):
+            return []
+        self.adapt_chunk(cells)
+        if not cells or any(not x.value for x in cells):
+            logger.debug("column %s: scan is finished", self.column)
+            self.requested = None
+            return []
+        return [self.make_action_request(event, context)]
+
+    def is_scan_response(self, cells):
+        """
+        True if *cells* of column are response for range requested
+        by scan, not for request of another handler.
+        """
+        return self.requested is not None and \
+            self.requested[0] in [x.row_index for x in cells]
+
+    def adapt_chunk(self, cells):
+        """
+        Changes size of the next request by latency and size
+        of response for the last request.
+        """
+        latency = None
+        if self.requested_at is not None:
+            latency = time.time() - self.requested_at
+        self.chunk = self.POLICY.next(
+            self.chunk, latency, self.POLICY.get_row_size(cells))
+        logger.debug("column %s: latency: %s, next chunk: %d",
+                     self.column, latency, self.chunk)
 
     def update_interval(self, row):
         if self.interval.begin <= row <= self.interval.end:
@@ -150,42 +226,61 @@ class ColumnErrorDetector(object):
         self.interval = self.Interval(min(self.interval.begin, row),
                                       max(self.interval.end, row))
 
+    def update_interval_many(self, rows):
+        if rows:
+            self.update_interval(min(rows))
+            self.update_interval(max(rows))
+
     def add_value_to_stats(self, value):
-        new_stats = self.Stats(self.stats.points + 1, [])
-        stats = []
-        for level in range(ColumnAnalyzer.N_LEVELS):
-            ca = ColumnAnalyzer([value], level=level)
-
-            if len(self.stats.stats) > level:
-                temp = self.stats.stats[level]
-            else:
-                temp = {}
-
-            for pattern, occurances in ca.patterns_dict.items():
-                if pattern in temp:
-                    temp[pattern][0] += occurances
-                else:
-                    # occurances, correct, incorrect
-                    temp[pattern] = [occurances, 0, 0]
-            new_stats.stats.append(temp)
-        self.stats = new_stats
+        self.add_values_to_stats([value])
+
+    def add_values_to_stats(self, values, rows=None):
+        """
+        Adds patterns of all *values* to stats in one step, each
+        distinct value is analyzed once, columns repeat values a lot.
+        *rows* of values are marked as counted.
+        """
+        for value, count in Counter(values).iteritems():
+            for level, pattern in enumerate(get_patterns(value)):
+                self.stats.add(level, pattern, occurrences=count)
+        self.stats.points += len(values)
+        for row in rows or []:
+            self.counted_cells[row] = True
+
+    def add_cells_to_stats(self, cells):
+        """
+        Adds values of *cells* which rows are not counted yet.
+        """
+        counted = {}
+        for cell in cells:
+            if cell.value and not self.counted_cells[cell.row_index]:
+                counted[cell.row_index] = cell.value
+        self.add_values_to_stats(counted.values(), counted.keys())
+
+    def remove_values_from_stats(self, values, rows=None):
+        """
+        Removes patterns of *values* which are not in column anymore,
+        *rows* of values are not counted anymore.
+        """
+        for value, count in Counter(values).iteritems():
+            for level, pattern in enumerate(get_patterns(value)):
+                self.stats.remove(level, pattern, count)
+        self.stats.points = max(0, self.stats.points - len(values))
+        for row in rows or []:
+            self.counted_cells[row] = False
 
     def record_unmarked(self, value):
-        for level in range(ColumnAnalyzer.N_LEVELS):
-            ca = ColumnAnalyzer([], level)
-            pattern = ca.get_pattern(value, level)
-            self.stats.stats[level][pattern][1] += 1  # correct
+        for level, pattern in enumerate(get_patterns(value)):
+            self.stats.add(level, pattern, correct=1)
 
     def record_corrected(self, value, prev_value):
-        for level in range(ColumnAnalyzer.N_LEVELS):
-            ca = ColumnAnalyzer([], level)
-            pattern_was = ca.get_pattern(prev_value, level)
-            self.stats.stats[level][pattern_was][2] += 1  # incorrect
-            pattern_now = ca.get_pattern(value, level)
-            if pattern_now in self.stats.stats[level]:
-                self.stats.stats[level][pattern_now][1] += 1  # correct
+        patterns = zip(get_patterns(prev_value), get_patterns(value))
+        for level, (pattern_was, pattern_now) in enumerate(patterns):
+            self.stats.add(level, pattern_was, incorrect=1)
+            if self.stats.get(level, pattern_now) is not None:
+                self.stats.add(level, pattern_now, correct=1)
             else:  # yet unseen pattern
-                self.stats.stats[level][pattern_now] = [1, 1, 0]  # correct
+                self.stats.add(level, pattern_now, occurrences=1, correct=1)
 
     def check(self, value):
         decision = -1  # by default we do not know
@@ -193,22 +288,17 @@ class ColumnErrorDetector(object):
         # usually one needs the number of data points n >= 10*k,
         # where k is the number of bins (patterns per layer)
         # however, we will always use layers 0 and 1
-        for level in range(ColumnAnalyzer.N_LEVELS):
+        for level, pattern in enumerate(get_patterns(value)):
             if level < 2 or \
-                    self.stats.points >= 10 * len(self.stats.stats[level]):
-                ca = ColumnAnalyzer([], level)
-                pattern = ca.get_pattern(value, level)
-                if pattern not in self.stats.stats[level]:  # new pattern
+                    self.stats.points >= 10 * self.stats.size(level):
+                counts = self.stats.get(level, pattern)
+                if counts is None:  # new pattern
                     # TODO should not ever happen:
                     #      check_old was called for a new value
                     decision = 0
                     continue
-                # occurances of the pattern
-                np = self.stats.stats[level][pattern][0]
-                # correct occurances
-                rp = self.stats.stats[level][pattern][1]
-                # incorrect occurances
-                wp = self.stats.stats[level][pattern][2]
+                # occurances, correct and incorrect occurances of the pattern
+                np, rp, wp = counts
                 if rp > 0 and wp > 0:
                     # can say nothing on this level, need to go further
                     decision = -1
@@ -241,7 +331,9 @@ class ColumnErrorDetector(object):
             begin = self.interval.end + 1
         else:
             begin = min_row
-        end = begin + self.MIN_POINTS_READY - 1
+        end = begin + self.chunk - 1
+        self.requested = [begin, end]
+        self.requested_at = time.time()
         return Action.request_from_event(event, range_name % (begin, end))
 
     def make_action_change(self, event, cells):
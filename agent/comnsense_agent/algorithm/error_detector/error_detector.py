@@ -12,6 +12,17 @@ class ErrorDetector(EventHandler):
     def __init__(self):
         self.columns = {}
 
+    def __getstate__(self):
+        return {"columns": dict((column, detector.__getstate__())
+                                for column, detector
+                                in self.columns.iteritems())}
+
+    def __setstate__(self, state):
+        self.columns = {}
+        for column, content in state["columns"].iteritems():
+            self.columns[column] = ColumnErrorDetector(column)
+            self.columns[column].__setstate__(content)
+
     def handle(self, event, context):
         # waiting header, nothing to do
         if context.lookup(event.sheet).get_header() is None:
@@ -50,18 +61,17 @@ class ErrorDetector(EventHandler):
         cells = []
         prev_cells = []
 
+        header_rows = context.lookup(event.sheet).get_header_rows()
         for cell in event.columns.get(column, []):
             # skip cells from header
-            if cell.row in context.lookup(event.sheet).get_header_rows():
+            if cell.row in header_rows:
                 continue
 
             cells.append([cell])
 
         if event.prev_columns.get(column):
             for cell in cells:
-                prev = [c for c in event.prev_columns.get(column)
-                        if c.key == cell[0].key] or [None]
-                prev_cells.append(prev)
+                prev_cells.append([event.get_prev_cell(cell[0].key)])
 
         if not cells:
             cells.append([])
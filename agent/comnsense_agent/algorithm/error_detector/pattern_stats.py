@@ -0,0 +1,131 @@
+import array
+import logging
+
+from .column_analyzer import N_LEVELS
+
+logger = logging.getLogger(__name__)
+
+
+class PatternStats(object):
+    """
+    Counters of patterns of column values for each level.
+
+    Pattern gets integer id within its level, counters of pattern
+    are kept in one flat array at offset ``3 * id``: occurrences,
+    correct and incorrect. Pattern strings are interned, so columns
+    with the same patterns share them.
+
+    Occurrences are removed when values are overwritten or cleared,
+    pattern without occurrences is not counted by `size`, but its
+    correct and incorrect counters are kept, they are feedback of user.
+
+    :param levels: number of levels
+    :type levels:  int
+    """
+
+    __slots__ = ("points", "_ids", "_patterns", "_counts", "_sizes")
+
+    OCCURRENCES, CORRECT, INCORRECT = range(3)
+
+    def __init__(self, levels=N_LEVELS):
+        self.points = 0
+        self._ids = [{} for _ in xrange(levels)]
+        self._patterns = [[] for _ in xrange(levels)]
+        self._counts = [array.array("l") for _ in xrange(levels)]
+        # number of patterns with occurrences
+        self._sizes = [0] * levels
+
+    @property
+    def levels(self):
+        return len(self._ids)
+
+    def size(self, level):
+        """
+        Returns number of patterns on *level* which occur in column.
+        """
+        return self._sizes[level]
+
+    def get(self, level, pattern):
+        """
+        Returns tuple (occurrences, correct, incorrect) of *pattern*
+        or ``None`` if it was not seen.
+        """
+        index = self._ids[level].get(pattern)
+        if index is None:
+            return None
+        offset = 3 * index
+        return tuple(self._counts[level][offset:offset + 3])
+
+    def add(self, level, pattern, occurrences=0, correct=0, incorrect=0):
+        """
+        Adds numbers to counters of *pattern*, new pattern is
+        started from zeros.
+        """
+        index = self._ids[level].get(pattern)
+        counts = self._counts[level]
+        if index is None:
+            pattern = self.intern(pattern)
+            index = self._ids[level][pattern] = len(self._patterns[level])
+            self._patterns[level].append(pattern)
+            counts.extend((0, 0, 0))
+        offset = 3 * index
+        if counts[offset] == 0 and occurrences > 0:
+            self._sizes[level] += 1
+        counts[offset] += occurrences
+        counts[offset + 1] += correct
+        counts[offset + 2] += incorrect
+
+    def remove(self, level, pattern, occurrences=1):
+        """
+        Subtracts *occurrences* of *pattern*, counter does not
+        become negative, unknown pattern is ignored.
+        """
+        index = self._ids[level].get(pattern)
+        if index is None:
+            return
+        counts = self._counts[level]
+        offset = 3 * index
+        if 0 < counts[offset] <= occurrences:
+            self._sizes[level] -= 1
+        counts[offset] = max(0, counts[offset] - occurrences)
+
+    @staticmethod
+    def intern(pattern):
+        # patterns are ascii, but they are unicode after json
+        if isinstance(pattern, basestring):
+            return intern(str(pattern))
+        return pattern
+
+    def __getstate__(self):
+        return {"points": self.points,
+                "patterns": self._patterns,
+                "counts": [x.tolist() for x in self._counts]}
+
+    def __setstate__(self, state):
+        self.__init__(len(state["patterns"]))
+        self.points = state["points"]
+        for level, patterns in enumerate(state["patterns"]):
+            counts = state["counts"][level]
+            for index, pattern in enumerate(patterns):
+                self.add(level, pattern, *counts[3 * index:3 * index + 3])
+
+    def items(self, level):
+        """
+        Returns dict of counters of patterns on *level*.
+        """
+        return dict((pattern, self.get(level, pattern))
+                    for pattern in self._patterns[level])
+
+    def __eq__(self, other):
+        if not isinstance(other, PatternStats):
+            return False
+        return (self.points, self.levels) == (other.points, other.levels) \
+            and all(self.items(x) == other.items(x)
+                    for x in xrange(self.levels))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "PatternStats {points:%d, patterns:%s}" % (
+            self.points, [len(x) for x in self._patterns])
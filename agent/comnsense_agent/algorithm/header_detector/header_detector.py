@@ -1,9 +1,9 @@
 import logging
-import string
 import enum
 
 from ..event_handler import EventHandler, publicmethod
-from comnsense_agent.data import Event, Action
+from comnsense_agent.data import Cell, Event, Action
+from comnsense_agent.utils import address
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +20,14 @@ class HeaderDetector(EventHandler):
         self._state = HeaderDetector.State.begin
         self._header = []
 
+    def __getstate__(self):
+        return {"state": self._state.value,
+                "header": [x.to_primitive() for x in self._header]}
+
+    def __setstate__(self, state):
+        self._state = HeaderDetector.State(state["state"])
+        self._header = [Cell.from_primitive(x) for x in state["header"]]
+
     def handle(self, event, context):
         if self._state == HeaderDetector.State.begin:
             action = self.handle_begin(event)
@@ -108,21 +116,10 @@ class HeaderDetector(EventHandler):
             return -1
 
     def get_index_from_column(self, column):
-        s = string.ascii_uppercase
-        l = len(s)
-        return sum([(s.index(x) + 1) * (l ** i)
-                    for i, x in enumerate(reversed(column))]) - 1
+        return address.column_index(column) - 1
 
     def get_column_from_index(self, index):
-        s = string.ascii_uppercase
-        l = len(s)
-        if index < l:
-            return s[index]
-        else:
-            result = ""
-            result += s[index / l - 1]
-            result += s[index - (index / l) * l]
-            return result
+        return address.column_name(index + 1)
 
     def get_next_column(self, column, shift=1):
         index = self.get_index_from_column(column)
@@ -34,6 +34,24 @@ class StringFormatter(EventHandler):
     def __init__(self):
         self.start_over()
 
+    def __getstate__(self):
+        transformer = None
+        if self.transformer is not None:
+            transformer = self.transformer.__getstate__()
+        return {"state": self.state,
+                "column": self.prev_edit_column,
+                "row": self.prev_edit_row_index,
+                "transformer": transformer}
+
+    def __setstate__(self, state):
+        self.start_over()
+        self.state = state["state"]
+        self.prev_edit_column = state["column"]
+        self.prev_edit_row_index = state["row"]
+        if state["transformer"] is not None:
+            self.transformer = StringTransformer()
+            self.transformer.__setstate__(state["transformer"])
+
     def start_over(self):
         self.transformer = None
         self.prev_edit_column = None
@@ -86,7 +104,7 @@ class StringFormatter(EventHandler):
             self.transformer.train_by_example(prev_cell.value, cell.value)
 
             self.prev_edit_column = cell.column
-            self.prev_edit_row_index = int(cell.row)
+            self.prev_edit_row_index = cell.row_index
 
             self.state = StringFormatter.State.AwaitingSecondEdit
             return
@@ -97,7 +115,7 @@ class StringFormatter(EventHandler):
                 self.start_over()
                 return
 
-            row_index = int(cell.row)
+            row_index = cell.row_index
             if row_index != self.prev_edit_row_index + 1:
                 self.start_over()
                 return
@@ -141,7 +159,7 @@ class StringFormatter(EventHandler):
             )
 
             # Request a new cell further down
-            row_to_request = int(cell.row) + 1
+            row_to_request = cell.row_index + 1
             range_to_request = "$%s$%s" % (cell.column, row_to_request)
             request_action = Action(
                     Action.Type.RangeRequest,
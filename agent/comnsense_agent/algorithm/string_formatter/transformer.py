@@ -60,6 +60,27 @@ class StringTransformer(object):
         self.transform_from_pairs = None
         self.template_after = None
 
+    def __getstate__(self):
+        pairs = None
+        if self.transform_from_pairs is not None:
+            pairs = [None if x is None else [x[0].__name__, x[1]]
+                     for x in self.transform_from_pairs]
+        return {"groups_before": getattr(self, "groups_before", None),
+                "groups_after": getattr(self, "groups_after", None),
+                "template_after": self.template_after,
+                "transform_from_pairs": pairs}
+
+    def __setstate__(self, state):
+        functions = dict((t.__name__, t) for t in transformations)
+        self.groups_before = state["groups_before"]
+        self.groups_after = state["groups_after"]
+        self.template_after = state["template_after"]
+        self.transform_from_pairs = None
+        if state["transform_from_pairs"] is not None:
+            self.transform_from_pairs = [
+                None if x is None else (functions[x[0]], x[1])
+                for x in state["transform_from_pairs"]]
+
     def train_by_example(self, before, after):
         # Let us identify groups of numeric or alphabetic characters
         groups_before = get_groups(before)
@@ -1,6 +1,7 @@
+import collections
 import logging
 
-from comnsense_agent.data import Event
+from comnsense_agent.data import Action, Event
 from comnsense_agent.message import Message
 from comnsense_agent.multiplexer.first_answer import FirstAnswer
 
@@ -12,11 +13,14 @@ class Ready:
     Context is ready
     """
 
+    # range requests answered by the mirror per one event
+    MAX_LOCAL_RESPONSES = 100
+
     def next(self, context, msg):
         if not msg.is_event():
             return None, self
 
-        event = Event.deserialize(msg.payload)
+        event = msg.get_event()
         if event.type == Event.Type.WorkbookBeforeClose:
             # TODO do something here before shutdown worker
             return None, None  # special value to close runtime
@@ -24,13 +28,50 @@ class Ready:
         if event.type in (Event.Type.SheetChange,
                           Event.Type.RangeResponse):
 
-            actions = []
-            for handler in context.handlers(event.sheet):
-                logger.debug("call %s handler", handler.__class__.__name__)
-                actions.append(handler.handle(event, context))
-
-            answer = FirstAnswer().merge(event, actions)
-            return list(map(Message.action, answer)), self
+            answer = self.handle(context, event)
+            if len(answer) > 1:
+                # one message per event, addin parses it once
+                return [Message.actions(Action.serialize_many(
+                    answer, context.protocol))], self
+            return [Message.action(x.serialize(protocol=context.protocol))
+                    for x in answer], self
         else:
             logger.warn("unexpected event: %s", str(event))
             return None, self
+
+    def handle(self, context, event):
+        """
+        Calls handlers of sheet and returns their actions. Range
+        requests for cells known to `SheetMirror` are answered here
+        without round trip to addin.
+        """
+        answer = []
+        events = collections.deque([event])
+        local = 0
+        while events:
+            event = events.popleft()
+            context.mirror.observe(event)
+            # response for merged ranges is handled part by part
+            for part in context.broker.split(event):
+                actions = []
+                for handler in context.handlers(part.sheet):
+                    logger.debug("call %s handler",
+                                 handler.__class__.__name__)
+                    actions.append(handler.handle(part, context))
+                answer += FirstAnswer().merge(part, actions)
+
+            for action in list(answer):
+                if local >= Ready.MAX_LOCAL_RESPONSES:
+                    break
+                if action.type != Action.Type.RangeRequest or \
+                        action.flags != Action.Flags.NoFlags:
+                    continue
+                rows = context.mirror.lookup(action.sheet, action.range_name)
+                if rows is not None:
+                    logger.debug("range is known: %s", action.range_name)
+                    answer.remove(action)
+                    events.append(Event(Event.Type.RangeResponse,
+                                        action.workbook, action.sheet, rows))
+                    local += 1
+
+        return context.changes.merge(context.broker.merge(answer))
@@ -12,7 +12,7 @@ class WaitingContext:
     """
     def next(self, context, msg):
         if msg.is_event():
-            event = Event.deserialize(msg.payload)
+            event = msg.get_event()
             if event.type == Event.Type.WorkbookBeforeClose:
                 return None, None
 
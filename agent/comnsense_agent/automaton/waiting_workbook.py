@@ -3,6 +3,7 @@ import logging
 from comnsense_agent.automaton import State
 from comnsense_agent.data import Request, Event, Signal
 from comnsense_agent.message import Message
+from comnsense_agent.utils.serialization import PROTOCOL_VERSION
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +14,11 @@ class WaitingWorkbookID:
     """
     def next(self, context, msg):
         if msg.is_event():
-            event = Event.deserialize(msg.payload)
+            event = msg.get_event()
             if event.type == Event.Type.WorkbookBeforeClose:
                 return None, None
             context.workbook = event.workbook
+            context.protocol = min(event.protocol, PROTOCOL_VERSION)
         else:
             return None, self
 
@@ -5,19 +5,35 @@ from comnsense_agent.algorithm.event_handler import PublicMethodLookup
 from comnsense_agent.algorithm.error_detector import ErrorDetector
 from comnsense_agent.algorithm.header_detector import HeaderDetector
 from comnsense_agent.algorithm.string_formatter import StringFormatter
+from comnsense_agent.multiplexer.change_coalescer import ChangeCoalescer
+from comnsense_agent.multiplexer.range_broker import RangeBroker
+from comnsense_agent.sheet_mirror import SheetMirror
 
 from comnsense_agent.utils.serialization import get_content
+from comnsense_agent.utils.serialization import restore_content
 from comnsense_agent.utils.serialization import serialize
+from comnsense_agent.utils.serialization import deserialize
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
 
 logger = logging.getLogger(__name__)
 
 
+# order of handlers is order of their calls
+HANDLERS = (HeaderDetector, StringFormatter, ErrorDetector)
+
+
 class Context(object):
     def __init__(self):
         self._copy = None
         self._workbook = None
         self._ready = False
         self._sheets_event_handlers = {}
+        # wire protocol negotiated with addin, it is not saved
+        self.protocol = PROTOCOL_JSON
+        # range requests in flight and known cells are not saved either
+        self.broker = RangeBroker()
+        self.mirror = SheetMirror()
+        self.changes = ChangeCoalescer(self.mirror)
 
     @property
     def workbook(self):
@@ -41,9 +57,7 @@ class Context(object):
         if sheet not in self._sheets_event_handlers:
             # class names are needed for deserealization
             self._sheets_event_handlers[sheet] = OrderedDict(
-                [(HeaderDetector.__name__, HeaderDetector()),
-                 (StringFormatter.__name__, StringFormatter()),
-                 (ErrorDetector.__name__, ErrorDetector())])
+                [(x.__name__, x()) for x in HANDLERS])
         return self._sheets_event_handlers[sheet].values()
 
     def dumps(self):
@@ -55,18 +69,30 @@ class Context(object):
         :return: byte string
         """
         content = {}
-        for sheet in self.sheets():
+        for sheet, handlers in self._sheets_event_handlers.iteritems():
             content[sheet] = []
-            for name, handler in self.handlers(sheet):
+            for name, handler in handlers.iteritems():
                 content[sheet].append(
                     {"class": name, "content": get_content(handler)})
         return serialize("json", content)
 
     def loads(self, data):
         """
-        Constructs :py:class:`Context` object from byte string
-        :return: :py:class:`Context`
+        Restores handlers of :py:class:`Context` from byte string
+        created by :py:meth:`dumps`. If *data* is empty, e.g. context
+        was not found on server, handlers are started from scratch.
         """
+        if data:
+            self._sheets_event_handlers = {}
+            classes = dict((x.__name__, x) for x in HANDLERS)
+            for sheet, handlers in deserialize("json", data).iteritems():
+                restored = dict(
+                    (x["class"], restore_content(classes[x["class"]](),
+                                                 x["content"]))
+                    for x in handlers if x["class"] in classes)
+                self._sheets_event_handlers[sheet] = OrderedDict(
+                    [(x.__name__, restored.get(x.__name__) or x())
+                     for x in HANDLERS])
         if self._workbook:
             self._ready = True
 
@@ -4,13 +4,19 @@ import enum
 
 from comnsense_agent.data.cell import Cell
 from comnsense_agent.data.data import Data
-from comnsense_agent.utils.serialization import JsonSerializable
+from comnsense_agent.utils.serialization import NegotiableSerializable
+from comnsense_agent.utils.serialization import PROTOCOLS, PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_COLUMNAR
+from comnsense_agent.utils.serialization import get_wire_content
+from comnsense_agent.utils.serialization import get_decoder
+from comnsense_agent.utils.serialization import serialize, deserialize
+from comnsense_agent.utils.serialization import detect
 
 
 logger = logging.getLogger()
 
 
-class Action(JsonSerializable, Data):
+class Action(NegotiableSerializable(), Data):
     """
     Action is representation of some commands for addin.
 
@@ -59,6 +65,9 @@ class Action(JsonSerializable, Data):
          "type": 1,
          "workbook": "6febeb82-3c86-11e5-baeb-3c07543b8a2e"
        }
+
+    Action is serialized to JSON by default, addin which supports
+    msgpack receives ``action.serialize(protocol=PROTOCOL_MSGPACK)``.
     """
 
     @enum.unique
@@ -167,8 +176,7 @@ class Action(JsonSerializable, Data):
             return "rangeName"
 
     def _get_max_flags(self):
-        return sum(map(lambda x: x.value,
-                       Action.Flags.__members__.values()))
+        return MAX_FLAGS
 
     @property
     def type(self):
@@ -227,6 +235,9 @@ class Action(JsonSerializable, Data):
         return self._flags
 
     def __getstate__(self):
+        return self.get_wire_state(PROTOCOL_JSON)
+
+    def get_wire_state(self, protocol):
         state = {
             "type": self._type.value,
             "workbook": self._workbook,
@@ -237,8 +248,8 @@ class Action(JsonSerializable, Data):
             state["flags"] = self._flags
 
         if self._type == Action.Type.ChangeCell:
-            state[self._get_content_name()] = \
-                Cell.table_to_primitive(self._content)
+            state[self._get_content_name()] = Cell.table_to_primitive(
+                self._content, protocol >= PROTOCOL_COLUMNAR)
         elif self._type == Action.Type.RangeRequest:
             state[self._get_content_name()] = self._content
         else:
@@ -326,8 +337,36 @@ class Action(JsonSerializable, Data):
             Action.Type.RangeRequest, event.workbook,
             event.sheet, range_name, flags)
 
+    @staticmethod
+    def serialize_many(actions, protocol=PROTOCOL_JSON):
+        """
+        Serializes *actions* to one array, so they could be sent
+        to addin in one message.
+
+        :param actions:  sequence of `Action`
+        :param protocol: wire protocol version
+
+        :return: str
+        """
+        return serialize(PROTOCOLS[protocol],
+                         [get_wire_content(x, protocol) for x in actions])
+
+    @staticmethod
+    def deserialize_many(data):
+        """
+        Restores actions serialized by `Action.serialize_many`.
+
+        :return: list of `Action`
+        """
+        provider = detect(data)
+        decoder = get_decoder(Action, provider)
+        return [decoder(x) for x in deserialize(provider, data)]
+
     def __repr__(self):
         return self.serialize()
 
     def __str__(self):
         return repr(self)
+
+
+MAX_FLAGS = sum(x.value for x in Action.Flags)
@@ -3,8 +3,49 @@ import logging
 
 from types import NoneType
 
+from comnsense_agent.utils import address
+from comnsense_agent.utils.serialization import register
+
 logger = logging.getLogger(__name__)
 
+# styles are repeated in big ranges, so cells share interned objects
+MAX_INTERNED = 4096
+_interned_border = {}
+_interned_borders = {}
+_interned_values = {}
+
+
+def intern_value(value):
+    """
+    Returns shared instance of immutable *value*, e.g.: font name.
+    """
+    try:
+        return _interned_values[value]
+    except KeyError:
+        if len(_interned_values) < MAX_INTERNED:
+            _interned_values[value] = value
+        return value
+    except TypeError:  # unhashable
+        return value
+
+
+class Frozen(object):
+    """
+    Mixin of immutable shared instance. Interned object changes its
+    class to frozen subclass, so objects which are not shared do not
+    check their writes.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is frozen" % self.__class__.__name__)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
 
 class Border(object):
     __slots__ = ("_weight", "_linestyle")
@@ -33,33 +74,81 @@ class Border(object):
 
     @property
     def weight(self):
-        return self._weight.value
+        return self._weight
 
     @weight.setter
     def weight(self, value):
         assert isinstance(value, (int, Border.Weight))
-        if isinstance(value, int):
-            value = Border.Weight(value)
-        self._weight = value
+        if value not in WEIGHTS:
+            raise ValueError("%r is not a valid Weight" % value)
+        self._weight = int(value)
 
     @property
     def linestyle(self):
-        return self._linestyle.value
+        return self._linestyle
 
     @linestyle.setter
     def linestyle(self, value):
         assert isinstance(value, (int, Border.LineStyle))
-        if isinstance(value, int):
-            value = Border.LineStyle(value)
-        self._linestyle = value
+        if value not in LINESTYLES:
+            raise ValueError("%r is not a valid LineStyle" % value)
+        self._linestyle = int(value)
+
+    def is_valid(self):
+        return self._weight in WEIGHTS and self._linestyle in LINESTYLES
+
+    def __getstate__(self):
+        return {"weight": self._weight, "linestyle": self._linestyle}
+
+    def __setstate__(self, state):
+        self.weight = state["weight"]
+        self.linestyle = state["linestyle"]
 
     def to_primitive(self):
-        return [self.weight, self.linestyle]
+        return [self._weight, self._linestyle]
 
     @staticmethod
     def from_primitive(obj):
         return Border(*obj)
 
+    @staticmethod
+    def from_content(obj):
+        """
+        Restores border from `Border.to_primitive` or
+        `Border.__getstate__` content.
+        """
+        if obj is None or isinstance(obj, Border):
+            return obj
+        if isinstance(obj, dict):
+            return Border(obj["weight"], obj["linestyle"])
+        return Border(*obj)
+
+    @staticmethod
+    def intern(weight, linestyle):
+        """
+        Returns shared frozen border, it is validated once.
+        """
+        key = (weight, linestyle)
+        try:
+            return _interned_border[key]
+        except KeyError:
+            border = Border(weight, linestyle)
+            border.__class__ = FrozenBorder
+            if len(_interned_border) < MAX_INTERNED:
+                _interned_border[key] = border
+            return border
+
+    @staticmethod
+    def trusted(weight, linestyle):
+        """
+        Creates border without validation, *weight* and *linestyle*
+        should be ints, see `Border.is_valid`.
+        """
+        border = Border.__new__(Border)
+        border._weight = weight
+        border._linestyle = linestyle
+        return border
+
     def __repr__(self):
         return "Border: %s" % self.to_primitive()
 
@@ -71,9 +160,26 @@ class Border(object):
         return not self.__eq__(another)
 
 
+class FrozenBorder(Frozen, Border):
+    __slots__ = ()
+
+    def __reduce__(self):
+        return _intern_border, (self._weight, self._linestyle)
+
+
+def _intern_border(weight, linestyle):
+    return Border.intern(weight, linestyle)
+
+
+WEIGHTS = frozenset(x.value for x in Border.Weight)
+LINESTYLES = frozenset(x.value for x in Border.LineStyle)
+
+
 class Borders(object):
     __slots__ = ("top", "left", "bottom", "right")
 
+    SIDES = ("top", "left", "bottom", "right")
+
     def __init__(self, top=None, left=None, bottom=None, right=None):
         assert isinstance(top, (Border, NoneType))
         assert isinstance(left, (Border, NoneType))
@@ -108,11 +214,68 @@ class Borders(object):
         kwargs = dict(items)
         return Borders(**kwargs)
 
+    @staticmethod
+    def trusted(top=None, left=None, bottom=None, right=None):
+        """
+        Creates borders without validation.
+        """
+        borders = Borders.__new__(Borders)
+        borders.top = top
+        borders.left = left
+        borders.bottom = bottom
+        borders.right = right
+        return borders
+
+    @staticmethod
+    def intern_from_primitive(obj):
+        """
+        Like `Borders.from_primitive`, but returns shared frozen
+        borders, each distinct borders are validated once.
+        """
+        obj = obj or {}
+        key = tuple(tuple(obj[x]) if obj.get(x) else None
+                    for x in Borders.SIDES)
+        try:
+            return _interned_borders[key]
+        except KeyError:
+            borders = Borders(*[None if x is None else Border.intern(*x)
+                                for x in key])
+            borders.__class__ = FrozenBorders
+            if len(_interned_borders) < MAX_INTERNED:
+                _interned_borders[key] = borders
+            return borders
+
+    @staticmethod
+    def from_content(obj):
+        """
+        Restores borders from `Borders.to_primitive` or
+        `Borders.__getstate__` content.
+        """
+        if isinstance(obj, Borders):
+            return obj
+        obj = obj or {}
+        return Borders(*[Border.from_content(obj.get(x))
+                         for x in Borders.SIDES])
+
+    def __getstate__(self):
+        return dict((x, getattr(self, x)) for x in Borders.SIDES)
+
+    def __setstate__(self, state):
+        for side in Borders.SIDES:
+            setattr(self, side, Border.from_content(state.get(side)))
+
+    def is_valid(self):
+        for side in (self.top, self.left, self.bottom, self.right):
+            if side is not None and \
+                    not (isinstance(side, Border) and side.is_valid()):
+                return False
+        return True
+
     def __repr__(self):
         return "Borders: %s" % self.to_primitive()
 
     def __eq__(self, another):
-        for attr in Borders.__slots__:
+        for attr in Borders.SIDES:
             if getattr(self, attr) != getattr(another, attr):
                 return False
         return True
@@ -121,8 +284,26 @@ class Borders(object):
         return not self.__eq__(another)
 
 
+class FrozenBorders(Frozen, Borders):
+    __slots__ = ()
+
+    def __reduce__(self):
+        return _intern_borders, (self.to_primitive(),)
+
+
+def _intern_borders(obj):
+    return Borders.intern_from_primitive(obj)
+
+
+INT_TYPES = frozenset([int, NoneType])
+FONT_TYPES = frozenset([unicode, str, NoneType])
+
+
 class Cell(object):
-    __slots__ = ("key", "value", "font", "color", "fontstyle", "borders")
+    __slots__ = ("_key", "value", "font", "color", "fontstyle", "borders",
+                 "_address")
+
+    FIELDS = ("key", "value", "font", "color", "fontstyle", "borders")
 
     @enum.unique
     class FontStyle(enum.IntEnum):
@@ -187,13 +368,47 @@ class Cell(object):
     def underline(self, value):
         self._set_fontstyle(Cell.FontStyle.underline.value, value)
 
+    @property
+    def key(self):
+        return self._key
+
+    @key.setter
+    def key(self, value):
+        self._key = value
+        self._address = None
+
+    def _get_address(self):
+        if self._address is None:
+            self._address = address.parse(self._key)
+        return self._address
+
     @property
     def column(self):
-        return self.key.split("$")[1]
+        """
+        Column name, e.g.: ``B`` for ``$B$3``
+        """
+        return self._get_address()[0]
 
     @property
     def row(self):
-        return self.key.split("$")[2]
+        """
+        Row name, e.g.: ``"3"`` for ``$B$3``
+        """
+        return self._get_address()[1]
+
+    @property
+    def column_index(self):
+        """
+        Column number starting from 1, e.g.: 2 for ``$B$3``
+        """
+        return self._get_address()[2]
+
+    @property
+    def row_index(self):
+        """
+        Row number starting from 1, e.g.: 3 for ``$B$3``
+        """
+        return self._get_address()[3]
 
     def to_primitive(self):
         obj = {"key": self.key}
@@ -212,24 +427,194 @@ class Cell(object):
 
     @staticmethod
     def from_primitive(obj):
+        """
+        Restores cell, its borders, font and color are interned.
+        """
         key = obj.get("key")
         value = obj.get("value")
         kwargs = {}
-        if obj.get("borders"):
-            borders = Borders.from_primitive(obj.get("borders"))
-            kwargs["borders"] = borders
-        kwargs["color"] = obj.get("color")
-        kwargs["font"] = obj.get("font")
+        kwargs["borders"] = Borders.intern_from_primitive(obj.get("borders"))
+        kwargs["color"] = intern_value(obj.get("color"))
+        kwargs["font"] = intern_value(obj.get("font"))
         kwargs["fontstyle"] = obj.get("fontstyle")
         return Cell(key, value, **kwargs)
 
+    def __getstate__(self):
+        return {"key": self._key, "value": self.value, "font": self.font,
+                "color": self.color, "fontstyle": self.fontstyle,
+                "borders": self.borders}
+
+    def __setstate__(self, state):
+        self.__init__(state["key"], state.get("value"),
+                      state.get("font"), state.get("color"),
+                      state.get("fontstyle"),
+                      Borders.from_content(state.get("borders")))
+
+    @staticmethod
+    def from_content(obj):
+        """
+        Restores cell from `Cell.to_primitive` or `Cell.__getstate__`
+        content.
+        """
+        cell = Cell.__new__(Cell)
+        cell.__setstate__(obj)
+        return cell
+
+    @staticmethod
+    def trusted(key, value, font=None, color=None,
+                fontstyle=None, borders=None):
+        """
+        Creates cell without validation, it is used for bulk
+        construction of tables checked by `Cell.validate_table`.
+        """
+        cell = Cell.__new__(Cell)
+        cell._key = key
+        cell._address = None
+        cell.value = value
+        cell.font = font
+        cell.color = color
+        cell.fontstyle = fontstyle
+        cell.borders = borders if borders is not None else Borders.trusted()
+        return cell
+
     @staticmethod
-    def table_to_primitive(table):
+    def trusted_from_primitive(obj):
+        return Cell.trusted(obj.get("key"), obj.get("value"),
+                            intern_value(obj.get("font")),
+                            intern_value(obj.get("color")),
+                            obj.get("fontstyle"),
+                            Borders.intern_from_primitive(obj.get("borders")))
+
+    @staticmethod
+    def validate_table(table):
+        """
+        Checks all cells of *table* at once: types of attributes
+        are checked by columns, each distinct `Borders` instance
+        is checked once.
+
+        :raises: ValueError
+        """
+        cells = [cell for row in table for cell in row]
+        Cell.validate_columns([x._key for x in cells],
+                              [x.font for x in cells],
+                              [x.color for x in cells],
+                              [x.fontstyle for x in cells],
+                              [x.borders for x in cells])
+        return table
+
+    @staticmethod
+    def validate_columns(keys, fonts, colors, fontstyles, borders):
+        if None in keys:
+            raise ValueError("cell key should not be empty")
+        if not set(map(type, fonts)) <= FONT_TYPES:
+            raise ValueError("cell font should be a string")
+        if not set(map(type, colors)) <= INT_TYPES:
+            raise ValueError("cell color should be an int")
+        if not set(map(type, fontstyles)) <= INT_TYPES:
+            raise ValueError("cell fontstyle should be an int")
+        for item in dict((id(x), x) for x in borders).itervalues():
+            if not isinstance(item, Borders) or not item.is_valid():
+                raise ValueError("invalid cell borders: %r" % item)
+
+    @staticmethod
+    def table_to_primitive(table, columnar=False):
+        if columnar:
+            return Cell.table_to_columns(table)
         return [[cell.to_primitive() for cell in row] for row in table]
 
     @staticmethod
     def table_from_primitive(obj):
-        return [[Cell.from_primitive(data) for data in row] for row in obj]
+        if isinstance(obj, dict):
+            return Cell.table_from_columns(obj)
+        return Cell.validate_table(
+            [[Cell.trusted_from_primitive(data) for data in row]
+             for row in obj])
+
+    @staticmethod
+    def table_to_columns(table):
+        """
+        Columnar representation of *table*: row lengths, keys
+        (or only the top left key if the table is a solid range)
+        and flat arrays of attributes in row-major order. Attributes
+        which are ``None`` for all cells are omitted, borders are
+        stored as indexes in ``border_table``.
+        """
+        cells = [cell for row in table for cell in row]
+        obj = {"rows": [len(row) for row in table]}
+        if Cell._is_solid(table):
+            obj["origin"] = cells[0].key
+        else:
+            obj["keys"] = [cell.key for cell in cells]
+        for name in ("value", "color", "font", "fontstyle"):
+            column = [getattr(cell, name) for cell in cells]
+            if any(x is not None for x in column):
+                obj[name + "s"] = column
+
+        indexes, border_table, border_keys = [], [], {}
+        for cell in cells:
+            primitive = cell.borders.to_primitive()
+            if primitive is None:
+                indexes.append(None)
+                continue
+            key = tuple(sorted((x, tuple(y)) for x, y in primitive.items()))
+            if key not in border_keys:
+                border_keys[key] = len(border_table)
+                border_table.append(primitive)
+            indexes.append(border_keys[key])
+        if border_table:
+            obj["borders"] = indexes
+            obj["border_table"] = border_table
+        return obj
+
+    @staticmethod
+    def table_from_columns(obj):
+        """
+        Restores table from `Cell.table_to_columns` representation.
+        Borders, fonts and colors are interned.
+        """
+        rows = obj["rows"]
+        if "origin" in obj:
+            keys = Cell._solid_keys(obj["origin"], rows)
+        else:
+            keys = obj["keys"]
+        count = len(keys)
+        empty = [None] * count
+        values = obj.get("values", empty)
+        colors = map(intern_value, obj.get("colors", empty))
+        fonts = map(intern_value, obj.get("fonts", empty))
+        fontstyles = obj.get("fontstyles", empty)
+        border_table = [Borders.intern_from_primitive(x)
+                        for x in obj.get("border_table", [])]
+        border_table.append(Borders.intern_from_primitive(None))
+        borders = [border_table[-1 if x is None else x]
+                   for x in obj.get("borders", empty)]
+        Cell.validate_columns(keys, fonts, colors, fontstyles, border_table)
+        attrs = zip(keys, values, fonts, colors, fontstyles, borders)
+        cells = [Cell.trusted(*x) for x in attrs]
+        table, begin = [], 0
+        for length in rows:
+            table.append(cells[begin:begin + length])
+            begin += length
+        return table
+
+    @staticmethod
+    def _is_solid(table):
+        if not table or not table[0]:
+            return False
+        rows = [len(row) for row in table]
+        if rows != [rows[0]] * len(rows):
+            return False
+        keys = [cell.key for row in table for cell in row]
+        return keys == Cell._solid_keys(table[0][0].key, rows)
+
+    @staticmethod
+    def _solid_keys(origin, rows):
+        _, _, column, row = address.parse(origin)
+        columns = [address.column_name(column + x)
+                   for x in xrange(max(rows or [0]))]
+        return ["$%s$%d" % (columns[x], row + index)
+                for index, length in enumerate(rows)
+                for x in xrange(length)]
 
     def __repr__(self):
         main = "{%s: %s}" % (self.key, self.value)
@@ -244,10 +629,32 @@ class Cell(object):
         return main.encode('utf-8')
 
     def __eq__(self, another):
-        for attr in Cell.__slots__:
+        for attr in Cell.FIELDS:
             if getattr(self, attr) != getattr(another, attr):
                 return False
         return True
 
     def __ne__(self, another):
         return not self.__eq__(another)
+
+
+def encode_cell(cell, protocol):
+    """
+    Content of cell with all fields, like the reflective one.
+    """
+    borders = cell.borders
+    return {"key": cell._key, "value": cell.value, "font": cell.font,
+            "color": cell.color, "fontstyle": cell.fontstyle,
+            "borders": dict((x, None if y is None else y.__getstate__())
+                            for x, y in ((x, getattr(borders, x))
+                                         for x in Borders.SIDES))}
+
+
+def encode_cell_compact(cell, protocol):
+    return cell.to_primitive()
+
+
+register(Cell, encode_cell, Cell.from_content)
+register(Cell, encode_cell, Cell.from_content, "json")
+# msgpack is the wire format, fields which are not set are omitted
+register(Cell, encode_cell_compact, Cell.from_content, "msgpack")
@@ -16,6 +16,9 @@ class Data(object):
 
     __slots__ = ()
 
+    # slots which keep derived data, they are not compared
+    CACHE_SLOTS = ()
+
     def validate(self):
         """
         Validate consistency of all fields in the structure.
@@ -51,6 +54,8 @@ class Data(object):
         if not isinstance(another, self.__class__):
             return False
         for attr in self.__slots__:
+            if attr in self.CACHE_SLOTS:
+                continue
             if getattr(self, attr) != getattr(another, attr):
                 return False
         return True
@@ -4,15 +4,23 @@ import logging
 
 from .data import Data
 from comnsense_agent.data.cell import Cell
-from comnsense_agent.utils.serialization import JsonSerializable
+from comnsense_agent.utils.serialization import NegotiableSerializable
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_COLUMNAR
 
 
 logger = logging.getLogger(__name__)
 
 
-class Event(JsonSerializable, Data):
+class Event(NegotiableSerializable(), Data):
     """
     Events should be used for transferring data from the Excel to the `Agent`
+
+    Event could be serialized to JSON or msgpack, format of received
+    event is detected. Cells of deserialized event are built on the
+    first access, so it is cheap to get `type <Event.type>` or
+    `workbook <Event.workbook>` only. Addin announces the latest supported
+    `protocol <Event.protocol>` in `WorkbookOpen <Event.Type.WorkbookOpen>`.
     """
 
     @enum.unique
@@ -44,7 +52,10 @@ class Event(JsonSerializable, Data):
         SheetChange = 2
         RangeResponse = 3
 
-    __slots__ = ("_type", "_workbook", "_sheet", "_cells", "_prev_cells")
+    __slots__ = ("_type", "_workbook", "_sheet", "_cells", "_prev_cells",
+                 "_protocol", "_index", "_raw")
+
+    CACHE_SLOTS = ("_index", "_raw")
 
     def __init__(self, type, workbook, *args):
         self._type = type
@@ -81,6 +92,7 @@ class Event(JsonSerializable, Data):
         The sequence of `cells <Cell>`
         """
         if self._type in (Event.Type.SheetChange, Event.Type.RangeResponse):
+            self._decode()
             return self._cells
 
     @property
@@ -92,8 +104,17 @@ class Event(JsonSerializable, Data):
            Available only if type is SheetChange
         """
         if self._type == Event.Type.SheetChange:
+            self._decode()
             return self._prev_cells
 
+    @property
+    def protocol(self):
+        """
+        The latest wire protocol version supported by the sender,
+        see `comnsense_agent.utils.serialization.PROTOCOLS`
+        """
+        return self._protocol
+
     def validate(self):
         if not isinstance(self._type, Event.Type):
             raise Data.ValidationError("type should be member of Event.Type")
@@ -105,77 +126,137 @@ class Event(JsonSerializable, Data):
             self._cells = []
         if not hasattr(self, "_prev_cells") or self._prev_cells is None:
             self._prev_cells = []
+        self._index = {}
+        if not hasattr(self, "_raw"):
+            self._raw = {}
+        if not hasattr(self, "_protocol") or self._protocol is None:
+            self._protocol = PROTOCOL_JSON
         if self._type in (Event.Type.SheetChange, Event.Type.RangeResponse):
             if self._sheet is None:
                 raise Data.ValidationError(
                     "sheet should not be empty")
-            if self._cells == []:
+            if self._cells == [] and "_cells" not in self._raw:
                 raise Data.ValidationError(
                     "cells should contain at least one cell")
         else:
             self._sheet = None
             self._cells = []
             self._prev_cells = []
+            self._raw = {}
+
+    def _decode(self):
+        """
+        Builds cells which were not decoded yet.
+        """
+        if self._raw:
+            for name, obj in self._raw.iteritems():
+                setattr(self, name, Cell.table_from_primitive(obj))
+            self._raw = {}
 
     def __getstate__(self):
+        return self.get_wire_state(PROTOCOL_JSON)
+
+    def get_wire_state(self, protocol):
+        self._decode()
+        columnar = protocol >= PROTOCOL_COLUMNAR
         state = {}
         state["type"] = self._type.value
         state["workbook"] = self._workbook
         if self._sheet is not None:
             state["sheet"] = self._sheet
         if self._cells:
-            state["cells"] = Cell.table_to_primitive(self._cells)
+            state["cells"] = Cell.table_to_primitive(self._cells, columnar)
         if self._prev_cells:
-            state["prev_cells"] = Cell.table_to_primitive(self._prev_cells)
+            state["prev_cells"] = Cell.table_to_primitive(
+                self._prev_cells, columnar)
+        if self._protocol != PROTOCOL_JSON:
+            state["protocol"] = self._protocol
         return state
 
     def __setstate__(self, state):
         self._type = Event.Type(state.get("type"))
         self._workbook = state.get("workbook")
         self._sheet = state.get("sheet")
-        self._cells = Cell.table_from_primitive(
-            state.get("cells", []))
-        self._prev_cells = Cell.table_from_primitive(
-            state.get("prev_cells", []))
+        self._cells = []
+        self._prev_cells = []
+        # cells are decoded on the first access
+        self._raw = {}
+        if state.get("cells"):
+            self._raw["_cells"] = state["cells"]
+        if state.get("prev_cells"):
+            self._raw["_prev_cells"] = state["prev_cells"]
+        self._protocol = state.get("protocol", PROTOCOL_JSON)
         self.validate()
 
-    def _get_rows(self, cells):
-        rows = {}
-        for row in cells:
-            for cell in row:
-                rows.setdefault(cell.row, []).append(cell)
-        return rows
-
-    def _get_columns(self, cells):
-        columns = {}
-        for row in cells:
-            for cell in row:
-                columns.setdefault(cell.column, []).append(cell)
-        return columns
+    def _get_index(self, name):
+        """
+        Returns tuple of cells grouped by row, by column and by key.
+        Index is built once on the first access. It should be reset
+        by `Event.invalidate` if cells are changed in place.
+        """
+        index = self._index.get(name)
+        if index is None:
+            self._decode()
+            rows, columns, keys = {}, {}, {}
+            for row in getattr(self, name):
+                for cell in row:
+                    rows.setdefault(cell.row, []).append(cell)
+                    columns.setdefault(cell.column, []).append(cell)
+                    keys[cell.key] = cell
+            index = self._index[name] = (rows, columns, keys)
+        return index
+
+    def invalidate(self):
+        """
+        Drops index of cells, e.g.: after change of cell keys.
+        """
+        self._index = {}
 
     @property
     def rows(self):
         if not self.cells:
             return {}
-        return self._get_rows(self.cells)
+        return self._get_index("_cells")[0]
 
     @property
     def prev_rows(self):
         if not self.prev_cells:
             return {}
-        return self._get_rows(self.prev_cells)
+        return self._get_index("_prev_cells")[0]
 
     @property
     def columns(self):
         if not self.cells:
             return {}
-        return self._get_columns(self.cells)
+        return self._get_index("_cells")[1]
 
     @property
     def prev_columns(self):
         if not self.prev_cells:
             return {}
-        return self._get_columns(self.prev_cells)
+        return self._get_index("_prev_cells")[1]
+
+    def get_cell(self, key):
+        """
+        Returns cell by *key* or ``None``.
+        """
+        if not self.cells:
+            return None
+        return self._get_index("_cells")[2].get(key)
+
+    def get_prev_cell(self, key):
+        """
+        Returns previous cell by *key* or ``None``.
+        """
+        if not self.prev_cells:
+            return None
+        return self._get_index("_prev_cells")[2].get(key)
+
+    def __eq__(self, another):
+        self._decode()
+        if isinstance(another, Event):
+            another._decode()
+        return super(Event, self).__eq__(another)
 
     def __repr__(self):
         return self.serialize()
@@ -4,6 +4,7 @@ import httplib
 
 from comnsense_agent.data.data import Data
 from comnsense_agent.utils.serialization import MsgpackSerializable
+from comnsense_agent.utils.serialization import get_content, register
 
 
 logger = logging.getLogger(__name__)
@@ -95,3 +96,6 @@ class Response(MsgpackSerializable, Data):
 
     def __str__(self):
         return repr(self)
+
+
+register(Response, lambda obj, protocol: [obj._code, get_content(obj._data)])
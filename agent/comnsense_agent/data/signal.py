@@ -5,6 +5,7 @@ import types
 from .data import Data
 from comnsense_agent.utils.exception import convert_exception
 from comnsense_agent.utils.serialization import MsgpackSerializable
+from comnsense_agent.utils.serialization import register
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +28,14 @@ class Signal(MsgpackSerializable, Data):
         .. attribute:: Ready
 
            Ready signal code
+
+        .. attribute:: Heartbeat
+
+           Heartbeat signal code
         """
         Stop = 0
         Ready = 1
+        Heartbeat = 2
 
     __slots__ = ("_code", "_data")
 
@@ -83,6 +89,17 @@ class Signal(MsgpackSerializable, Data):
         """
         return Signal(Signal.Code.Stop)
 
+    @staticmethod
+    def heartbeat():
+        """
+        Static constructor for `Signal.Code.Heartbeat`.
+        Agent sends it to services periodically, service should
+        answer with the same signal to prove that it is alive.
+
+        :return: `Signal`
+        """
+        return Signal(Signal.Code.Heartbeat)
+
     def __getstate__(self):
         return [self._code.value, self._data]
 
@@ -98,3 +115,7 @@ class Signal(MsgpackSerializable, Data):
 
     def __str__(self):
         return repr(self)
+
+
+# code and data are primitive, there is nothing to walk
+register(Signal, lambda obj, protocol: [obj._code.value, obj._data])
@@ -0,0 +1,149 @@
+import errno
+import json
+import logging
+import os
+import signal
+import subprocess
+import time
+
+from zmq.eventloop import ioloop
+
+import comnsense_agent.worker
+
+logger = logging.getLogger(__name__)
+
+
+class ForkServerError(RuntimeError):
+    pass
+
+
+class WorkerFork(object):
+    """
+    Agent side handle of worker forked by `ForkServer`.
+    Worker is not a child of the agent, so it is tracked by pid.
+
+    :param pid:   worker process id
+    :type pid:    int
+
+    :param ident: worker socket identity
+    :type ident:  str or None
+    """
+    __slots__ = ("pid", "ident", "ready")
+
+    JOIN_TIMEOUT = 5
+    JOIN_STEP = 0.01
+
+    def __init__(self, pid, ident=None):
+        self.pid = pid
+        self.ident = ident
+        self.ready = False
+
+    def is_alive(self):
+        try:
+            os.kill(self.pid, 0)
+        except OSError, e:
+            return e.errno == errno.EPERM
+        return True
+
+    def join(self):
+        deadline = time.time() + WorkerFork.JOIN_TIMEOUT
+        while self.is_alive() and time.time() < deadline:
+            time.sleep(WorkerFork.JOIN_STEP)
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except OSError, e:
+            if e.errno != errno.ESRCH:
+                raise
+
+
+class ForkServer(object):
+    """
+    Starts workers by forking a template process.
+
+    Template process is started once, it imports worker modules and
+    waits for requests on stdin. Forked worker inherits imported
+    modules and creates only its own 0mq context and event loop,
+    so it starts much faster than new interpreter.
+
+    .. note::
+       It is available only where ``os.fork`` exists.
+    """
+
+    def __init__(self, script=None, level="DEBUG"):
+        if not hasattr(os, "fork"):
+            raise ForkServerError("fork is not supported on this platform")
+        script = script or comnsense_agent.worker.get_worker_script()
+        cmd, env = get_fork_server_command(script, level)
+        logger.debug("fork server cmd: %s", cmd)
+        self.popen = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            close_fds=True, env=env)
+        logger.info("fork server was started: %s", self.popen.pid)
+
+    def spawn(self, ident, connection, multiplexed=False,
+              agent_timeout=None):
+        """
+        Forks new worker, arguments are the same as
+        `create_new_worker <comnsense_agent.worker.create_new_worker>`.
+
+        :return: `WorkerFork`
+        """
+        request = {"ident": ident, "connection": connection,
+                   "multiplexed": multiplexed,
+                   "agent_timeout": agent_timeout}
+        try:
+            self.popen.stdin.write(json.dumps(request) + "\n")
+            self.popen.stdin.flush()
+            pid = int(self.popen.stdout.readline())
+        except (IOError, ValueError), e:
+            raise ForkServerError("fork server is failed: %s" % e)
+        logger.info("worker for ident %s was forked: %s", ident, pid)
+        return WorkerFork(pid, ident)
+
+    def close(self):
+        if self.popen.poll() is None:
+            self.popen.stdin.close()
+            self.popen.wait()
+
+
+def get_fork_server_command(script, level="DEBUG"):
+    return comnsense_agent.worker.get_script_command(
+        script, ['--fork-server', '-l', level])
+
+
+def run_worker(request):
+    loop = ioloop.IOLoop()
+    loop.make_current()
+    try:
+        worker = comnsense_agent.worker.Worker(
+            str(request["ident"]), str(request["connection"]),
+            loop, request["multiplexed"], request.get("agent_timeout"))
+        worker.start()
+    except (SystemExit, KeyboardInterrupt):
+        pass
+
+
+def serve(rfile, wfile):
+    """
+    Main loop of template process. Each line of *rfile* is a JSON
+    request, forked pid is written to *wfile*. Template stops
+    when *rfile* is closed by the agent.
+    """
+    # forked workers are reaped by the system
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    for line in iter(rfile.readline, ""):
+        request = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            devnull = os.open(os.devnull, os.O_RDWR)
+            os.dup2(devnull, rfile.fileno())
+            os.dup2(devnull, wfile.fileno())
+            try:
+                run_worker(request)
+            finally:
+                os._exit(0)
+        wfile.write("%d\n" % pid)
+        wfile.flush()
@@ -1,9 +1,14 @@
 import logging
 
+import zmq
+
+from comnsense_agent.data import Event
+
 logger = logging.getLogger(__name__)
 
 MESSAGE_EVENT = "event"
 MESSAGE_ACTION = "action"
+MESSAGE_ACTIONS = "actions"
 MESSAGE_REQUEST = "req"
 MESSAGE_RESPONSE = "res"
 MESSAGE_LOG = "log"
@@ -12,6 +17,7 @@ MESSAGE_SIGNAL = "sig"
 MESSAGES = [
     MESSAGE_EVENT,
     MESSAGE_ACTION,
+    MESSAGE_ACTIONS,
     MESSAGE_REQUEST,
     MESSAGE_RESPONSE,
     MESSAGE_LOG,
@@ -24,49 +30,87 @@ class InvalidMessageError(RuntimeError):
 
 
 class Message(object):
+    """
+    Multipart message.
+
+    Message consists of optional *route*, optional *ident*, *kind*
+    and *payload*. *route* is used when a message passes through
+    a ``ROUTER`` socket on the way to a worker which serves many
+    idents, e.g.: ``[route, ident, kind, payload]``.
+
+    *payload* could be a `zmq.Frame` received without copying. Such
+    message is forwarded as is, the frame is converted to bytes only
+    when *payload* is read.
+
+    Event of event message is decoded once by `Message.get_event`
+    and shared by all its readers.
+    """
     NO_IDENT = 0
-    __slots__ = ("ident", "kind", "payload")
+    NO_ROUTE = 0
+    PARTS = ("route", "ident", "kind", "payload")
+    __slots__ = ("route", "ident", "kind", "_payload", "_event")
 
     def __init__(self, *message):
         if len(message) == 2:
             message = (Message.NO_IDENT, message[0], message[1])
-        if hasattr(message[2], "serialize"):
-            message = (message[0], message[1], message[2].serialize())
-        for name, value in zip(self.__slots__, message):
+        if len(message) == 3:
+            message = (Message.NO_ROUTE,) + tuple(message)
+        if hasattr(message[3], "serialize"):
+            message = tuple(message[:3]) + (message[3].serialize(),)
+        for name, value in zip(Message.PARTS[:3], message[:3]):
+            if isinstance(value, zmq.Frame):
+                value = value.bytes
             setattr(self, name, value)
+        self._payload = message[3]
+        self._event = None
         self.validate()
 
+    @property
+    def payload(self):
+        if isinstance(self._payload, zmq.Frame):
+            self._payload = self._payload.bytes
+        return self._payload
+
+    @payload.setter
+    def payload(self, value):
+        self._payload = value
+        self._event = None
+
+    def _raw(self, name):
+        if name == "payload":
+            return self._payload
+        return getattr(self, name)
+
     def validate(self):
         if self.kind not in MESSAGES:
             raise InvalidMessageError(
                 "unknown message kind: %s" % self.kind)
         # TODO validate ident here
 
-    def __len__(self):
+    def _parts(self):
+        parts = Message.PARTS
         if self.ident == Message.NO_IDENT:
-            return len(self.__slots__) - 1
-        return len(self.__slots__)
+            parts = parts[:1] + parts[2:]
+        if self.route == Message.NO_ROUTE:
+            parts = parts[1:]
+        return parts
+
+    def __len__(self):
+        return len(self._parts())
 
     def __getitem__(self, key):
-        shift = 0
-        if self.ident == Message.NO_IDENT:
-            shift = 1
         if isinstance(key, slice):
-            start = key.start if key.start is not None else 0
-            stop = key.stop if key.stop is not None else self.__len__()
-            step = key.step if key.step is not None else 1
-            return [getattr(self, x) for x in
-                    self.__slots__[start + shift: stop + shift: step]]
+            return [getattr(self, x) for x in self._parts()[key]]
         if isinstance(key, int):
-            key = self.__slots__[key + shift]
-        if key not in self.__slots__:
+            key = self._parts()[key]
+        if key not in Message.PARTS:
             raise KeyError("unknown part: %s" % key)
         return getattr(self, key)
 
     def __setitem__(self, key, value):
         if isinstance(key, int):
-            key = self.__slots__[key]
-        if key not in self.__slots__:
+            key = self._parts()[key]
+        if key not in Message.PARTS:
             raise KeyError("unknown part: %s" % key)
         setattr(self, key, value)
         self.validate()
@@ -75,19 +119,24 @@ class Message(object):
         raise NotImplementedError("could not delete key: %s", key)
 
     def __iter__(self):
-        shift = 0
-        if self.ident == Message.NO_IDENT:
-            shift = 1
-        return (getattr(self, x) for x in self.__slots__[shift:])
+        # frames are not converted, so they are forwarded without copying
+        return (self._raw(x) for x in self._parts())
 
     def __reversed__(self):
         raise NotImplementedError("could not reverse message")
 
     def __repr__(self):
+        # logging should not convert frame
+        payload = self._payload
+        if isinstance(payload, zmq.Frame):
+            payload = "<frame: %d bytes>" % len(payload)
         if self.ident == Message.NO_IDENT:
-            return "MSG {kind: %s, payload: %r}" % (self.kind, self.payload)
-        return "MSG { ident:%r, kind:%s, payload:%r }" % (
-            self.ident, self.kind, self.payload)
+            return "MSG {kind: %s, payload: %r}" % (self.kind, payload)
+        if self.route == Message.NO_ROUTE:
+            return "MSG { ident:%r, kind:%s, payload:%r }" % (
+                self.ident, self.kind, payload)
+        return "MSG { route:%r, ident:%r, kind:%s, payload:%r }" % (
+            self.route, self.ident, self.kind, payload)
 
     def __str__(self):
         return repr(self)
@@ -96,9 +145,7 @@ class Message(object):
         raise NotImplementedError("could not append to message")
 
     def head(self):
-        if self.ident == Message.NO_IDENT:
-            return self.kind
-        return self.ident
+        return self[0]
 
     def last(self):
         return self.payload
@@ -110,6 +157,16 @@ class Message(object):
     def action(payload, ident=None):
         return Message(ident or Message.NO_IDENT, MESSAGE_ACTION, payload)
 
+    def is_actions(self):
+        return self.kind == MESSAGE_ACTIONS
+
+    @staticmethod
+    def actions(payload, ident=None):
+        """
+        Batch of actions, *payload* is `Action.serialize_many` result.
+        """
+        return Message(ident or Message.NO_IDENT, MESSAGE_ACTIONS, payload)
+
     def is_event(self):
         return self.kind == MESSAGE_EVENT
 
@@ -117,6 +174,14 @@ class Message(object):
     def event(payload, ident=None):
         return Message(ident or Message.NO_IDENT, MESSAGE_EVENT, payload)
 
+    def get_event(self):
+        """
+        Returns `Event` from payload, it is deserialized only once.
+        """
+        if self._event is None:
+            self._event = Event.deserialize(self.payload)
+        return self._event
+
     def is_request(self):
         return self.kind == MESSAGE_REQUEST
 
@@ -161,4 +226,4 @@ class Message(object):
         return oncall
 
     def __eq__(self, other):
-        return list(self) == list(other)
+        return self[:] == other[:]
@@ -0,0 +1,81 @@
+import collections
+import logging
+
+from comnsense_agent.data import Action
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeCoalescer(object):
+    """
+    Merges cell changes of one sheet into one action and drops
+    changes which would not change anything, each cell change is
+    a number of slow COM calls in addin.
+
+    Last known state of a cell is taken from `SheetMirror`, sent
+    changes are remembered there. Fields which are ``None`` are
+    unknown in the mirror and untouched in the change, so cell is
+    dropped only if every field set by the change is known to have
+    the same value already.
+    """
+
+    def __init__(self, mirror):
+        self.mirror = mirror
+
+    def merge(self, actions):
+        """
+        Merges `ChangeCell <Action.Type.ChangeCell>` actions of one
+        sheet into one. It takes place of the first change of the
+        sheet, order of other actions is kept.
+
+        :param actions: list of `Action`
+
+        :return: list of `Action`
+        """
+        changes = collections.OrderedDict()
+        for action in actions:
+            if action.type != Action.Type.ChangeCell:
+                continue
+            cells = changes.setdefault(
+                (action.workbook, action.sheet), collections.OrderedDict())
+            for row in action.cells:
+                for cell in row:
+                    # the latest change of the cell wins
+                    cells.pop(cell.key, None)
+                    cells[cell.key] = cell
+
+        merged = {}
+        for (workbook, sheet), cells in changes.iteritems():
+            rows = collections.OrderedDict()
+            for cell in cells.itervalues():
+                if self.is_known(sheet, cell):
+                    continue
+                rows.setdefault(cell.row_index, []).append(cell)
+                self.mirror.remember(sheet, cell)
+            if rows:
+                merged[(workbook, sheet)] = Action.change(
+                    workbook, sheet, rows.values())
+            else:
+                logger.debug("nothing to change on sheet: %s", sheet)
+
+        answer = []
+        for action in actions:
+            if action.type != Action.Type.ChangeCell:
+                answer.append(action)
+            elif (action.workbook, action.sheet) in merged:
+                answer.append(merged.pop((action.workbook, action.sheet)))
+        return answer
+
+    def is_known(self, sheet, cell):
+        """
+        True if every field set in *cell* has the same known value.
+        """
+        known = self.mirror.get(*self.mirror.get_key(sheet, cell))
+        if known is None:
+            return False
+        for name in ("value", "color", "font", "fontstyle"):
+            value = getattr(cell, name)
+            if value is not None and getattr(known, name) != value:
+                return False
+        borders = cell.borders.to_primitive()
+        return not borders or known.borders.to_primitive() == borders
@@ -0,0 +1,161 @@
+import collections
+import logging
+
+from comnsense_agent.data import Action, Event
+from comnsense_agent.utils import address
+
+logger = logging.getLogger(__name__)
+
+
+class RangeBroker(object):
+    """
+    Merges range requests of handlers, so overlapping and adjacent
+    ranges are requested from addin in one round trip.
+
+    Requests of one sheet with the same flags are merged while their
+    union is a rectangle. Merged block is remembered until response
+    with exactly its bounds is received, then the response is split
+    back to one response per original range, so handlers see the same
+    events as if ranges were requested one by one. Ranges without
+    cells in response get no event.
+    """
+
+    MAX_PENDING = 100
+
+    def __init__(self):
+        # (sheet, bounds of block) -> list of bounds of original ranges
+        # for each request of the block in flight
+        self.pending = collections.OrderedDict()
+
+    def merge(self, actions):
+        """
+        Replaces range requests in *actions* by requests of merged
+        blocks. Block takes place of its first request, order of
+        other actions is kept.
+
+        :param actions: list of `Action`
+
+        :return: list of `Action`
+        """
+        # [first request, bounds of block, bounds of original ranges]
+        blocks = [[x, address.parse_range(x.range_name)] for x in actions
+                  if x.type == Action.Type.RangeRequest]
+        for block in blocks:
+            block.append([block[1]])
+
+        merged = True
+        while merged:
+            merged = False
+            for one, another in self.get_pairs(blocks):
+                union = self.get_union(one[1], another[1])
+                if union is not None:
+                    one[1] = union
+                    one[2] += [x for x in another[2] if x not in one[2]]
+                    blocks.remove(another)
+                    merged = True
+                    break
+
+        requests = {}
+        for first, bounds, parts in blocks:
+            if len(parts) > 1:
+                logger.debug("merged %d ranges: %s", len(parts),
+                             address.format_range(bounds))
+                self.pending.setdefault(
+                    (first.sheet, bounds), []).append(parts)
+                while len(self.pending) > RangeBroker.MAX_PENDING:
+                    self.pending.popitem(last=False)
+                requests[id(first)] = Action.request(
+                    first.workbook, first.sheet,
+                    address.format_range(bounds), first.flags)
+            else:
+                requests[id(first)] = first
+
+        answer = []
+        for action in actions:
+            if action.type != Action.Type.RangeRequest:
+                answer.append(action)
+            elif id(action) in requests:
+                answer.append(requests[id(action)])
+        return answer
+
+    def split(self, event):
+        """
+        Splits response for merged block to responses for each
+        of original ranges. Other events are returned as is.
+
+        :param event: `Event`
+
+        :return: list of `Event`
+        """
+        if event.type != Event.Type.RangeResponse or not self.pending:
+            return [event]
+        cells = [x for row in event.cells for x in row]
+        if not cells:
+            return [event]
+        bounds = (min(x.column_index for x in cells),
+                  min(x.row_index for x in cells),
+                  max(x.column_index for x in cells),
+                  max(x.row_index for x in cells))
+        requests = self.pending.get((event.sheet, bounds))
+        if not requests:
+            return [event]
+        parts = requests.pop(0)
+        if not requests:
+            del self.pending[(event.sheet, bounds)]
+        answer = []
+        for part in parts:
+            cells = self.select(event.cells, part)
+            if cells:
+                answer.append(Event(Event.Type.RangeResponse,
+                                    event.workbook, event.sheet, cells))
+        return answer
+
+    @staticmethod
+    def get_pairs(blocks):
+        for index, one in enumerate(blocks):
+            for another in blocks[index + 1:]:
+                if (one[0].sheet, one[0].flags) == \
+                        (another[0].sheet, another[0].flags):
+                    yield one, another
+
+    @staticmethod
+    def get_union(one, another):
+        """
+        Returns bounds of union of two ranges if it is a rectangle,
+        otherwise ``None``.
+        """
+        left, top = min(one[0], another[0]), min(one[1], another[1])
+        right, bottom = max(one[2], another[2]), max(one[3], another[3])
+        if RangeBroker.contains(one, another):
+            return one
+        if RangeBroker.contains(another, one):
+            return another
+        # the same columns, rows overlap or touch
+        if (one[0], one[2]) == (another[0], another[2]) and \
+                max(one[1], another[1]) <= min(one[3], another[3]) + 1:
+            return left, top, right, bottom
+        # the same rows, columns overlap or touch
+        if (one[1], one[3]) == (another[1], another[3]) and \
+                max(one[0], another[0]) <= min(one[2], another[2]) + 1:
+            return left, top, right, bottom
+        return None
+
+    @staticmethod
+    def contains(outer, inner):
+        return outer[0] <= inner[0] and outer[1] <= inner[1] and \
+            inner[2] <= outer[2] and inner[3] <= outer[3]
+
+    @staticmethod
+    def select(table, bounds):
+        """
+        Returns rows of *table* with cells inside *bounds*.
+        """
+        left, top, right, bottom = bounds
+        rows = []
+        for row in table:
+            cells = [x for x in row
+                     if left <= x.column_index <= right and
+                     top <= x.row_index <= bottom]
+            if cells:
+                rows.append(cells)
+        return rows
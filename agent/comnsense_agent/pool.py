@@ -0,0 +1,236 @@
+import collections
+import logging
+import multiprocessing
+import uuid
+
+import comnsense_agent.fork_server
+import comnsense_agent.worker
+from comnsense_agent.utils.hash_ring import HashRing
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool(object):
+    """
+    Pool of started workers.
+
+    Start of worker takes seconds: python interpreter, imports
+    and connection to the agent. Pool keeps *size* idle workers
+    started in advance, so new workbook gets a worker immediately.
+    Spare workers are replenished in background.
+
+    :param connection: agent backend connection string
+    :type connection:  str
+
+    :param loop:       event loop of the agent
+    :type loop:        `IOLoop <ioloop_>`_
+
+    :param size:       number of idle workers, default `WorkerPool.SIZE`
+    :type size:        int or None
+
+    :param factory:    callable with arguments *ident*, *connection*
+                       and keyword `WorkerPool.OPTIONS`, which starts
+                       new worker, default is `WorkerPool.FACTORY`
+                       function of `comnsense_agent.worker`
+
+    :param options:    keyword arguments of *factory* in addition
+                       to `WorkerPool.OPTIONS`, e.g. *agent_timeout*
+    :type options:     dict or None
+    """
+
+    SIZE = 2
+    OPTIONS = {}
+    FACTORY = "create_new_worker"
+    INPROC = False
+
+    def __init__(self, connection, loop, size=None, factory=None,
+                 options=None):
+        self.connection = connection
+        self.loop = loop
+        self.size = WorkerPool.SIZE if size is None else size
+        self.factory = factory
+        self.options = dict(self.OPTIONS, **(options or {}))
+        self.idle = collections.deque()
+        self.workers = {}
+        self._refill_scheduled = False
+
+    def start(self):
+        """
+        Starts idle workers.
+        """
+        self.refill()
+
+    def spawn(self):
+        """
+        Starts new worker with unique identity.
+
+        :return: worker handle, e.g.: `WorkerProcess`
+        """
+        ident = "worker-%s" % uuid.uuid4().hex
+        factory = self.factory or \
+            getattr(comnsense_agent.worker, self.FACTORY)
+        worker = factory(ident, self.connection, **self.options)
+        self.workers[ident] = worker
+        return worker
+
+    def acquire(self, ident=None):
+        """
+        Takes idle worker from the pool. Workers which already signaled
+        readiness are preferred. If pool is empty new worker is started.
+
+        :param ident: addin ident which will be served by worker
+
+        :return: worker handle
+        """
+        alive = [x for x in self.idle if x.is_alive()]
+        for dead in [x for x in self.idle if x not in alive]:
+            self.release(dead)
+
+        ready = [x for x in alive if x.ready]
+        if ready:
+            worker = ready[0]
+            alive.remove(worker)
+        elif alive:
+            worker = alive.pop(0)
+        else:
+            worker = self.spawn()
+
+        self.idle = collections.deque(alive)
+        self.schedule_refill()
+        return worker
+
+    def get(self, ident):
+        """
+        Returns worker by identity or ``None``.
+        """
+        return self.workers.get(ident)
+
+    def on_ready(self, ident):
+        """
+        Marks worker as ready. It should be called when
+        `Signal.Code.Ready` is received from worker.
+
+        :return: worker handle or ``None`` if worker is unknown
+        """
+        worker = self.workers.get(ident)
+        if worker is not None:
+            worker.ready = True
+        return worker
+
+    def release(self, worker):
+        """
+        Stops *worker* and forgets about it.
+        """
+        if worker.is_alive():
+            worker.kill()
+        for ident, another in self.workers.items():
+            if another is worker:
+                del self.workers[ident]
+        if worker in self.idle:
+            self.idle.remove(worker)
+            self.schedule_refill()
+
+    def schedule_refill(self):
+        if not self._refill_scheduled:
+            self._refill_scheduled = True
+            self.loop.add_callback(self.refill)
+
+    def refill(self):
+        """
+        Starts workers until there are *size* idle workers.
+        """
+        self._refill_scheduled = False
+        while len(self.idle) < self.size:
+            self.idle.append(self.spawn())
+            logger.debug("idle workers: %d", len(self.idle))
+
+    def close(self):
+        """
+        Stops all workers.
+        """
+        for worker in self.workers.values():
+            if worker.is_alive():
+                worker.kill()
+                worker.join()
+        self.workers.clear()
+        self.idle.clear()
+
+
+class MultiplexedWorkerPool(WorkerPool):
+    """
+    Fixed number of workers, each of them serves many idents.
+
+    Ident is placed on worker by consistent hashing, so all events
+    of one workbook are handled by the same process, and idents
+    are spread across *size* processes, by default one per CPU.
+    Dead worker is replaced on the next `acquire` with the same
+    placement.
+    """
+
+    OPTIONS = {"multiplexed": True}
+
+    def __init__(self, connection, loop, size=None, factory=None,
+                 options=None):
+        size = size or multiprocessing.cpu_count()
+        super(MultiplexedWorkerPool, self).__init__(
+            connection, loop, size, factory, options)
+        self.ring = HashRing(["slot-%d" % x for x in xrange(self.size)])
+        self.slots = {}
+
+    def start(self):
+        for slot in self.ring.nodes:
+            self.slots[slot] = self.spawn()
+
+    def acquire(self, ident=None):
+        slot = self.ring.get(ident or "")
+        worker = self.slots.get(slot)
+        if worker is None or not worker.is_alive():
+            if worker is not None:
+                self.release(worker)
+            worker = self.slots[slot] = self.spawn()
+        return worker
+
+    def release(self, worker):
+        super(MultiplexedWorkerPool, self).release(worker)
+        for slot, another in self.slots.items():
+            if another is worker:
+                del self.slots[slot]
+
+    def close(self):
+        super(MultiplexedWorkerPool, self).close()
+        self.slots.clear()
+
+
+class ThreadWorkerPool(WorkerPool):
+    """
+    Pool of workers running in threads of the agent process.
+
+    There is no process start and no loopback TCP, worker is
+    connected to ``inproc://`` backend of the agent.
+    """
+
+    FACTORY = "create_thread_worker"
+    INPROC = True
+
+
+class ForkedWorkerPool(WorkerPool):
+    """
+    Pool of workers forked from template process, see `ForkServer`.
+    """
+
+    def __init__(self, connection, loop, size=None, factory=None,
+                 options=None):
+        super(ForkedWorkerPool, self).__init__(
+            connection, loop, size, factory, options)
+        self.server = None
+
+    def start(self):
+        if self.factory is None:
+            self.server = comnsense_agent.fork_server.ForkServer()
+            self.factory = self.server.spawn
+        super(ForkedWorkerPool, self).start()
+
+    def close(self):
+        super(ForkedWorkerPool, self).close()
+        if self.server is not None:
+            self.server.close()
@@ -3,6 +3,7 @@ import enum
 import collections
 
 from comnsense_agent.context import Context
+from comnsense_agent.data import Event, Request
 from comnsense_agent.message import Message
 
 from comnsense_agent.automaton.waiting_workbook import WaitingWorkbookID
@@ -20,6 +21,15 @@ State.Ready = Ready()
 
 
 class Runtime(object):
+    """
+    Runtime runs automaton of one workbook.
+
+    Sheet events received before the context is ready are deferred
+    and handled as soon as the context is loaded, so the event which
+    revives evicted workbook is not lost.
+    """
+
+    MAX_DEFERRED = 100
 
     @enum.unique
     class SpecialAnswer(enum.Enum):
@@ -29,6 +39,8 @@ class Runtime(object):
     def __init__(self):
         self.currentState = State.WaitingWorkbookID
         self.context = Context()
+        self.changed = False
+        self.deferred = collections.deque(maxlen=Runtime.MAX_DEFERRED)
 
     def prepare_answer(self, answer):
         if self.currentState is None:
@@ -41,6 +53,16 @@ class Runtime(object):
             return [x for x in answer if isinstance(x, Message)]
 
     def run(self, message):
+        if self.currentState is not State.Ready and self.is_sheet(message):
+            self.deferred.append(message)
+
+        answer = self.step(message)
+        while self.currentState is State.Ready and self.deferred:
+            deferred = self.step(self.deferred.popleft())
+            answer = self.merge_answers(answer, deferred)
+        return answer
+
+    def step(self, message):
         logger.debug("state before: %s", self.currentState.__class__.__name__)
         with self.context as context:
             answer, self.currentState = \
@@ -48,4 +70,37 @@ class Runtime(object):
             logger.debug(
                 "state after: %s", self.currentState.__class__.__name__)
             answer = self.prepare_answer(answer)
+        if self.currentState is State.Ready and message.is_event():
+            self.changed = True
         return answer
+
+    @staticmethod
+    def is_sheet(message):
+        if not message.is_event():
+            return False
+        event = message.get_event()
+        return event.type in (Event.Type.SheetChange,
+                              Event.Type.RangeResponse)
+
+    @staticmethod
+    def merge_answers(first, second):
+        if Runtime.SpecialAnswer.finished in (first, second):
+            return Runtime.SpecialAnswer.finished
+        if first == Runtime.SpecialAnswer.noanswer:
+            return second
+        if second == Runtime.SpecialAnswer.noanswer:
+            return first
+        return first + second
+
+    def save(self):
+        """
+        Makes request to save context if it was changed since last save.
+
+        :return: list of messages, it is empty if there is nothing to save
+        """
+        if not self.changed or self.currentState is not State.Ready:
+            return []
+        self.changed = False
+        request = Request.savecontext(
+            self.context.workbook, self.context.dumps())
+        return [Message.request(request)]
@@ -42,10 +42,10 @@ class LocalFileStream(object):
                                                message.ident))
         elif req.type == Request.Type.SaveContext:
             context = req.data
-            self.callback(Message.response(Request.accepted(),
+            self.callback(Message.response(Response.accepted(),
                                            message.ident))
-            self.save_context(context["workbook"], context)
-            self.callback(Message.response(Request.created(),
+            self.save_context(context["workbook"], context["context"])
+            self.callback(Message.response(Response.created(),
                                            message.ident))
 
     def get_context(self, workbook):
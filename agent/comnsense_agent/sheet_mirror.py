@@ -0,0 +1,123 @@
+import collections
+import copy
+import logging
+
+from comnsense_agent.data import Cell, Event
+from comnsense_agent.utils import address
+
+logger = logging.getLogger(__name__)
+
+
+class SheetMirror(object):
+    """
+    Sparse copy of sheet cells known to the worker.
+
+    Mirror is fed by received events and by changes sent to addin,
+    so ranges which were already seen are not requested again.
+    Fields of cells which are ``None`` are unknown, known fields
+    are kept when cell is updated partially, e.g. by value only.
+
+    Memory is bounded: when there are more than *size* cells,
+    the least recently used ones are evicted.
+
+    :param size: maximum number of cells, default `SheetMirror.SIZE`
+    :type size:  int or None
+    """
+
+    SIZE = 65536
+
+    def __init__(self, size=None):
+        self.size = SheetMirror.SIZE if size is None else size
+        # (sheet, key) -> Cell
+        self.cells = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.cells)
+
+    def observe(self, event):
+        """
+        Remembers cells of `SheetChange <Event.Type.SheetChange>` and
+        `RangeResponse <Event.Type.RangeResponse>`. If previous values
+        of changed cells differ from the mirror, the sheet was changed
+        unnoticed, e.g. by recalculation, and it is forgotten.
+        """
+        if event.type not in (Event.Type.SheetChange,
+                              Event.Type.RangeResponse):
+            return
+        if event.type == Event.Type.SheetChange:
+            for row in event.prev_cells:
+                for cell in row:
+                    known = self.cells.get(self.get_key(event.sheet, cell))
+                    if known is not None and cell.value is not None and \
+                            known.value != cell.value:
+                        logger.debug("sheet %s is stale", event.sheet)
+                        self.forget(event.sheet)
+                        break
+        for row in event.cells:
+            for cell in row:
+                self.remember(event.sheet, cell)
+
+    def remember(self, sheet, cell):
+        """
+        Updates known fields of *cell*.
+        """
+        key = self.get_key(sheet, cell)
+        known = self.cells.pop(key, None)
+        if known is None:
+            known = Cell.trusted(cell.key, cell.value)
+        elif cell.value is not None:
+            known.value = cell.value
+        for name in ("font", "color", "fontstyle"):
+            value = getattr(cell, name)
+            if value is not None:
+                setattr(known, name, value)
+        if cell.borders.to_primitive():
+            known.borders = copy.copy(cell.borders)
+        self.cells[key] = known
+        while len(self.cells) > self.size:
+            self.cells.popitem(last=False)
+
+    def get(self, sheet, key):
+        """
+        Returns known `Cell` by its absolute address or ``None``,
+        it should not be changed.
+        """
+        cell = self.cells.pop((sheet, key), None)
+        if cell is not None:
+            self.cells[(sheet, key)] = cell
+        return cell
+
+    @staticmethod
+    def get_key(sheet, cell):
+        return sheet, address.format(cell.column_index, cell.row_index)
+
+    def lookup(self, sheet, range_name):
+        """
+        Returns rows of cells of range if all of them are known,
+        otherwise ``None``. Cells are copies, they could be changed.
+        """
+        left, top, right, bottom = address.parse_range(range_name)
+        if (right - left + 1) * (bottom - top + 1) > len(self.cells):
+            return None
+        rows = []
+        for row in xrange(top, bottom + 1):
+            cells = []
+            for column in xrange(left, right + 1):
+                cell = self.get(sheet, address.format(column, row))
+                if cell is None:
+                    return None
+                cells.append(Cell.trusted(cell.key, cell.value, cell.font,
+                                          cell.color, cell.fontstyle,
+                                          cell.borders))
+            rows.append(cells)
+        return rows
+
+    def forget(self, sheet=None):
+        """
+        Forgets cells of *sheet* or all cells.
+        """
+        if sheet is None:
+            self.cells.clear()
+            return
+        for key in [x for x in self.cells if x[0] == sheet]:
+            del self.cells[key]
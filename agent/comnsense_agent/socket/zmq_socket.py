@@ -21,14 +21,19 @@ class ZMQSocket(Socket):
                       e.g.: ``zmq.ROUTER``, ``zmq.PUSH``.
     :param context:  0mq context, if it is not defined global instance is used.
     :type context: `zmq.Context <zmq_context_>`_ or None
+    :param copy:     if it is ``False`` payloads of received messages
+                     are `zmq.Frame` objects and messages are sent
+                     without copying
+    :type copy:      bool
     """
 
     LINGER = 1000
     IO_THREADS = 1
 
-    def __init__(self, kind, context=None):
+    def __init__(self, kind, context=None, copy=True):
         context = context or zmq.Context.instance(ZMQSocket.IO_THREADS)
         self._socket = context.socket(kind)
+        self.copy = copy
 
     def bind(self, address, loop):
         try:
@@ -46,7 +51,7 @@ class ZMQSocket(Socket):
 
     def send(self, message):
         if not self._stream.closed():
-            self._stream.send_multipart(list(message))
+            self._stream.send_multipart(list(message), copy=self.copy)
 
     def on_recv(self, callback):
         def oncall(data):
@@ -57,7 +62,7 @@ class ZMQSocket(Socket):
                 etype, evalue, etb = sys.exc_info()
                 logger.exception(evalue)
 
-        self._stream.on_recv(oncall)
+        self._stream.on_recv(oncall, copy=self.copy)
 
     def on_send(self, callback):
         def oncall(data, status=None):
@@ -72,6 +77,8 @@ class ZMQSocket(Socket):
 
     def close(self):
         if not self._stream.closed():
+            # send messages queued after the loop was stopped
+            self._stream.flush(zmq.POLLOUT)
             self._stream.close(ZMQSocket.LINGER)
 
 
@@ -83,8 +90,8 @@ class ZMQRouter(ZMQSocket):
     MIN_PORT = 30000
     MAX_PORT = 50000
 
-    def __init__(self):
-        super(ZMQRouter, self).__init__(zmq.ROUTER)
+    def __init__(self, copy=True):
+        super(ZMQRouter, self).__init__(zmq.ROUTER, copy=copy)
 
     def bind_unused_port(self, loop, host="127.0.0.1", port_range=None):
         """
@@ -0,0 +1,121 @@
+"""
+A1 addresses of worksheet cells, e.g.: ``$B$3`` or ``B3``.
+
+Columns are numbered from 1 like in Excel: ``A`` is 1 and ``XFD``
+is `MAX_COLUMN`. Conversions are memoized, the same addresses are
+parsed again and again by handlers.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_COLUMN = 16384
+MAX_ROW = 1048576
+MAX_CACHED = 65536
+
+_column_names = {}
+_column_indexes = {}
+_addresses = {}
+
+
+def column_index(name):
+    """
+    Returns number of column *name*, e.g.: 1 for ``A``, 28 for ``AB``.
+
+    :raises: ValueError if *name* is not a column of worksheet
+    """
+    try:
+        return _column_indexes[name]
+    except KeyError:
+        pass
+    index = 0
+    for char in name:
+        if not "A" <= char <= "Z":
+            raise ValueError("invalid column: %r" % name)
+        index = index * 26 + ord(char) - ord("A") + 1
+    if not 0 < index <= MAX_COLUMN:
+        raise ValueError("invalid column: %r" % name)
+    _column_indexes[name] = index
+    return index
+
+
+def column_name(index):
+    """
+    Returns name of column by its number, e.g.: ``AB`` for 28.
+
+    :raises: ValueError if *index* is out of worksheet
+    """
+    try:
+        return _column_names[index]
+    except KeyError:
+        pass
+    if not 0 < index <= MAX_COLUMN:
+        raise ValueError("invalid column index: %r" % index)
+    name, rest = "", index
+    while rest:
+        rest, char = divmod(rest - 1, 26)
+        name = chr(ord("A") + char) + name
+    _column_names[index] = name
+    return name
+
+
+def parse(key):
+    """
+    Parses address of one cell.
+
+    :param key: absolute (``$B$3``) or relative (``B3``) address
+
+    :return: tuple (column name, row name, column index, row index),
+             e.g.: ``("B", "3", 2, 3)``
+
+    :raises: ValueError if *key* is not an address of one cell
+    """
+    try:
+        return _addresses[key]
+    except KeyError:
+        pass
+    stripped = key.replace("$", "")
+    split = len(stripped) - len(stripped.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    column, row = str(stripped[:split]), str(stripped[split:])
+    if not column or not row.isdigit() or not 0 < int(row) <= MAX_ROW:
+        raise ValueError("invalid address: %r" % key)
+    address = (column, row, column_index(column), int(row))
+    if len(_addresses) >= MAX_CACHED:
+        _addresses.clear()
+    _addresses[key] = address
+    return address
+
+
+def format(column, row):
+    """
+    Returns absolute address of cell, e.g.: ``$B$3`` for (2, 3).
+    """
+    return "$%s$%d" % (column_name(column), row)
+
+
+def parse_range(name):
+    """
+    Parses rectangular range, e.g.: ``$B$3:$D$5`` or one cell ``B3``.
+
+    :return: tuple of bounds (first column, first row, last column,
+             last row), e.g.: ``(2, 3, 4, 5)``
+
+    :raises: ValueError if *name* is not a range of cells
+    """
+    corners = name.split(":")
+    if len(corners) > 2:
+        raise ValueError("invalid range: %r" % name)
+    _, _, left, top = parse(corners[0])
+    _, _, right, bottom = parse(corners[-1])
+    return (min(left, right), min(top, bottom),
+            max(left, right), max(top, bottom))
+
+
+def format_range(bounds):
+    """
+    Returns absolute address of range by its bounds, see `parse_range`.
+    """
+    left, top, right, bottom = bounds
+    if (left, top) == (right, bottom):
+        return format(left, top)
+    return "%s:%s" % (format(left, top), format(right, bottom))
@@ -0,0 +1,64 @@
+import bisect
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing(object):
+    """
+    Consistent hashing ring.
+
+    Each node is placed on the ring *replicas* times, key belongs
+    to the first node clockwise from the key hash. When a node is
+    added or removed only keys of this node are moved.
+
+    :param nodes:    initial nodes
+    :param replicas: number of points of each node on the ring
+    """
+    REPLICAS = 64
+
+    def __init__(self, nodes=None, replicas=None):
+        self.replicas = replicas or HashRing.REPLICAS
+        self._keys = []
+        self._nodes = {}
+        for node in nodes or []:
+            self.add(node)
+
+    @staticmethod
+    def hash(key):
+        if isinstance(key, unicode):
+            key = key.encode("utf-8")
+        return int(hashlib.md5(key).hexdigest()[:8], 16)
+
+    def add(self, node):
+        for replica in xrange(self.replicas):
+            point = HashRing.hash("%s:%d" % (node, replica))
+            if point not in self._nodes:
+                bisect.insort(self._keys, point)
+            self._nodes[point] = node
+
+    def remove(self, node):
+        for replica in xrange(self.replicas):
+            point = HashRing.hash("%s:%d" % (node, replica))
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._keys.remove(point)
+
+    def get(self, key):
+        """
+        Returns node for *key* or ``None`` if ring is empty.
+        """
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, HashRing.hash(key))
+        if index == len(self._keys):
+            index = 0
+        return self._nodes[self._keys[index]]
+
+    @property
+    def nodes(self):
+        return sorted(set(self._nodes.itervalues()))
+
+    def __len__(self):
+        return len(self.nodes)
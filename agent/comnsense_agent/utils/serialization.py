@@ -9,7 +9,66 @@ import msgpack
 logger = logging.getLogger(__name__)
 
 
+# encoders and decoders by (class, provider), see `register`
+ENCODERS = {}
+DECODERS = {}
+
+
+def register(cls, encoder=None, decoder=None, provider=None):
+    """
+    Registers hand-optimized functions which replace reflection
+    for *cls*: ``encoder(obj, protocol)`` returns primitive content,
+    *protocol* is ``None`` if it is not negotiated, and
+    ``decoder(content)`` creates instance from content. Functions
+    registered without *provider* are used for all providers.
+    """
+    if encoder is not None:
+        ENCODERS[(cls, provider)] = encoder
+    if decoder is not None:
+        DECODERS[(cls, provider)] = decoder
+
+
+def encode_generic(obj, protocol):
+    """
+    Encoder of classes without registered one.
+    """
+    if hasattr(obj, "get_wire_state"):
+        return obj.get_wire_state(protocol or PROTOCOL_JSON)
+    return walk_content(obj)
+
+
+def get_encoder(cls, provider=None):
+    """
+    Returns encoder registered for *cls* and *provider*, or for all
+    providers, otherwise `encode_generic`.
+    """
+    return ENCODERS.get((cls, provider)) or \
+        ENCODERS.get((cls, None)) or encode_generic
+
+
+def get_decoder(cls, provider=None):
+    """
+    Returns decoder registered for *cls* and *provider*, or for all
+    providers, otherwise content is restored by `restore_content`.
+    """
+    decoder = DECODERS.get((cls, provider)) or DECODERS.get((cls, None))
+    if decoder is None:
+        return lambda content: restore_content(cls.__new__(cls), content)
+    return decoder
+
+
 def get_content(obj):
+    """
+    Returns primitive content of *obj*, registered encoder is used
+    if there is one, otherwise object is walked by `walk_content`.
+    """
+    encoder = ENCODERS.get((type(obj), None))
+    if encoder is not None:
+        return encoder(obj, None)
+    return walk_content(obj)
+
+
+def walk_content(obj):
     if hasattr(obj, "__getstate__"):
         return get_content(obj.__getstate__())
     elif hasattr(obj, "__slots__"):
@@ -61,22 +120,75 @@ def deserialize(provider, data, **kwargs):
     return PROVIDERS[provider][1](data, **kwargs)
 
 
+# wire protocol versions, *PROTOCOL_VERSION* is the latest supported one
+PROTOCOL_JSON = 1
+PROTOCOL_MSGPACK = 2
+PROTOCOL_COLUMNAR = 3  # msgpack with columnar cell tables
+PROTOCOL_VERSION = PROTOCOL_COLUMNAR
+
+PROTOCOLS = {
+    PROTOCOL_JSON: "json",
+    PROTOCOL_MSGPACK: "msgpack",
+    PROTOCOL_COLUMNAR: "msgpack"
+}
+
+
+def detect(data):
+    """
+    Returns provider of serialized *data*. JSON document starts with
+    a bracket or a whitespace, it never happens to msgpack map or array.
+    """
+    if data[:1] in ("{", "[", " ", "\t", "\r", "\n"):
+        return "json"
+    return "msgpack"
+
+
 def Serializable(provider):
     assert provider in PROVIDERS
 
     def serialize_(self, **kwargs):
-        content = get_content(self)
+        content = get_encoder(type(self), provider)(self, None)
         return serialize(provider, content, **kwargs)
 
     @classmethod
     def deserialize_(cls, data, **kwargs):
         content = deserialize(provider, data, **kwargs)
-        obj = cls.__new__(cls)
-        return restore_content(obj, content)
+        return get_decoder(cls, provider)(content)
 
     return type(provider.title() + "Serializable", (object,),
                 {"serialize": serialize_, "deserialize": deserialize_})
 
 
+def get_wire_content(obj, protocol):
+    """
+    Like `get_content`, but layout of content could depend on
+    *protocol* if *obj* has method ``get_wire_state(protocol)``.
+    The method returns primitive content, so it is not walked again.
+    """
+    return get_encoder(type(obj), PROTOCOLS[protocol])(obj, protocol)
+
+
+def NegotiableSerializable(protocol=PROTOCOL_JSON):
+    """
+    Like `Serializable`, but format is chosen by *protocol* version
+    on serialization (*protocol* is default) and detected on
+    deserialization, so both formats could be received at any time.
+    """
+    assert protocol in PROTOCOLS
+
+    def serialize_(self, protocol=protocol, **kwargs):
+        content = get_wire_content(self, protocol)
+        return serialize(PROTOCOLS[protocol], content, **kwargs)
+
+    @classmethod
+    def deserialize_(cls, data, **kwargs):
+        provider = detect(data)
+        content = deserialize(provider, data, **kwargs)
+        return get_decoder(cls, provider)(content)
+
+    return type("NegotiableSerializable", (object,),
+                {"serialize": serialize_, "deserialize": deserialize_})
+
+
 JsonSerializable = Serializable("json")
 MsgpackSerializable = Serializable("msgpack")
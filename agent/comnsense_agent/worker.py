@@ -3,6 +3,9 @@ import logging
 import os
 import subprocess
 import sys
+import threading
+
+from zmq.eventloop import ioloop
 
 from comnsense_agent.data import Signal
 from comnsense_agent.message import Message
@@ -12,14 +15,36 @@ from comnsense_agent.utils.log import worker_setup as worker_logger_setup
 
 
 class Worker(object):
-    def __init__(self, session, address, loop):
+    """
+    Worker runs `Runtime` for addin idents.
+
+    Worker started for one workbook stops when its runtime is finished.
+    *multiplexed* worker hosts runtimes of many idents and keeps
+    running until `Signal.Code.Stop` is received. `Signal.Code.Stop`
+    addressed to an ident stops only runtime of this ident.
+
+    Worker answers `Signal.Code.Heartbeat` of the agent and saves
+    changed contexts at most once in `Worker.SAVE_INTERVAL` seconds.
+    If there are no heartbeats for *agent_timeout* seconds, default
+    `Worker.AGENT_TIMEOUT`, the agent is gone and worker stops.
+    """
+
+    AGENT_TIMEOUT = 30
+    SAVE_INTERVAL = 10
+
+    def __init__(self, session, address, loop, multiplexed=False,
+                 agent_timeout=None):
         self.loop = loop
+        self.multiplexed = multiplexed
+        self.agent_timeout = agent_timeout or Worker.AGENT_TIMEOUT
+        self.heartbeat_at = None
+        self.saved_at = None
 
         self.client = self.create_client_socket(session, address, loop)
         self.client.on_recv(self.routine)
         self.setup_logger(session)
 
-        self.runtime = Runtime()
+        self.runtimes = {}
 
     def create_client_socket(self, session, address, loop):
         socket = ZMQDealer(session)
@@ -31,35 +56,112 @@ class Worker(object):
         worker_logger_setup(self.client, session)
         logger = logging.getLogger(__name__)
 
+    def create_runtime(self, ident):
+        return Runtime()
+
+    def get_runtime(self, ident):
+        if ident not in self.runtimes:
+            logger.debug("new runtime for ident %s", ident)
+            self.runtimes[ident] = self.create_runtime(ident)
+        return self.runtimes[ident]
+
     def routine(self, msg):
         if msg.is_signal():
             signal = Signal.deserialize(msg.payload)
-            if signal.code == Signal.Code.Stop:
+            if signal.code == Signal.Code.Stop and msg.ident:
+                self.stop_runtime(msg.ident)
+            elif signal.code == Signal.Code.Stop:
                 self.loop.stop()
+            elif signal.code == Signal.Code.Heartbeat:
+                self.heartbeat()
 
         elif msg.is_event() or msg.is_response():
-            answer = self.runtime.run(msg)
+            answer = self.get_runtime(msg.ident).run(msg)
             logger.debug("runtime answer: %s", repr(answer))
 
             if answer == Runtime.SpecialAnswer.finished:
-                self.loop.stop()
+                del self.runtimes[msg.ident]
+                # agent should not restore finished runtime
+                self.client.send(Message.signal(Signal.stop(), msg.ident))
+                if not self.multiplexed:
+                    self.loop.stop()
             elif answer != Runtime.SpecialAnswer.noanswer:
-                for msg in answer:
-                    self.client.send(msg)
+                for reply in answer:
+                    # agent needs ident to find addin for this answer
+                    reply.ident = msg.ident
+                    self.client.send(reply)
+
+    def stop_runtime(self, ident):
+        """
+        Saves context of *ident* and drops its runtime.
+        Agent calls it to evict idle workbook.
+        """
+        runtime = self.runtimes.pop(ident, None)
+        if runtime is not None:
+            for request in runtime.save():
+                request.ident = ident
+                self.client.send(request)
+        logger.info("runtime of ident %s is stopped", ident)
+        if not self.multiplexed and not self.runtimes:
+            self.loop.stop()
+
+    def heartbeat(self):
+        self.heartbeat_at = self.loop.time()
+        self.client.send(Message.signal(Signal.heartbeat()))
+        if self.saved_at is not None and \
+                self.heartbeat_at - self.saved_at < Worker.SAVE_INTERVAL:
+            return
+        self.saved_at = self.heartbeat_at
+        for ident, runtime in self.runtimes.items():
+            for request in runtime.save():
+                request.ident = ident
+                self.client.send(request)
+
+    def check_agent(self):
+        if self.loop.time() - self.heartbeat_at > self.agent_timeout:
+            logger.error("no heartbeats from agent in %d seconds, stop",
+                         self.agent_timeout)
+            self.loop.stop()
+            return
+        self.loop.call_later(self.agent_timeout, self.check_agent)
 
     def start(self):
         self.client.send(Message.signal(Signal.ready()))
+        self.heartbeat_at = self.saved_at = self.loop.time()
+        self.loop.call_later(self.agent_timeout, self.check_agent)
         try:
             self.loop.start()
         finally:
             self.client.close()
 
 
+class InprocWorker(Worker):
+    """
+    Worker which runs in a thread of the agent process
+    and is connected to the agent by ``inproc://`` transport.
+    Its log records are handled by the agent logging setup.
+    """
+    def setup_logger(self, session):
+        global logger
+        logger = logging.getLogger(__name__)
+
+
 class WorkerProcess(object):
-    __slots__ = ("popen",)
+    """
+    Agent side handle of worker process.
 
-    def __init__(self, popen):
+    :param popen: started worker process
+    :type popen:  `subprocess.Popen`
+
+    :param ident: worker socket identity
+    :type ident:  str or None
+    """
+    __slots__ = ("popen", "ident", "ready")
+
+    def __init__(self, popen, ident=None):
         self.popen = popen
+        self.ident = ident
+        self.ready = False
 
     def is_alive(self):
         return self.popen.poll() is None
@@ -73,6 +175,41 @@ class WorkerProcess(object):
     pid = property(lambda x: x.popen.pid)
 
 
+class WorkerThread(object):
+    """
+    Agent side handle of `InprocWorker`.
+
+    :param thread: started worker thread
+    :type thread:  `threading.Thread`
+
+    :param loop:   event loop of worker thread
+    :type loop:    `IOLoop <ioloop_>`_
+
+    :param ident:  worker socket identity
+    :type ident:   str or None
+    """
+    __slots__ = ("thread", "loop", "ident", "ready")
+
+    JOIN_TIMEOUT = 5
+
+    def __init__(self, thread, loop, ident=None):
+        self.thread = thread
+        self.loop = loop
+        self.ident = ident
+        self.ready = False
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def join(self):
+        return self.thread.join(WorkerThread.JOIN_TIMEOUT)
+
+    def kill(self):
+        return self.loop.add_callback(self.loop.stop)
+
+    pid = property(lambda x: os.getpid())
+
+
 def get_worker_script(searchpath=None):
     if searchpath is None:
         searchpath = os.path.dirname(sys.argv[0])
@@ -86,9 +223,19 @@ def get_worker_script(searchpath=None):
     return script
 
 
-def get_worker_command(script, ident, connection, level="DEBUG"):
+def get_worker_command(script, ident, connection, level="DEBUG",
+                       multiplexed=False, agent_timeout=None):
+    args = ['-i', ident, '-c', connection, '-l', level]
+    if multiplexed:
+        args.append('-m')
+    if agent_timeout:
+        args.extend(['-t', str(agent_timeout)])
+    return get_script_command(script, args)
+
+
+def get_script_command(script, args):
     env = copy.deepcopy(os.environ)
-    cmd = [script, '-i', ident, '-c', connection, '-l', level]
+    cmd = [script] + list(args)
     if not script.endswith(".exe"):  # development mode
         cmd.insert(0, sys.executable)
         env['PYTHONPATH'] = os.path.realpath(
@@ -96,12 +243,37 @@ def get_worker_command(script, ident, connection, level="DEBUG"):
     return cmd, env
 
 
-def create_new_worker(ident, connection):
+def create_new_worker(ident, connection, multiplexed=False,
+                      agent_timeout=None):
     logger = logging.getLogger(__name__)
     script = get_worker_script()
-    cmd, env = get_worker_command(script, ident, connection)
+    cmd, env = get_worker_command(
+        script, ident, connection, multiplexed=multiplexed,
+        agent_timeout=agent_timeout)
     logger.debug("worker env: %s", repr(env))
     logger.debug("worker cmd: %s", cmd)
     proc = subprocess.Popen(cmd, close_fds=True, env=env)
     logger.info("worker for ident %s was started: %s", ident, proc.pid)
-    return WorkerProcess(proc)
+    return WorkerProcess(proc, ident)
+
+
+def create_thread_worker(ident, connection, multiplexed=False,
+                         agent_timeout=None):
+    logger = logging.getLogger(__name__)
+    loop = ioloop.IOLoop()
+
+    def run():
+        loop.make_current()
+        try:
+            InprocWorker(ident, connection, loop, multiplexed,
+                         agent_timeout).start()
+        except:
+            logger.exception("worker thread %s is failed", ident)
+        finally:
+            loop.close(all_fds=True)
+
+    thread = threading.Thread(target=run, name=ident)
+    thread.daemon = True
+    thread.start()
+    logger.info("worker for ident %s was started in thread", ident)
+    return WorkerThread(thread, loop, ident)
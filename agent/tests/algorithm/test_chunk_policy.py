@@ -0,0 +1,57 @@
+import allure
+from hamcrest import *
+
+from comnsense_agent.data import Cell
+from comnsense_agent.algorithm.error_detector.chunk_policy import \
+    ChunkPolicy
+
+
+@allure.feature("Chunk Policy")
+def test_chunk_policy_grows():
+    policy = ChunkPolicy(min_rows=10, max_rows=100, growth=2)
+    chunks = [10]
+    for _ in range(5):
+        chunks.append(policy.next(chunks[-1], latency=0.01))
+    assert_that(chunks, equal_to([10, 20, 40, 80, 100, 100]))
+
+
+@allure.feature("Chunk Policy")
+def test_chunk_policy_shrinks_on_latency():
+    policy = ChunkPolicy(min_rows=10, max_rows=100, max_latency=0.5)
+    assert_that(policy.next(80, latency=1.0), equal_to(40))
+    assert_that(policy.next(10, latency=1.0), equal_to(10))
+    assert_that(policy.next(40, latency=None), equal_to(80))
+
+
+@allure.feature("Chunk Policy")
+def test_chunk_policy_payload():
+    policy = ChunkPolicy(min_rows=10, max_rows=1000, max_payload=10000)
+    cells = [Cell("$A$%d" % x, "x" * 36) for x in range(1, 11)]
+    row_size = policy.get_row_size(cells)
+    assert_that(row_size, equal_to(4 + 36 + ChunkPolicy.CELL_OVERHEAD))
+    assert_that(policy.next(80, row_size=row_size), equal_to(96))
+    assert_that(policy.next(10, row_size=10 ** 6), equal_to(10))
+    assert_that(policy.get_row_size([]), none())
+
+
+@allure.feature("Chunk Policy")
+def test_chunk_policy_from_environ():
+    policy = ChunkPolicy.from_environ({"COMNSENSE_SCAN_MAX_ROWS": "5000",
+                                       "COMNSENSE_SCAN_MAX_LATENCY": "0.25",
+                                       "COMNSENSE_SCAN_GROWTH": "bad",
+                                       "PATH": "/bin"})
+    default = ChunkPolicy()
+    assert_that(policy.max_rows, equal_to(5000))
+    assert_that(policy.max_latency, equal_to(0.25))
+    assert_that(policy.growth, equal_to(default.growth))
+    assert_that(policy.min_rows, equal_to(default.min_rows))
+
+
+@allure.feature("Chunk Policy")
+def test_chunk_policy_fractional_growth():
+    policy = ChunkPolicy.from_environ({"COMNSENSE_SCAN_GROWTH": "1.5"})
+    assert_that(policy.growth, equal_to(1.5))
+    assert_that(policy.next(10), equal_to(15))
+    assert_that(policy.next(15), equal_to(23))
+    assert_that(policy.next(45, latency=10), equal_to(30))
+    assert_that(repr(policy), contains_string("growth:1.5"))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.algorithm.error_detector import column_analyzer
+from comnsense_agent.algorithm.error_detector.column_analyzer import \
+    ColumnAnalyzer, get_patterns
+
+
+FIXTURES = [
+    (u"", ("empty", None, "0 words 0 numbers", "")),
+    (u"  ", ("empty", None, "0 words 0 numbers", " ")),
+    (u"abc", ("non-empty", "words, no numbers", "1 words 0 numbers", "w")),
+    (u"12.5", ("non-empty", "numbers, no words", "0 words 2 numbers",
+               "0.0")),
+    (u"ул. Ленина, 10-2",
+     ("non-empty", "both words and numbers", "2 words 2 numbers",
+      "w. w. 0.0")),
+    (u"a\t\tb//c", ("non-empty", "words, no numbers", "3 words 0 numbers",
+                    "w w.w")),
+    ("\x1c", ("non-empty", None, "0 words 0 numbers", " ")),
+    (u"\x1c", ("empty", None, "0 words 0 numbers", " "))]
+
+
+@allure.feature("Column Analyzer")
+@pytest.mark.parametrize("value,patterns", FIXTURES)
+def test_get_patterns(value, patterns):
+    assert_that(get_patterns(value), equal_to(patterns))
+    for level, pattern in enumerate(patterns):
+        assert_that(ColumnAnalyzer([], level).get_pattern(value, level),
+                    equal_to(pattern))
+
+
+@allure.feature("Column Analyzer")
+def test_get_patterns_memo(monkeypatch):
+    monkeypatch.setattr(column_analyzer, "MAX_MEMO", 4)
+    monkeypatch.setattr(column_analyzer, "_recent", {})
+    monkeypatch.setattr(column_analyzer, "_older", {})
+    patterns = get_patterns(u"a1")
+    assert_that(get_patterns(u"a1"), same_instance(patterns))
+    get_patterns(u"b2")
+    get_patterns(u"c3")  # rotation: a1 and b2 are older
+    get_patterns(u"a1")  # it is used again
+    get_patterns(u"d4")  # rotation: c3 and a1 are older, b2 is dropped
+    get_patterns(u"e5")
+    assert_that(column_analyzer._recent.keys(),
+                contains_inanyorder((unicode, u"d4"), (unicode, u"e5")))
+    assert_that(column_analyzer._older.keys(),
+                contains_inanyorder((unicode, u"c3"), (unicode, u"a1")))
+    assert_that(get_patterns(u"a1"), same_instance(patterns))
+
+
+@allure.feature("Column Analyzer")
+def test_column_analyzer_patterns_dict():
+    analyzer = ColumnAnalyzer([u"a1", u"b2", u"", u"c"], level=1)
+    assert_that(analyzer.patterns_dict,
+                equal_to({"both words and numbers": 2, None: 1,
+                          "words, no numbers": 1}))
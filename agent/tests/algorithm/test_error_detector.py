@@ -1,5 +1,6 @@
 # encoding=utf-8
 import allure
+import copy
 import json
 import mock
 import pytest
@@ -14,6 +15,10 @@ from ..fixtures.strings import random_word, random_first_last_name
 from ..fixtures.strings import random_address, random_number
 from comnsense_agent.data import Event, Cell, Action
 from comnsense_agent.algorithm.error_detector import ErrorDetector
+from comnsense_agent.algorithm.error_detector.column_error_detector import \
+    ColumnErrorDetector
+from comnsense_agent.algorithm.error_detector.chunk_policy import \
+    ChunkPolicy
 
 
 def attach_stats(algorithm, column):
@@ -21,7 +26,7 @@ def attach_stats(algorithm, column):
     state = algorithm.columns[column].state
     interval = algorithm.columns[column].interval
     allure.attach("points", str(stats.points))
-    allure.attach("stats", json.dumps(stats.stats, indent=2),
+    allure.attach("stats", json.dumps(stats.__getstate__(), indent=2),
                   allure.attach_type.JSON)
     allure.attach("state", str(state.value))
     allure.attach("interval", str(interval))
@@ -135,6 +140,7 @@ def test_online_query_without_response(workbook, sheetname, values, wrong):
 @allure.feature("Error Detector")
 @allure.story("Append Value To Column With Data")
 @pytest.mark.parametrize("values,wrong", FIXTURES)
+@mock.patch.object(ColumnErrorDetector, "POLICY", ChunkPolicy())
 def test_online_query_with_response(workbook, sheetname, values, wrong):
     algorithm = ErrorDetector()
 
@@ -189,9 +195,10 @@ def test_online_query_with_response(workbook, sheetname, values, wrong):
         assert_that(action, instance_of(Action))
         allure.attach("action", action.serialize(),
                       allure.attach_type.JSON)
+        # the next chunk is twice bigger
         expected = "$%s$%d:$%s$%s" % (
             column, min_row + rows_in_request,
-            column, min_row + rows_in_request * 2 - 1)
+            column, min_row + rows_in_request * 3 - 1)
         assert_that(action.range_name, equal_to(expected))
 
     with allure.step("second action response"):
@@ -269,3 +276,180 @@ def test_online_query_change_value(workbook, sheetname, values, wrong):
                       allure.attach_type.JSON)
         cell = action.cells[0][0]
         assert_that(cell.color, equal_to(0))
+
+
+@allure.feature("Error Detector")
+def test_add_values_to_stats():
+    values = [next(random.choice([random_word, random_address,
+                                  random_number])()) for _ in range(200)]
+    values += values[:100]
+    one, many = ColumnErrorDetector("A"), ColumnErrorDetector("A")
+    for value in values:
+        one.add_value_to_stats(value)
+    many.add_values_to_stats(values[:150])
+    many.add_values_to_stats(values[150:])
+    many.add_values_to_stats([])
+    assert_that(many.stats, equal_to(one.stats))
+
+
+@allure.feature("Error Detector")
+def test_ready_response_adds_new_rows(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    detector.state = ColumnErrorDetector.State.ready
+    detector.add_values_to_stats(["1", "2"])
+    detector.interval = ColumnErrorDetector.Interval(2, 3)
+    event = Event(Event.Type.RangeResponse, workbook, sheetname,
+                  [[Cell("$A$%d" % x, str(x))] for x in (2, 3, 4, 4, 5)])
+    assert_that(detector.handle(event, None), empty())
+    assert_that(detector.stats.points, equal_to(4))
+    assert_that(detector.interval, equal_to((2, 5)))
+
+
+@allure.feature("Error Detector")
+def test_ready_change_updates_stats(workbook, sheetname):
+    values = ["%d" % x for x in range(2, 22)]
+    detector = ColumnErrorDetector("A")
+    detector.state = ColumnErrorDetector.State.ready
+    detector.add_values_to_stats(values, range(2, 22))
+    detector.interval = ColumnErrorDetector.Interval(2, 21)
+
+    def change(row, value):
+        key = "$A$%d" % row
+        event = Event(Event.Type.SheetChange, workbook, sheetname,
+                      [[Cell(key, value)]], [[Cell(key, values[row - 2])]])
+        detector.handle(event, None)
+        values[row - 2] = value
+
+    change(3, "abc")  # overwritten
+    change(4, "")     # cleared
+    change(5, "17")   # the same pattern
+    expected = ColumnErrorDetector("A")
+    expected.add_values_to_stats([x for x in values if x])
+    assert_that(detector.stats, equal_to(expected.stats))
+    assert_that(detector.stats.size(3), equal_to(2))
+
+    # row out of interval was never counted
+    event = Event(Event.Type.SheetChange, workbook, sheetname,
+                  [[Cell("$A$30", "")]], [[Cell("$A$30", "1")]])
+    detector.handle(event, None)
+    assert_that(detector.stats, equal_to(expected.stats))
+
+
+@allure.feature("Error Detector")
+@mock.patch.object(ColumnErrorDetector, "POLICY", ChunkPolicy())
+def test_ready_scan_grows_chunk(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    context = get_context_with_header("A")
+    values = ["%d" % x for x in range(2, 200)]
+
+    def get_response(action):
+        begin, end = [int(x.split("$")[-1])
+                      for x in action.range_name.split(":")]
+        return Event(Event.Type.RangeResponse, workbook, sheetname,
+                     [[Cell("$A$%d" % x, values[x - 2]
+                            if x - 2 < len(values) else "")]
+                      for x in range(begin, end + 1)])
+
+    event = next(sheet_change(workbook, sheetname, "$A$2", values[0]))
+    actions = detector.handle(event, context)
+    ranges = []
+    while actions:
+        ranges.append(actions[0].range_name)
+        actions = detector.handle(get_response(actions[0]), context)
+    assert_that(ranges, equal_to(["$A$3:$A$12", "$A$13:$A$32",
+                                  "$A$33:$A$72", "$A$73:$A$152",
+                                  "$A$153:$A$312"]))
+    assert_that(detector.state, equal_to(ColumnErrorDetector.State.ready))
+    assert_that(detector.requested, none())
+    assert_that(detector.stats.points, equal_to(len(values)))
+    assert_that(detector.interval, equal_to((2, 312)))
+
+
+@allure.feature("Error Detector")
+@mock.patch.object(ColumnErrorDetector, "POLICY", ChunkPolicy())
+def test_ready_scan_shrinks_chunk(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    detector.state = ColumnErrorDetector.State.ready
+    detector.chunk = 40
+    detector.interval = ColumnErrorDetector.Interval(2, 11)
+    detector.requested = [12, 51]
+    detector.requested_at = 0  # long ago
+    event = Event(Event.Type.RangeResponse, workbook, sheetname,
+                  [[Cell("$A$%d" % x, "1")] for x in range(12, 52)])
+    actions = detector.handle(event, get_context_with_header("A"))
+    assert_that(actions, has_length(1))
+    assert_that(actions[0].range_name, equal_to("$A$52:$A$71"))
+
+    # response for other request does not continue scan
+    event = Event(Event.Type.RangeResponse, workbook, sheetname,
+                  [[Cell("$A$1", "header")]])
+    assert_that(detector.handle(event, None), empty())
+    assert_that(detector.requested, equal_to([52, 71]))
+
+
+@allure.feature("Error Detector")
+@mock.patch.object(ColumnErrorDetector, "POLICY", ChunkPolicy())
+def test_waiting_scan_ignores_other_responses(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    detector.state = ColumnErrorDetector.State.waiting_response
+    detector.requested = [2, 11]
+    detector.requested_at = 0  # long ago
+    event = Event(Event.Type.RangeResponse, workbook, sheetname,
+                  [[Cell("$A$1", "header")]])
+    detector.handle(event, get_context_with_header("A"))
+    assert_that(detector.chunk, equal_to(ChunkPolicy().min_rows))
+
+
+@allure.feature("Error Detector")
+def test_ready_change_gap_rows(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    context = get_context_with_header("A")
+
+    def change(key, value, prev_value):
+        event = Event(Event.Type.SheetChange, workbook, sheetname,
+                      [[Cell(key, value)]], [[Cell(key, prev_value)]])
+        return detector.handle(event, context)
+
+    actions = change("$A$50", "50", "")
+    assert_that(actions[0].range_name, equal_to("$A$2:$A$11"))
+    event = Event(Event.Type.RangeResponse, workbook, sheetname,
+                  [[Cell("$A$%d" % x, "%d" % x)] for x in range(2, 12)])
+    detector.handle(event, context)
+    assert_that(detector.state, equal_to(ColumnErrorDetector.State.ready))
+    assert_that(detector.interval, equal_to((2, 50)))
+
+    expected = copy.deepcopy(detector.stats)
+    # row 20 was not scanned, its value is not in stats
+    change("$A$20", "", "1234")
+    assert_that(detector.stats, equal_to(expected))
+    change("$A$30", "5678", "1234")
+    assert_that(detector.stats.points, equal_to(expected.points + 1))
+    change("$A$30", "", "5678")
+    assert_that(detector.stats, equal_to(expected))
+    # scanned row is removed
+    change("$A$5", "", "5")
+    assert_that(detector.stats.points, equal_to(expected.points - 1))
+
+
+@allure.feature("Error Detector")
+def test_ready_change_overwritten_checked(workbook, sheetname):
+    detector = ColumnErrorDetector("A")
+    detector.state = ColumnErrorDetector.State.ready
+    detector.add_values_to_stats(["%d" % x for x in range(2, 32)],
+                                 range(2, 32))
+    detector.interval = ColumnErrorDetector.Interval(2, 31)
+
+    def change(value, prev_value):
+        event = Event(Event.Type.SheetChange, workbook, sheetname,
+                      [[Cell("$A$5", value)]], [[Cell("$A$5", prev_value)]])
+        actions = detector.handle(event, None)
+        assert_that(actions, has_length(1))
+        return actions[0].cells[0][0].color
+
+    assert_that(change("abc", "5"), equal_to(3))
+    assert_that(detector.incorrect_cells[5], is_(True))
+    # still wrong, format is applied again
+    assert_that(change("xyz", "abc"), equal_to(3))
+    assert_that(detector.incorrect_cells[5], is_(True))
+    assert_that(change("7", "xyz"), equal_to(0))
+    assert_that(detector.incorrect_cells[5], is_(False))
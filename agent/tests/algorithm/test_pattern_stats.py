@@ -0,0 +1,84 @@
+import allure
+import json
+import pytest
+from hamcrest import *
+
+from comnsense_agent.algorithm.error_detector.pattern_stats import \
+    PatternStats
+from comnsense_agent.algorithm.error_detector.column_error_detector import \
+    ColumnErrorDetector
+
+
+def get_stats():
+    stats = PatternStats()
+    stats.points = 3
+    stats.add(1, "words, no numbers", occurrences=2, correct=1)
+    stats.add(1, None, occurrences=1)
+    stats.add(3, "w w", occurrences=2)
+    stats.add(3, "w w", incorrect=1)
+    return stats
+
+
+@allure.feature("Pattern Stats")
+def test_pattern_stats_get():
+    stats = get_stats()
+    assert_that(stats.get(1, "words, no numbers"), equal_to((2, 1, 0)))
+    assert_that(stats.get(1, None), equal_to((1, 0, 0)))
+    assert_that(stats.get(3, "w w"), equal_to((2, 0, 1)))
+    assert_that(stats.get(3, "w"), is_(none()))
+    assert_that(stats.get(0, "w w"), is_(none()))
+    assert_that([stats.size(x) for x in range(stats.levels)],
+                equal_to([0, 2, 0, 1]))
+
+
+@allure.feature("Pattern Stats")
+def test_pattern_stats_serialization():
+    stats = get_stats()
+    state = json.loads(json.dumps(stats.__getstate__()))
+    restored = PatternStats.__new__(PatternStats)
+    restored.__setstate__(state)
+    assert_that(restored, equal_to(stats))
+    assert_that(restored.get(3, u"w w"), equal_to((2, 0, 1)))
+
+
+@allure.feature("Pattern Stats")
+def test_pattern_stats_equal_in_any_order():
+    one, another = PatternStats(), PatternStats()
+    one.add(3, "w", 1)
+    one.add(3, "0", 2)
+    another.add(3, "0", 2)
+    another.add(3, "w", 1)
+    assert_that(one, equal_to(another))
+    another.add(3, "w", 1)
+    assert_that(one, is_not(equal_to(another)))
+
+
+@allure.feature("Pattern Stats")
+def test_pattern_stats_interned():
+    one, another = PatternStats(), PatternStats()
+    one.add(3, "".join(["w", " ", "0"]))
+    another.add(3, u"w 0")
+    assert_that(one._patterns[3][0], same_instance(another._patterns[3][0]))
+
+
+@allure.feature("Pattern Stats")
+def test_column_error_detector_state():
+    detector = ColumnErrorDetector("A")
+    detector.add_values_to_stats(["abc", "abc", "12"])
+    restored = ColumnErrorDetector("A")
+    restored.__setstate__(json.loads(json.dumps(detector.__getstate__())))
+    assert_that(restored.stats, equal_to(detector.stats))
+
+
+@allure.feature("Pattern Stats")
+def test_pattern_stats_remove():
+    stats = get_stats()
+    stats.remove(3, "w w")
+    assert_that(stats.get(3, "w w"), equal_to((1, 0, 1)))
+    assert_that(stats.size(3), equal_to(1))
+    stats.remove(3, "w w", 5)
+    assert_that(stats.get(3, "w w"), equal_to((0, 0, 1)))
+    assert_that(stats.size(3), equal_to(0))
+    stats.remove(3, "unknown")
+    stats.add(3, "w w", 1)
+    assert_that(stats.size(3), equal_to(1))
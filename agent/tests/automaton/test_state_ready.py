@@ -9,15 +9,30 @@ from ..fixtures.excel import before_close, workbook_open
 from ..fixtures.excel import random_sheet_change, random_range_response
 
 from comnsense_agent.automaton.ready import Ready
+from comnsense_agent.data import Action, Cell, Event
+from comnsense_agent.multiplexer.change_coalescer import ChangeCoalescer
+from comnsense_agent.multiplexer.range_broker import RangeBroker
+from comnsense_agent.sheet_mirror import SheetMirror
 from comnsense_agent.message import Message
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_MSGPACK
+from comnsense_agent.utils.serialization import PROTOCOL_COLUMNAR
 
 
-def get_context():
+def get_action(name):
+    return Action.change("workbook", "sheet", [[Cell("$A$1", name)]])
+
+
+def get_context(protocol=PROTOCOL_JSON):
     context = mock.Mock()
+    context.protocol = protocol
+    context.broker = RangeBroker()
+    context.mirror = SheetMirror()
+    context.changes = ChangeCoalescer(context.mirror)
     first = mock.Mock()
-    first.handle.return_value = ["first"]
+    first.handle.return_value = [get_action("first")]
     second = mock.Mock()
-    second.handle.return_value = ["second"]
+    second.handle.return_value = [get_action("second")]
     context.handlers.return_value = [first, second]
     return context
 
@@ -48,9 +63,12 @@ def test_state_ready_ignore(workbook):
 @allure.story("Ready")
 @pytest.mark.parametrize("event", [random_range_response, random_sheet_change],
                          ids=["RangeResponse", "SheetChange"])
-def test_state_ready(workbook, sheetname, event):
+@pytest.mark.parametrize("protocol", [PROTOCOL_JSON, PROTOCOL_MSGPACK,
+                                      PROTOCOL_COLUMNAR],
+                         ids=["json", "msgpack", "columnar"])
+def test_state_ready(workbook, sheetname, event, protocol):
     event = Message.event(next(event(workbook, sheetname)))
-    context = get_context()
+    context = get_context(protocol)
     node = Ready()
     actions, state = node.next(context, event)
     assert_that(state, equal_to(node))
@@ -58,4 +76,95 @@ def test_state_ready(workbook, sheetname, event):
     assert_that(actions, has_length(1))
     action = actions[0]
     assert_that(action, instance_of(Message))
-    assert_that(action.payload, equal_to("first"))
+    assert_that(action.payload,
+                equal_to(get_action("first").serialize(protocol=protocol)))
+    assert_that(Action.deserialize(action.payload),
+                equal_to(get_action("first")))
+
+
+@allure.feature("Automaton")
+@allure.story("Ready - Batch")
+def test_state_ready_batch(workbook, sheetname):
+    event = Message.event(next(random_sheet_change(workbook, sheetname)))
+    answer = [Action.change(workbook, sheetname, [[Cell("$A$1", "1")]]),
+              Action.change(workbook, "another", [[Cell("$A$2", "2")]])]
+    context = get_context()
+    context.handlers.return_value[0].handle.return_value = answer
+    node = Ready()
+    actions, state = node.next(context, event)
+    assert_that(state, equal_to(node))
+    assert_that(actions, has_length(1))
+    assert_that(actions[0].is_actions(), is_(True))
+    assert_that(Action.deserialize_many(actions[0].payload),
+                equal_to(answer))
+
+
+@allure.feature("Automaton")
+@allure.story("Ready - Range Broker")
+def test_state_ready_range_broker(workbook, sheetname):
+    event = Message.event(next(random_sheet_change(workbook, sheetname)))
+    context = get_context()
+    handler = context.handlers.return_value[0]
+    handler.handle.return_value = [
+        Action.request(workbook, sheetname, "$A$2:$A$3"),
+        Action.request(workbook, sheetname, "$B$2:$B$3")]
+    node = Ready()
+    actions, state = node.next(context, event)
+    assert_that(actions, has_length(1))
+    assert_that(Action.deserialize(actions[0].payload).range_name,
+                equal_to("$A$2:$B$3"))
+
+    handler.handle.return_value = []
+    response = Event(Event.Type.RangeResponse, workbook, sheetname,
+                     [[Cell("$A$2", "a2"), Cell("$B$2", "b2")],
+                      [Cell("$A$3", "a3"), Cell("$B$3", "b3")]])
+    actions, state = node.next(context, Message.event(response))
+    parts = [x[1][0] for x in handler.handle.mock_calls[1:]]
+    assert_that([[[y.key for y in x] for x in part.cells] for part in parts],
+                equal_to([[["$A$2"], ["$A$3"]], [["$B$2"], ["$B$3"]]]))
+
+
+@allure.feature("Automaton")
+@allure.story("Ready - Change Coalescer")
+def test_state_ready_change_coalescer(workbook, sheetname):
+    event = Message.event(next(random_sheet_change(workbook, sheetname)))
+    context = get_context()
+    handler = context.handlers.return_value[0]
+    handler.handle.return_value = [
+        Action.change(workbook, sheetname, [[Cell("$A$1", "1", color=3)]]),
+        Action.change(workbook, sheetname, [[Cell("$B$1", "2", color=3)]])]
+    node = Ready()
+    actions, state = node.next(context, event)
+    assert_that(actions, has_length(1))
+    action = Action.deserialize(actions[0].payload)
+    assert_that([x.key for x in action.cells[0]],
+                equal_to(["$A$1", "$B$1"]))
+
+    event = Event(Event.Type.SheetChange, workbook, sheetname,
+                  [[Cell("$C$1", "3")]], [[Cell("$C$1", "")]])
+    actions, state = node.next(context, Message.event(event))
+    assert_that(actions, empty())
+
+
+@allure.feature("Automaton")
+@allure.story("Ready - Sheet Mirror")
+def test_state_ready_known_range(workbook, sheetname):
+    response = Event(Event.Type.RangeResponse, workbook, sheetname,
+                     [[Cell("$A$1", "a1")], [Cell("$A$2", "a2")]])
+    context = get_context()
+    handler = context.handlers.return_value[0]
+    handler.handle.return_value = []
+    node = Ready()
+    node.next(context, Message.event(response))
+
+    handler.handle.side_effect = [
+        [Action.request(workbook, sheetname, "$A$1:$A$2")],
+        [Action.request(workbook, sheetname, "$A$3")]]
+    event = Message.event(next(random_sheet_change(workbook, sheetname)))
+    actions, state = node.next(context, event)
+    assert_that(handler.handle.mock_calls, has_length(3))
+    known = handler.handle.mock_calls[2][1][0]
+    assert_that([x[0].value for x in known.cells], equal_to(["a1", "a2"]))
+    assert_that(actions, has_length(1))
+    assert_that(Action.deserialize(actions[0].payload).range_name,
+                equal_to("$A$3"))
@@ -9,7 +9,9 @@ from ..fixtures.excel import workbook_open
 from comnsense_agent.automaton.waiting_workbook import WaitingWorkbookID
 from comnsense_agent.automaton import State
 from comnsense_agent.message import Message
-from comnsense_agent.data import Request
+from comnsense_agent.data import Request, Event
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_VERSION
 
 
 def get_context(workbook=None, ready=False):
@@ -61,3 +63,17 @@ def test_waiting_workbook_event_ready(event):
     assert_that(context.workbook, event.workbook)
     assert_that(answer, is_(none()))
     assert_that(state, is_(State.Ready))
+
+
+@allure.feature("Automaton")
+@allure.story("WaitingWorkbookID - Protocol")
+@pytest.mark.parametrize("protocol, expected",
+                         [(None, PROTOCOL_JSON),
+                          (PROTOCOL_VERSION, PROTOCOL_VERSION),
+                          (PROTOCOL_VERSION + 1, PROTOCOL_VERSION)])
+def test_waiting_workbook_protocol(workbook, protocol, expected):
+    context = get_context()
+    event = Event(Event.Type.WorkbookOpen, workbook, None, None, None,
+                  protocol)
+    State.WaitingWorkbookID.next(context, Message.event(event))
+    assert_that(context.protocol, equal_to(expected))
@@ -10,6 +10,9 @@ from ..fixtures.strings import random_string
 from comnsense_agent.data import Event, Action
 from comnsense_agent.data import Cell
 from comnsense_agent.data.data import Data
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_MSGPACK
+from comnsense_agent.utils.serialization import PROTOCOL_COLUMNAR
 
 
 @allure.feature("Data")
@@ -194,3 +197,27 @@ def test_action_repr(workbook, sheetname, action_type, content):
     action = Action(action_type, workbook, sheetname, content)
     assert_that(len(repr(action)), greater_than(0))
     assert_that(len(str(action)), greater_than(0))
+
+
+@allure.feature("Data")
+@pytest.mark.parametrize("action_type, content", FIXTURES)
+@pytest.mark.parametrize("protocol", [PROTOCOL_MSGPACK, PROTOCOL_COLUMNAR],
+                         ids=["msgpack", "columnar"])
+def test_action_msgpack(workbook, sheetname, action_type, content, protocol):
+    action = Action(action_type, workbook, sheetname, content)
+    serialized = action.serialize(protocol=protocol)
+    assert_that(len(serialized), less_than(len(action.serialize())))
+    assert_that(Action.deserialize(serialized), equal_to(action))
+
+
+@allure.feature("Data")
+def test_action_serialize_many(workbook, sheetname):
+    actions = [Action(action_type, workbook, sheetname, content)
+               for action_type, content in FIXTURES]
+    serialized = Action.serialize_many(actions)
+    allure.attach("actions", serialized, allure.attach_type.JSON)
+    assert_that(json.loads(serialized), has_length(len(actions)))
+    assert_that(Action.deserialize_many(serialized), equal_to(actions))
+    for protocol in (PROTOCOL_MSGPACK, PROTOCOL_COLUMNAR):
+        serialized = Action.serialize_many(actions, protocol)
+        assert_that(Action.deserialize_many(serialized), equal_to(actions))
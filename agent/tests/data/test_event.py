@@ -7,6 +7,9 @@ from ..fixtures.excel import workbook, sheetname
 from comnsense_agent.data import Event
 from comnsense_agent.data import Cell
 from comnsense_agent.data.data import Data
+from comnsense_agent.utils.serialization import PROTOCOL_JSON
+from comnsense_agent.utils.serialization import PROTOCOL_MSGPACK
+from comnsense_agent.utils.serialization import PROTOCOL_COLUMNAR
 
 
 @allure.feature("Data")
@@ -162,9 +165,81 @@ CELLS = [
                                   Event.Type.RangeResponse])
 @pytest.mark.parametrize("cells", CELLS)
 @pytest.mark.parametrize("prev_cells", CELLS)
-def test_event_serialization(type, workbook, sheetname, cells, prev_cells):
+@pytest.mark.parametrize("protocol", [PROTOCOL_JSON, PROTOCOL_MSGPACK,
+                                      PROTOCOL_COLUMNAR],
+                         ids=["json", "msgpack", "columnar"])
+def test_event_serialization(type, workbook, sheetname, cells, prev_cells,
+                             protocol):
     event = Event(type, workbook, sheetname, cells, prev_cells)
-    serialized = event.serialize()
-    allure.attach("serialized", serialized, allure.attach_type.JSON)
+    serialized = event.serialize(protocol=protocol)
+    allure.attach("serialized", repr(serialized))
     deserialized = Event.deserialize(serialized)
     assert_that(deserialized, equal_to(event))
+
+
+@allure.feature("Data")
+@pytest.mark.parametrize("protocol", [PROTOCOL_JSON, PROTOCOL_MSGPACK,
+                                      PROTOCOL_COLUMNAR],
+                         ids=["json", "msgpack", "columnar"])
+def test_event_protocol(workbook, protocol):
+    event = Event(Event.Type.WorkbookOpen, workbook, None, None, None,
+                  protocol)
+    deserialized = Event.deserialize(event.serialize())
+    assert_that(deserialized.protocol, equal_to(protocol))
+    assert_that(Event(Event.Type.WorkbookOpen, workbook).protocol,
+                equal_to(PROTOCOL_JSON))
+
+
+@allure.feature("Data")
+def test_event_index(workbook, sheetname):
+    cells = [[Cell("$A$1", "1"), Cell("$B$1", "2")],
+             [Cell("$A$2", "3"), Cell("$B$2", "4")]]
+    prev_cells = [[Cell("$B$2", "5")]]
+    event = Event(Event.Type.SheetChange, workbook, sheetname,
+                  cells, prev_cells)
+    assert_that(event.rows, equal_to({"1": cells[0], "2": cells[1]}))
+    assert_that(event.columns["B"], equal_to([cells[0][1], cells[1][1]]))
+    assert_that(event.columns, same_instance(event.columns))
+    assert_that(event.prev_columns, equal_to({"B": prev_cells[0]}))
+    assert_that(event.get_cell("$B$1"), same_instance(cells[0][1]))
+    assert_that(event.get_prev_cell("$B$2"), same_instance(prev_cells[0][0]))
+    assert_that(event.get_prev_cell("$A$1"), is_(none()))
+    assert_that(event, equal_to(Event(Event.Type.SheetChange, workbook,
+                                      sheetname, cells, prev_cells)))
+
+
+@allure.feature("Data")
+def test_event_index_invalidate(workbook, sheetname):
+    cells = [[Cell("$A$1", "1")]]
+    event = Event(Event.Type.SheetChange, workbook, sheetname, cells)
+    assert_that(event.columns, has_key("A"))
+    cells[0][0].key = "$C$1"
+    event.invalidate()
+    assert_that(event.columns, equal_to({"C": cells[0]}))
+    assert_that(event.get_cell("$C$1"), same_instance(cells[0][0]))
+
+
+@allure.feature("Data")
+@pytest.mark.parametrize("protocol", [PROTOCOL_JSON, PROTOCOL_COLUMNAR],
+                         ids=["json", "columnar"])
+def test_event_lazy_cells(workbook, sheetname, protocol):
+    cells = [[Cell("$A$1", "1")]]
+    event = Event(Event.Type.SheetChange, workbook, sheetname, cells)
+    deserialized = Event.deserialize(event.serialize(protocol=protocol))
+    assert_that(deserialized._raw, has_key("_cells"))
+    assert_that(deserialized.workbook, equal_to(workbook))
+    assert_that(deserialized.sheet, equal_to(sheetname))
+    assert_that(deserialized._raw, has_key("_cells"))
+    assert_that(deserialized.cells, equal_to(cells))
+    assert_that(deserialized._raw, equal_to({}))
+
+
+@allure.feature("Data")
+def test_event_lazy_equal(workbook, sheetname):
+    cells = [[Cell("$A$1", "1")]]
+    event = Event(Event.Type.SheetChange, workbook, sheetname, cells)
+    first = Event.deserialize(event.serialize())
+    second = Event.deserialize(event.serialize())
+    assert_that(first, equal_to(second))
+    assert_that(first, equal_to(event))
+    assert_that(event, equal_to(Event.deserialize(event.serialize())))
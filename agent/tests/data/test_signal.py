@@ -29,6 +29,7 @@ def test_signal_constructor(code, data, raises):
 
 FIXTURES = [(Signal.Code.Stop, None),
             (Signal.Code.Ready, None),
+            (Signal.Code.Heartbeat, None),
             (Signal.Code.Ready, 1),
             (Signal.Code.Ready, str(uuid.uuid1()))]
 
@@ -86,6 +87,7 @@ def test_signal_repr(code, data):
 
 FIXTURES = [(Signal.Code.Stop, None),
             (Signal.Code.Ready, None),
+            (Signal.Code.Heartbeat, None),
             (Signal.Code.Ready, 1),
             (Signal.Code.Ready, str(uuid.uuid1()))]
 
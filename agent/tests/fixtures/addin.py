@@ -26,13 +26,17 @@ def addin(scenario, host, port):
             iterator = self.scenario.__iter__()
 
             def on_recv(msg):
-                if not msg.is_action():
+                if msg.is_action():
+                    actions = [Action.deserialize(msg.payload)]
+                elif msg.is_actions():
+                    actions = Action.deserialize_many(msg.payload)
+                else:
                     return
 
-                action = Action.deserialize(msg.payload)
-                answer = self.scenario.apply(action)
-                if answer:
-                    stream.send_multipart(list(Message.event(answer)))
+                for action in actions:
+                    answer = self.scenario.apply(action)
+                    if answer:
+                        stream.send_multipart(list(Message.event(answer)))
 
             def send():
                 event = next(iterator)
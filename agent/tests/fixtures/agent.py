@@ -22,6 +22,8 @@ def agent(host, port, tmpdir, request):
     with allure.step("start agent: %s" % connection):
         allure.attach("command", " ".join(cmd))
         env = dict(copy.deepcopy(os.environ).iteritems())
+        # contexts are saved in home directory, keep tests isolated
+        env["HOME"] = env["USERPROFILE"] = tmpdir.strpath
         allure.attach("env", json.dumps(env, indent=2))
         proc = subprocess.Popen(
             cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
@@ -0,0 +1,71 @@
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.data import Action, Cell, Event
+
+from comnsense_agent.multiplexer.change_coalescer import ChangeCoalescer
+from comnsense_agent.sheet_mirror import SheetMirror
+
+
+def change(*cells, **kwargs):
+    return Action.change("workbook", kwargs.get("sheet", "sheet"),
+                         [[x] for x in cells])
+
+
+def keys(action):
+    return [[x.key for x in row] for row in action.cells]
+
+
+@allure.feature("Multiplexer")
+@allure.story("Change Coalescer")
+def test_change_coalescer_merge():
+    request = Action.request("workbook", "sheet", "$A$1:$A$10")
+    coalescer = ChangeCoalescer(SheetMirror())
+    answer = coalescer.merge([change(Cell("$A$1", "1")), request,
+                              change(Cell("$B$1", "2"), Cell("$A$2", "3")),
+                              change(Cell("$A$1", "4"), sheet="another")])
+    assert_that(answer, has_length(3))
+    assert_that(keys(answer[0]), equal_to([["$A$1", "$B$1"], ["$A$2"]]))
+    assert_that(answer[1], same_instance(request))
+    assert_that(answer[2].sheet, equal_to("another"))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Change Coalescer")
+def test_change_coalescer_latest_wins():
+    coalescer = ChangeCoalescer(SheetMirror())
+    answer = coalescer.merge([change(Cell("$A$1", "1", color=3)),
+                              change(Cell("$A$1", "1", color=0))])
+    assert_that(answer, has_length(1))
+    assert_that(answer[0].cells[0][0].color, equal_to(0))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Change Coalescer")
+def test_change_coalescer_drops_known():
+    mirror = SheetMirror()
+    mirror.observe(Event(Event.Type.RangeResponse, "workbook", "sheet",
+                         [[Cell("$A$1", "1", color=0)], [Cell("$A$2", "2")]]))
+    coalescer = ChangeCoalescer(mirror)
+    answer = coalescer.merge([change(Cell("$A$1", "1", color=0),
+                                     Cell("$A$2", "2", color=0))])
+    assert_that(keys(answer[0]), equal_to([["$A$2"]]))
+    assert_that(coalescer.merge([change(Cell("$A$2", "2", color=0))]),
+                empty())
+    assert_that(coalescer.merge([change(Cell("$A$2", "2", color=3))]),
+                has_length(1))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Change Coalescer")
+def test_change_coalescer_observe_updates():
+    coalescer = ChangeCoalescer(SheetMirror())
+    coalescer.merge([change(Cell("$A$1", "1", color=3))])
+    coalescer.mirror.observe(Event(
+        Event.Type.SheetChange, "workbook", "sheet",
+        [[Cell("$A$1", "2")]], [[Cell("$A$1", "1")]]))
+    assert_that(coalescer.merge([change(Cell("$A$1", "2", color=3))]),
+                empty())
+    assert_that(coalescer.merge([change(Cell("$A$1", "1", color=3))]),
+                has_length(1))
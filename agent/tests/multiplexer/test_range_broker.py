@@ -0,0 +1,125 @@
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.data import Action, Cell, Event
+
+from comnsense_agent.multiplexer.range_broker import RangeBroker
+
+
+def req(name, sheet="sheet", flags=None):
+    return Action.request("workbook", sheet, name, flags)
+
+
+def names(actions):
+    return [x.range_name if x.type == Action.Type.RangeRequest else None
+            for x in actions]
+
+
+FIXTURES = [
+    ([],                                   []),
+    (["$A$1:$A$10"],                       ["$A$1:$A$10"]),
+    (["$A$1:$A$10", "$B$1:$B$10"],         ["$A$1:$B$10"]),
+    (["$A$1:$A$10", "$A$1:$A$10"],         ["$A$1:$A$10"]),
+    (["$A$1:$A$10", "$A$5:$A$20"],         ["$A$1:$A$20"]),
+    (["$A$1:$A$10", "$A$11"],              ["$A$1:$A$11"]),
+    (["$A$1:$A$10", "$A$3:$A$5"],          ["$A$1:$A$10"]),
+    (["$A$1:$A$10", "$C$1:$C$10"],         ["$A$1:$A$10", "$C$1:$C$10"]),
+    (["$A$1:$A$10", "$B$2:$B$11"],         ["$A$1:$A$10", "$B$2:$B$11"]),
+    (["$A$1:$A$10", "$C$1:$C$10",
+      "$B$1:$B$10"],                       ["$A$1:$C$10"]),
+    (["$A$1:$E$1", "$B$2:$B$11",
+      "$C$2:$C$11", "$D$2:$D$11"],         ["$A$1:$E$1", "$B$2:$D$11"])]
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+@pytest.mark.parametrize("requests,expected", FIXTURES)
+def test_range_broker_merge(requests, expected):
+    broker = RangeBroker()
+    assert_that(names(broker.merge([req(x) for x in requests])),
+                equal_to(expected))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_merge_keeps_order():
+    change = Action.change("workbook", "sheet", [[Cell("$A$1", "1")]])
+    broker = RangeBroker()
+    answer = broker.merge([req("$A$2"), change, req("$A$3")])
+    assert_that(names(answer), equal_to(["$A$2:$A$3", None]))
+    assert_that(answer[1], same_instance(change))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_merge_same_sheet_and_flags():
+    broker = RangeBroker()
+    answer = broker.merge([req("$A$1"), req("$A$2", sheet="another"),
+                           req("$A$3", flags=Action.Flags.RequestColor),
+                           req("$A$2", flags=Action.Flags.RequestColor)])
+    assert_that(names(answer), equal_to(["$A$1", "$A$2", "$A$2:$A$3"]))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_split():
+    broker = RangeBroker()
+    broker.merge([req("$A$1:$A$2"), req("$B$1:$B$2")])
+    response = Event(Event.Type.RangeResponse, "workbook", "sheet",
+                     [[Cell("$A$1", "a1"), Cell("$B$1", "b1")],
+                      [Cell("$A$2", "a2"), Cell("$B$2", "b2")]])
+    parts = broker.split(response)
+    assert_that([[[y.key for y in x] for x in part.cells] for part in parts],
+                equal_to([[["$A$1"], ["$A$2"]], [["$B$1"], ["$B$2"]]]))
+    assert_that(broker.pending, has_length(0))
+    assert_that(broker.split(response), equal_to([response]))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_split_other_events():
+    broker = RangeBroker()
+    broker.merge([req("$A$1"), req("$A$2")])
+    change = Event(Event.Type.SheetChange, "workbook", "sheet",
+                   [[Cell("$A$1", "1")]], [[Cell("$A$1", "")]])
+    other = Event(Event.Type.RangeResponse, "workbook", "sheet",
+                  [[Cell("$C$1", "1")]])
+    assert_that(broker.split(change), equal_to([change]))
+    assert_that(broker.split(other), equal_to([other]))
+    assert_that(broker.pending, has_length(1))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_split_exact_bounds():
+    broker = RangeBroker()
+    broker.merge([req("$A$1:$A$2"), req("$B$1:$B$2")])
+    inner = Event(Event.Type.RangeResponse, "workbook", "sheet",
+                  [[Cell("$A$1", "a1")], [Cell("$A$2", "a2")]])
+    assert_that(broker.split(inner), equal_to([inner]))
+    assert_that(broker.pending, has_length(1))
+    cells = [[Cell("$A$1", "a1"), Cell("$B$1", "b1")],
+             [Cell("$A$2", "a2"), Cell("$B$2", "b2")]]
+    other = Event(Event.Type.RangeResponse, "workbook", "another", cells)
+    assert_that(broker.split(other), equal_to([other]))
+    response = Event(Event.Type.RangeResponse, "workbook", "sheet", cells)
+    assert_that(broker.split(response), has_length(2))
+    assert_that(broker.pending, has_length(0))
+
+
+@allure.feature("Multiplexer")
+@allure.story("Range Broker")
+def test_range_broker_split_skips_empty_parts():
+    broker = RangeBroker()
+    broker.merge([req("$A$1"), req("$A$2"), req("$A$3"), req("$A$5")])
+    broker.merge([req("$A$1:$A$2"), req("$A$3")])
+    assert_that(broker.pending, has_length(1))
+    response = Event(Event.Type.RangeResponse, "workbook", "sheet",
+                     [[Cell("$A$1", "1")], [Cell("$A$3", "3")]])
+    parts = broker.split(response)
+    assert_that([[[y.key for y in x] for x in part.cells] for part in parts],
+                equal_to([[["$A$1"]], [["$A$3"]]]))
+    parts = broker.split(response)
+    assert_that(parts, has_length(2))
+    assert_that(broker.pending, has_length(0))
@@ -110,10 +110,11 @@ def connection(host, port, request):
 @allure.feature("Socket")
 @allure.story("ZMQ Echo Server on ZMQRouter")
 @pytest.mark.timeout(1)
-def test_zmq_socket_echo(io_loop, connection, message, client):
+@pytest.mark.parametrize("copy", [True, False], ids=["copy", "zerocopy"])
+def test_zmq_socket_echo(io_loop, connection, message, client, copy):
 
     def server(connection, loop):
-        socket = ZMQRouter()
+        socket = ZMQRouter(copy=copy)
         if connection is None:
             address = socket.bind_unused_port(loop)
         else:
@@ -4,7 +4,8 @@ import mock
 from hamcrest import *
 
 from comnsense_agent.message import Message
-from comnsense_agent.data import Signal
+from comnsense_agent.data import Cell, Event, Signal
+from comnsense_agent.utils.serialization import PROTOCOL_VERSION
 
 from .fixtures.network import port, host
 from .fixtures.excel import workbook
@@ -66,14 +67,16 @@ def dummy_client(monkeypatch):
 def dummy_worker(monkeypatch):
     monkeypatch.setattr(
         "comnsense_agent.worker.create_new_worker",
-        lambda ident, bind: mock.Mock())
+        lambda ident, bind, **kwargs: mock.Mock())
     yield None
     monkeypatch.undo()
 
 
 @pytest.fixture(scope="module")
 def loop():
-    return mock.Mock()
+    loop = mock.Mock()
+    loop.time.return_value = 0
+    return loop
 
 
 @pytest.fixture
@@ -213,6 +216,17 @@ def test_backend_routine_action(agent, action_msg):
     assert_that(agent.client.send.mock_calls, equal_to([]))
 
 
+@allure.feature("Agent")
+def test_backend_routine_actions(agent, workbook):
+    actions_msg = Message.actions("[]", workbook)
+    actions_msg.route = "worker"
+    agent.backend_routine(actions_msg)
+    assert_that(actions_msg.route, equal_to(Message.NO_ROUTE))
+    assert_that(agent.frontend.send.mock_calls,
+                equal_to([mock.call(actions_msg)]))
+    assert_that(agent.client.send.mock_calls, equal_to([]))
+
+
 @allure.feature("Agent")
 def test_backend_routine_request(agent, request_msg):
     agent.backend_routine(request_msg)
@@ -220,3 +234,294 @@ def test_backend_routine_request(agent, request_msg):
     assert_that(agent.backend.send.mock_calls, equal_to([]))
     assert_that(agent.client.send.mock_calls,
                 equal_to([mock.call(request_msg)]))
+
+
+@allure.feature("Agent")
+def test_frontend_routine_route(agent, event_msg):
+    agent.frontend_routine(event_msg)
+    worker = agent.workers[event_msg.ident]
+    assert_that(event_msg.route, equal_to(worker.ident))
+    assert_that(agent.clients,
+                has_entry(worker.ident, set([event_msg.ident])))
+
+
+@allure.feature("Agent")
+def test_frontend_routine_worker_not_ready(agent, event_msg):
+    worker = mock.Mock()
+    worker.ready = False
+    agent.pool.acquire = mock.Mock(return_value=worker)
+
+    agent.frontend_routine(event_msg)
+    assert_that(agent.backend.send.mock_calls, equal_to([]))
+    assert_that(agent.pending, has_key(event_msg.ident))
+    assert_that(agent.pending[event_msg.ident], contains(event_msg))
+
+    agent.pool.on_ready = mock.Mock(return_value=worker)
+    agent.backend_routine(Message.signal(Signal.ready(), worker.ident))
+    assert_that(agent.backend.send.mock_calls,
+                equal_to([mock.call(event_msg)]))
+    assert_that(agent.pending, is_not(has_key(event_msg.ident)))
+
+
+@allure.feature("Agent")
+def test_backend_routine_routed_action(agent, action_msg):
+    action_msg.route = "worker"
+    agent.backend_routine(action_msg)
+    assert_that(action_msg.route, equal_to(Message.NO_ROUTE))
+    assert_that(agent.frontend.send.mock_calls,
+                equal_to([mock.call(action_msg)]))
+
+
+@allure.feature("Agent")
+def test_client_routine_routed_response(agent, event_msg, response_msg):
+    agent.frontend_routine(event_msg)
+    agent.client_routine(response_msg)
+    worker = agent.workers[event_msg.ident]
+    assert_that(response_msg.route, equal_to(worker.ident))
+
+
+@allure.feature("Agent")
+def test_pending_ready_timeout_canceled(agent, event_msg):
+    worker = mock.Mock()
+    worker.ready = False
+    agent.pool.acquire = mock.Mock(return_value=worker)
+
+    agent.frontend_routine(event_msg)
+    timeout = agent.ready_timeouts[worker.ident]
+    agent.pool.on_ready = mock.Mock(return_value=worker)
+    agent.backend_routine(Message.signal(Signal.ready(), worker.ident))
+    agent.loop.remove_timeout.assert_any_call(timeout)
+    assert_that(agent.ready_timeouts, is_not(has_key(worker.ident)))
+
+
+@allure.feature("Agent")
+def test_pending_ready_timeout(agent, event_msg):
+    worker = mock.Mock()
+    worker.ready = False
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.pool.release = mock.Mock()
+
+    agent.frontend_routine(event_msg)
+    agent.on_ready_timeout(worker)
+    assert_that(agent.pending, is_not(has_key(event_msg.ident)))
+    assert_that(agent.workers, is_not(has_key(event_msg.ident)))
+    assert_that(agent.pool.release.mock_calls, equal_to([mock.call(worker)]))
+    assert_that(agent.backend.send.mock_calls, equal_to([]))
+
+
+@allure.feature("Agent")
+def test_pending_bounded(agent, event_msg, workbook):
+    worker = mock.Mock()
+    worker.ready = False
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.max_pending = 3
+
+    messages = [Message.event("event%d" % i, workbook) for i in range(5)]
+    for msg in messages:
+        agent.frontend_routine(msg)
+    assert_that(list(agent.pending[workbook]), equal_to(messages[:3]))
+
+    agent.pool.on_ready = mock.Mock(return_value=worker)
+    agent.backend_routine(Message.signal(Signal.ready(), worker.ident))
+    assert_that(agent.backend.send.mock_calls,
+                equal_to([mock.call(x) for x in messages[:3]]))
+
+
+@allure.feature("Agent")
+def test_shared_worker(agent):
+    worker = mock.Mock()
+    worker.ready = False
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.pool.release = mock.Mock()
+
+    first = Message.event("event", "first")
+    second = Message.event("event", "second")
+    agent.frontend_routine(first)
+    agent.frontend_routine(second)
+    assert_that(agent.clients,
+                has_entry(worker.ident, set(["first", "second"])))
+    assert_that(agent.ready_timeouts, has_length(1))
+
+    agent.pool.on_ready = mock.Mock(return_value=worker)
+    agent.backend_routine(Message.signal(Signal.ready(), worker.ident))
+    assert_that(agent.backend.send.mock_calls,
+                contains_inanyorder(mock.call(first), mock.call(second)))
+    assert_that(agent.pool.release.mock_calls, equal_to([]))
+
+
+@allure.feature("Agent")
+def test_agent_threaded_mode(monkeypatch, fe_connection, server_address,
+                             loop):
+    import comnsense_agent.agent
+    monkeypatch.setattr(
+        "comnsense_agent.worker.create_thread_worker",
+        lambda ident, bind, **kwargs: mock.Mock())
+    agent = comnsense_agent.agent.Agent(
+        fe_connection, server_address, loop, mode="threaded")
+    assert_that(agent.backend_bind, starts_with("inproc://"))
+    assert_that(agent.backend.bind.mock_calls,
+                equal_to([mock.call(agent.backend_bind, loop)]))
+    assert_that(agent.pool.connection, equal_to(agent.backend_bind))
+
+
+@allure.feature("Agent")
+def test_heartbeat(agent):
+    ready, busy = mock.Mock(), mock.Mock()
+    ready.ready, busy.ready = True, False
+    agent.pool.workers = {ready.ident: ready, busy.ident: busy}
+    agent.loop.time.return_value = 100
+    agent.loop.call_later.reset_mock()
+    agent.heartbeat()
+    assert_that(agent.backend.send.mock_calls,
+                equal_to([mock.call(
+                    Message.signal(Signal.heartbeat(), ready.ident))]))
+    assert_that(agent.loop.call_later.mock_calls,
+                equal_to([mock.call(agent.heartbeat_interval,
+                                    agent.heartbeat)]))
+
+
+@allure.feature("Agent")
+def test_heartbeat_restart(agent, workbook):
+    dead, new = mock.Mock(), mock.Mock()
+    dead.ready, new.ready = True, True
+    event = Message.event(Event(Event.Type.WorkbookOpen, workbook), "addin")
+    agent.pool.acquire = mock.Mock(return_value=dead)
+    agent.pool.release = mock.Mock()
+    agent.frontend_routine(event)
+    agent.backend.send.reset_mock()
+
+    agent.loop.time.return_value = 100
+    agent.backend_routine(Message.signal(Signal.heartbeat(), dead.ident))
+    agent.pool.workers = {dead.ident: dead}
+    agent.pool.acquire.return_value = new
+    agent.loop.time.return_value = \
+        101 + agent.heartbeat_interval * agent.HEARTBEAT_LIVENESS
+    agent.heartbeat()
+
+    assert_that(agent.pool.release.mock_calls, equal_to([mock.call(dead)]))
+    assert_that(agent.workers, has_entry("addin", new))
+    assert_that(agent.backend.send.mock_calls, has_length(1))
+    restore = agent.backend.send.mock_calls[0][1][0]
+    assert_that(restore.route, equal_to(new.ident))
+    assert_that(restore.ident, equal_to("addin"))
+    assert_that(Event.deserialize(restore.payload).workbook,
+                equal_to(workbook))
+
+
+@allure.feature("Agent")
+def test_runtime_finished(agent, workbook):
+    worker = mock.Mock()
+    worker.ready = True
+    event = Message.event(Event(Event.Type.WorkbookOpen, workbook), "addin")
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.frontend_routine(event)
+    stop = Message.signal(Signal.stop(), "addin")
+    stop.route = worker.ident
+    agent.backend_routine(stop)
+    assert_that(agent.workers, is_not(has_key("addin")))
+    assert_that(agent.workbooks, is_not(has_key("addin")))
+    assert_that(agent.protocols, is_not(has_key("addin")))
+    assert_that(agent.clients, is_not(has_key(worker.ident)))
+
+
+@allure.feature("Agent")
+def test_evict_idle(agent, workbook):
+    worker = mock.Mock()
+    worker.ready = True
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.loop.time.return_value = 100
+    agent.frontend_routine(
+        Message.event(Event(Event.Type.WorkbookOpen, workbook), "addin"))
+    agent.backend.send.reset_mock()
+
+    agent.loop.time.return_value = 100 + agent.idle_timeout
+    agent.reap()
+    assert_that(agent.backend.send.mock_calls, equal_to([]))
+
+    agent.loop.time.return_value = 101 + agent.idle_timeout
+    agent.reap()
+    stop = Message.signal(Signal.stop(), "addin")
+    stop.route = worker.ident
+    assert_that(agent.backend.send.mock_calls, equal_to([mock.call(stop)]))
+    assert_that(agent.workers, is_not(has_key("addin")))
+    assert_that(agent.activity, is_not(has_key("addin")))
+
+
+@allure.feature("Agent")
+def test_evict_revive_protocol(agent, workbook):
+    worker = mock.Mock()
+    worker.ready = True
+    agent.pool.acquire = mock.Mock(return_value=worker)
+    agent.frontend_routine(Message.event(
+        Event(Event.Type.WorkbookOpen, workbook, None, None, None,
+              PROTOCOL_VERSION), "addin"))
+    agent.evict("addin")
+    assert_that(agent.protocols, has_entry("addin", PROTOCOL_VERSION))
+    agent.backend.send.reset_mock()
+
+    change = Message.event(
+        Event(Event.Type.SheetChange, workbook, "Sheet1",
+              [[Cell("$A$1", "1")]]), "addin")
+    agent.frontend_routine(change)
+    assert_that(agent.backend.send.mock_calls, has_length(2))
+    restore = Event.deserialize(agent.backend.send.mock_calls[0][1][0].payload)
+    assert_that(restore.type, equal_to(Event.Type.WorkbookOpen))
+    assert_that(restore.workbook, equal_to(workbook))
+    assert_that(restore.protocol, equal_to(PROTOCOL_VERSION))
+    assert_that(agent.backend.send.mock_calls[1], equal_to(mock.call(change)))
+
+
+@allure.feature("Agent")
+def test_evict_least_recently_used(agent):
+    agent.max_resident = 2
+    agent.evict = mock.Mock(side_effect=agent.forget)
+    for ident in ["first", "second", "first", "third"]:
+        agent.frontend_routine(Message.event("event", ident))
+    assert_that(agent.evict.mock_calls, equal_to([mock.call("second")]))
+    assert_that(list(agent.activity), equal_to(["first", "third"]))
+
+
+@allure.feature("Agent")
+def test_agent_forked_mode(monkeypatch, fe_connection, server_address, loop):
+    import comnsense_agent.agent
+    server = mock.Mock()
+    monkeypatch.setattr("comnsense_agent.fork_server.ForkServer",
+                        mock.Mock(return_value=server))
+    agent = comnsense_agent.agent.Agent(
+        fe_connection, server_address, loop, mode="forked")
+    assert_that(server.spawn.mock_calls, has_length(agent.pool.size))
+    agent.pool.close()
+    assert_that(server.close.mock_calls, equal_to([mock.call()]))
+
+
+@allure.feature("Agent")
+def test_agent_worker_timeout(fe_connection, server_address, loop):
+    import comnsense_agent.agent
+    from comnsense_agent.worker import Worker
+    agent = comnsense_agent.agent.Agent(fe_connection, server_address, loop)
+    assert_that(agent.pool.options,
+                has_entry("agent_timeout", Worker.AGENT_TIMEOUT))
+    agent = comnsense_agent.agent.Agent(
+        fe_connection, server_address, loop, heartbeat_interval=60)
+    assert_that(agent.pool.options, has_entry(
+        "agent_timeout", 60 * agent.HEARTBEAT_LIVENESS))
+
+
+@allure.feature("Agent")
+def test_heartbeat_restart_protocol(agent, workbook):
+    dead, new = mock.Mock(), mock.Mock()
+    dead.ready, new.ready = True, True
+    event = Event(Event.Type.WorkbookOpen, workbook, None, None, None,
+                  PROTOCOL_VERSION)
+    agent.pool.acquire = mock.Mock(return_value=dead)
+    agent.pool.release = mock.Mock()
+    agent.frontend_routine(Message.event(event, "addin"))
+    agent.backend.send.reset_mock()
+
+    agent.pool.acquire.return_value = new
+    dead.is_alive.return_value = False
+    agent.clients[dead.ident] = set(["addin"])
+    agent.restart_worker(dead)
+    restore = agent.backend.send.mock_calls[0][1][0]
+    assert_that(Event.deserialize(restore.payload).protocol,
+                equal_to(PROTOCOL_VERSION))
@@ -1,3 +1,5 @@
+import copy
+import pickle
 import unittest
 import pytest
 import random
@@ -7,6 +9,8 @@ import string
 from comnsense_agent.data import Border
 from comnsense_agent.data import Borders
 from comnsense_agent.data import Cell
+from comnsense_agent.utils.serialization import get_content
+from comnsense_agent.utils.serialization import serialize, deserialize
 
 from .common import *
 
@@ -68,6 +72,13 @@ class TestBorder(unittest.TestCase):
         with pytest.raises(ValueError):
             border.weight = invalid_weight
 
+    def test_int_storage(self):
+        border = Border(get_random_weight(), get_random_linestyle())
+        self.assertIs(type(border.weight), int)
+        self.assertIs(type(border.linestyle), int)
+        self.assertEquals(Border.trusted(border.weight, border.linestyle),
+                          border)
+
     def test_invalid_linestyle(self):
         linestyle = get_random_linestyle()
         weight = get_random_weight()
@@ -227,3 +238,206 @@ class TestCell(unittest.TestCase):
         self.assertEquals(another.color, cell.color)
         self.assertEquals(another.font, cell.font)
         self.assertEquals(another.fontstyle, cell.fontstyle)
+
+
+class TestCellContent(unittest.TestCase):
+    def test_get_content(self):
+        cell = Cell("$A$1", "x", font="Arial", color=3, fontstyle=1,
+                    borders=get_random_borders())
+        content = get_content(cell)
+        self.assertEquals(sorted(content.keys()), sorted(Cell.FIELDS))
+        self.assertEquals(content["key"], "$A$1")
+        self.assertEquals(Cell.from_content(content), cell)
+        for provider in ("json", "msgpack"):
+            data = serialize(provider, get_content(cell))
+            self.assertEquals(
+                Cell.from_content(deserialize(provider, data)), cell)
+
+    def test_get_content_default(self):
+        content = get_content(Cell("$A$1", "x"))
+        self.assertEquals(content["borders"], get_content(Borders()))
+        self.assertEquals(Cell.from_content(content), Cell("$A$1", "x"))
+
+    def test_from_primitive_content(self):
+        cell = Cell("$A$1", "x", borders=get_random_borders())
+        self.assertEquals(Cell.from_content(cell.to_primitive()), cell)
+
+    def test_copy(self):
+        cell = Cell.from_primitive({"key": "$A$1", "value": "x",
+                                    "borders": {"top": [2, 1]}})
+        another = copy.deepcopy(cell)
+        another.key = "$B$2"
+        self.assertEquals(cell.row_index, 1)
+        self.assertEquals(another.row_index, 2)
+        self.assertEquals(pickle.loads(pickle.dumps(cell, 2)), cell)
+
+
+class TestCellAddress(unittest.TestCase):
+    def test_coordinates(self):
+        cell = Cell("$AB$12", "")
+        self.assertEquals(cell.column, "AB")
+        self.assertEquals(cell.row, "12")
+        self.assertEquals(cell.column_index, 28)
+        self.assertEquals(cell.row_index, 12)
+
+    def test_key_changed(self):
+        cell = Cell("$A$1", "")
+        self.assertEquals(cell.row_index, 1)
+        cell.key = "$C$5"
+        self.assertEquals(cell.column_index, 3)
+        self.assertEquals(cell.row_index, 5)
+
+    def test_equal_after_parse(self):
+        cell = Cell("$B$2", "")
+        cell.row_index
+        self.assertEquals(cell, Cell("$B$2", ""))
+
+
+class TestCellTable(unittest.TestCase):
+    def test_columns(self):
+        table = get_random_table(3, 4)
+        obj = Cell.table_to_columns(table)
+        self.assertEquals(obj["origin"], "$A$1")
+        self.assertNotIn("keys", obj)
+        self.assertEquals(obj["rows"], [4] * 5)
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_columns_keys(self):
+        table = [[get_random_cell("$B$3"), get_random_cell("$D$3")],
+                 [get_random_cell("$AA$7")]]
+        obj = Cell.table_to_columns(table)
+        self.assertNotIn("origin", obj)
+        self.assertEquals(obj["keys"], ["$B$3", "$D$3", "$AA$7"])
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_columns_wide(self):
+        table = [[Cell("$Y$1", "1"), Cell("$Z$1", "2"), Cell("$AA$1", "3")]]
+        obj = Cell.table_to_columns(table)
+        self.assertEquals(obj["origin"], "$Y$1")
+        self.assertEquals(obj["values"], ["1", "2", "3"])
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_columns_omitted(self):
+        table = [[Cell("$A$1", None), Cell("$B$1", None)]]
+        obj = Cell.table_to_columns(table)
+        self.assertEquals(sorted(obj.keys()), ["origin", "rows"])
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_columns_borders(self):
+        borders = get_random_borders()
+        table = [[Cell("$A$1", "", borders=borders),
+                  Cell("$A$2", ""),
+                  Cell("$A$3", "", borders=get_random_borders())]]
+        table[0][1].borders = Borders.from_primitive(borders.to_primitive())
+        obj = Cell.table_to_columns(table)
+        self.assertEquals(obj["borders"][0], obj["borders"][1])
+        self.assertEquals(len(obj["border_table"]),
+                          len(set(obj["borders"])))
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_columns_empty(self):
+        table = [[]]
+        obj = Cell.table_to_columns(table)
+        self.assertEquals(Cell.table_from_columns(obj), table)
+
+    def test_primitive_dispatch(self):
+        table = get_random_table(2, 2)
+        self.assertEquals(
+            Cell.table_from_primitive(Cell.table_to_primitive(table, True)),
+            table)
+        self.assertEquals(
+            Cell.table_from_primitive(Cell.table_to_primitive(table)),
+            table)
+
+    def test_trusted(self):
+        table = get_random_table(2, 2)
+        trusted = [[Cell.trusted(x.key, x.value, x.font, x.color,
+                                 x.fontstyle, x.borders) for x in row]
+                   for row in table]
+        self.assertEquals(Cell.validate_table(trusted), table)
+        self.assertEquals(Cell.trusted("$A$1", "").borders, Borders())
+
+    def test_invalid_color(self):
+        obj = [[{"key": "$A$1", "value": "", "color": "red"}]]
+        with pytest.raises(ValueError):
+            Cell.table_from_primitive(obj)
+        obj = Cell.table_to_columns([[Cell("$A$1", "", color=1)]])
+        obj["colors"] = ["red"]
+        with pytest.raises(ValueError):
+            Cell.table_from_primitive(obj)
+
+    def test_invalid_borders(self):
+        obj = [[{"key": "$A$1", "value": "", "borders": {"top": [3, 1]}}]]
+        with pytest.raises(ValueError):
+            Cell.table_from_primitive(obj)
+        obj = Cell.table_to_columns(
+            [[Cell("$A$1", "", borders=get_random_borders())]])
+        obj["border_table"] = [{"left": [2, 1000]}]
+        with pytest.raises(ValueError):
+            Cell.table_from_primitive(obj)
+
+    def test_empty_key(self):
+        with pytest.raises(ValueError):
+            Cell.table_from_primitive([[{"value": ""}]])
+
+
+class TestCellInterning(unittest.TestCase):
+    def test_borders_shared(self):
+        borders = get_random_borders().to_primitive()
+        obj = [[{"key": "$A$1", "value": "", "borders": borders,
+                 "font": u"Arial", "color": 100500},
+                {"key": "$A$2", "value": "", "borders": dict(borders),
+                 "font": u"Arial", "color": 100500}]]
+        first, second = Cell.table_from_primitive(obj)[0]
+        self.assertIs(first.borders, second.borders)
+        self.assertIs(first.font, second.font)
+        self.assertIs(first.color, second.color)
+        self.assertIs(Cell.from_primitive(obj[0][0]).borders, first.borders)
+
+    def test_empty_borders_shared(self):
+        table = Cell.table_from_primitive(
+            Cell.table_to_columns([[Cell("$A$1", ""), Cell("$B$1", "")]]))
+        self.assertIs(table[0][0].borders, table[0][1].borders)
+        self.assertEquals(table[0][0].borders, Borders())
+
+    def test_interned_frozen(self):
+        border = Border.intern(get_random_weight(), get_random_linestyle())
+        with pytest.raises(AttributeError):
+            border.weight = get_random_weight()
+        borders = Borders.intern_from_primitive(None)
+        with pytest.raises(AttributeError):
+            borders.top = border
+
+    def test_interned_copy(self):
+        cell = Cell.from_primitive({"key": "$A$1", "value": "",
+                                    "borders": {"top": [2, 1]}})
+        another = copy.deepcopy(cell)
+        self.assertIs(another.borders, cell.borders)
+        borders = Borders(top=Border(2, 1))
+        self.assertIsNot(copy.deepcopy(borders), borders)
+        self.assertEquals(copy.deepcopy(borders), borders)
+        copy.deepcopy(borders).top = None
+
+    def test_interned_caches(self):
+        border = Border.intern(2, 1)
+        borders = Borders.intern_from_primitive({"top": [2, 1]})
+        self.assertIs(borders.top, border)
+        self.assertIs(Border.intern(2, 1), border)
+        self.assertIsInstance(Border.intern(2, 1), Border)
+        self.assertIs(Borders.intern_from_primitive({"top": [2, 1]}),
+                      borders)
+
+    def test_interned_state(self):
+        borders = Borders.intern_from_primitive({"top": [2, 1]})
+        content = get_content(borders)
+        self.assertEquals(content, get_content(Borders(top=Border(2, 1))))
+        self.assertEquals(content["top"], {"weight": 2, "linestyle": 1})
+        self.assertEquals(Borders.from_content(content), borders)
+        self.assertIs(pickle.loads(pickle.dumps(borders, 2)), borders)
+        self.assertIs(pickle.loads(pickle.dumps(borders.top)), borders.top)
+
+    def test_not_interned_mutable(self):
+        borders = Borders(top=Border(2, 1))
+        borders.top.weight = 4
+        borders.top = None
+        self.assertEquals(borders, Borders())
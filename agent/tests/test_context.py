@@ -10,7 +10,10 @@ from hamcrest import *
 from .fixtures.excel import workbook, sheetname
 
 from comnsense_agent.context import Context
+from comnsense_agent.data import Cell, Event
 from comnsense_agent.algorithm.event_handler import EventHandler
+from comnsense_agent.algorithm.error_detector.column_error_detector \
+    import ColumnErrorDetector
 
 
 @allure.feature("Context")
@@ -49,3 +52,48 @@ def test_context_method_lookup(workbook, sheetname):
     assert_that(method, instance_of(collections.Callable))
     with pytest.raises(AttributeError):
         context.lookup(sheetname).unknown
+
+
+@allure.feature("Context")
+def test_context_dumps_loads(workbook, sheetname):
+    context = Context()
+    context.workbook = workbook
+    header, formatter, errors = context.handlers(sheetname)
+    header._state = header.State.found
+    header._header = [Cell("$A$1", u"name"), Cell("$B$1", u"phone")]
+    formatter.handle(Event(Event.Type.SheetChange, workbook, sheetname,
+                           [[Cell("$A$2", u"JOHN")]],
+                           [[Cell("$A$2", u"john")]]), context)
+    errors.columns["B"] = ColumnErrorDetector("B")
+    for value in [u"123", u"456", u"..."]:
+        errors.columns["B"].add_value_to_stats(value)
+    errors.columns["B"].incorrect_cells[5] = True
+    original = errors.columns["B"]
+    data = context.dumps()
+
+    restored = Context()
+    restored.workbook = workbook
+    restored.loads(data)
+    assert_that(restored.is_ready(), is_(True))
+    assert_that(restored.sheets, equal_to([sheetname]))
+    assert_that(restored.dumps(), equal_to(data))
+
+    header, formatter, errors = restored.handlers(sheetname)
+    assert_that(header.get_header_columns(), equal_to(set(["A", "B"])))
+    assert_that(formatter.transformer.transform(u"paul"), equal_to(u"PAUL"))
+    assert_that(errors.columns["B"].stats.points, equal_to(3))
+    assert_that(errors.columns["B"].incorrect_cells[5], is_(True))
+    for value in [u"789", u"abc", u"..."]:
+        assert_that(errors.columns["B"].check(value),
+                    equal_to(original.check(value)))
+
+
+@allure.feature("Context")
+def test_context_loads_empty(workbook, sheetname):
+    context = Context()
+    context.loads(None)
+    assert_that(context.is_ready(), is_(False))
+    context.workbook = workbook
+    context.loads(None)
+    assert_that(context.is_ready(), is_(True))
+    assert_that(context.sheets, has_length(0))
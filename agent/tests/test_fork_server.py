@@ -0,0 +1,59 @@
+import allure
+import mock
+import os
+import platform
+import pytest
+import zmq
+from hamcrest import *
+
+from comnsense_agent.data import Signal
+from comnsense_agent.fork_server import ForkServer, WorkerFork
+from comnsense_agent.fork_server import get_fork_server_command
+from comnsense_agent.message import Message
+
+
+@pytest.fixture
+def script(request):
+    return request.config.rootdir.join("bin").join("comnsense-worker").strpath
+
+
+@allure.feature("Fork Server")
+def test_fork_server_command(script):
+    cmd, env = get_fork_server_command(script, "ERROR")
+    assert_that(cmd, has_items(script, "--fork-server", "ERROR"))
+    assert_that(cmd, is_not(has_item("-i")))
+
+
+@allure.feature("Fork Server")
+def test_worker_fork_is_alive():
+    assert_that(WorkerFork(os.getpid()).is_alive(), is_(True))
+    with mock.patch("os.kill", side_effect=OSError(3, "No such process")):
+        assert_that(WorkerFork(1).is_alive(), is_(False))
+
+
+@allure.feature("Fork Server")
+@pytest.mark.timeout(30)
+@pytest.mark.skipif(platform.system().lower() == "windows",
+                    reason="fork is not supported")
+def test_fork_server_spawn(script):
+    socket = zmq.Context.instance().socket(zmq.ROUTER)
+    port = socket.bind_to_random_port("tcp://127.0.0.1")
+    server = ForkServer(script, "ERROR")
+    try:
+        worker = server.spawn("forked", "tcp://127.0.0.1:%d" % port)
+        assert_that(worker.pid, is_not(equal_to(server.popen.pid)))
+        assert_that(worker.is_alive(), is_(True))
+        while True:
+            msg = Message(*socket.recv_multipart())
+            if msg.is_signal():
+                break
+        assert_that(msg.ident, equal_to("forked"))
+        assert_that(Signal.deserialize(msg.payload).code,
+                    equal_to(Signal.Code.Ready))
+        worker.kill()
+        worker.join()
+        assert_that(worker.is_alive(), is_(False))
+    finally:
+        server.close()
+        socket.close(0)
+    assert_that(server.popen.returncode, equal_to(0))
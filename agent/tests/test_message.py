@@ -3,9 +3,12 @@ import pytest
 import random
 import string
 import mock
+import zmq
 
+from comnsense_agent.data import Event
 from comnsense_agent.message import Message, InvalidMessageError
 from comnsense_agent.message import MESSAGE_EVENT, MESSAGE_ACTION
+from comnsense_agent.message import MESSAGE_ACTIONS
 from comnsense_agent.message import MESSAGE_REQUEST, MESSAGE_RESPONSE
 from comnsense_agent.message import MESSAGE_LOG, MESSAGE_SIGNAL, MESSAGES
 
@@ -26,6 +29,24 @@ class MessageTest(unittest.TestCase):
         self.assertEquals(msg.payload, payload)
         self.assertEquals(msg.kind, MESSAGE_ACTION)
 
+    def test_actions(self):
+        payload = "".join(random.sample(string.ascii_letters, 10))
+        ident = "".join(random.sample(string.ascii_letters, 10))
+        msg = Message.actions(payload, ident)
+        self.assertTrue(msg.is_actions())
+        self.assertFalse(msg.is_action())
+        self.assertEquals(msg.ident, ident)
+        self.assertEquals(msg.payload, payload)
+        self.assertEquals(msg.kind, MESSAGE_ACTIONS)
+
+    def test_get_event(self):
+        event = Event(Event.Type.WorkbookOpen, "workbook")
+        msg = Message.event(event)
+        self.assertEquals(msg.get_event(), event)
+        self.assertIs(msg.get_event(), msg.get_event())
+        msg.payload = Event(Event.Type.WorkbookOpen, "another").serialize()
+        self.assertEquals(msg.get_event().workbook, "another")
+
     def test_event(self):
         payload = "".join(random.sample(string.ascii_letters, 10))
         ident = "".join(random.sample(string.ascii_letters, 10))
@@ -172,3 +193,31 @@ class MessageTest(unittest.TestCase):
         msg = Message(ident, kind, payload)
         self.assertEquals(msg[:-1], [ident, kind])
         self.assertEquals(msg[-1], payload)
+
+    def test_route(self):
+        route = "".join(random.sample(string.ascii_letters, 10))
+        ident = "".join(random.sample(string.ascii_letters, 10))
+        kind = random.choice(MESSAGES)
+        payload = "".join(random.sample(string.ascii_letters, 10))
+        msg = Message(route, ident, kind, payload)
+        self.assertEquals(len(msg), 4)
+        self.assertEquals(msg.route, route)
+        self.assertEquals(msg.ident, ident)
+        self.assertEquals(msg.head(), route)
+        self.assertEquals(list(msg), [route, ident, kind, payload])
+        msg.route = Message.NO_ROUTE
+        self.assertEquals(list(msg), [ident, kind, payload])
+        msg = Message(ident, kind, payload)
+        self.assertEquals(msg.route, Message.NO_ROUTE)
+
+    def test_frame_payload(self):
+        ident = "".join(random.sample(string.ascii_letters, 10))
+        payload = "".join(random.sample(string.ascii_letters, 10))
+        frame = zmq.Frame(payload)
+        msg = Message(zmq.Frame(ident), zmq.Frame(MESSAGE_EVENT), frame)
+        self.assertEquals(msg.ident, ident)
+        self.assertTrue(msg.is_event())
+        self.assertTrue(repr(msg).find("frame") > 0)
+        self.assertTrue(list(msg)[-1] is frame)
+        self.assertEquals(msg.payload, payload)
+        self.assertEquals(list(msg), [ident, MESSAGE_EVENT, payload])
@@ -0,0 +1,194 @@
+import allure
+import mock
+import pytest
+from hamcrest import *
+
+from comnsense_agent.data import Signal
+from comnsense_agent.pool import WorkerPool, MultiplexedWorkerPool
+from comnsense_agent.pool import ThreadWorkerPool
+from comnsense_agent.socket import ZMQRouter
+
+from .fixtures.async import zmq_io_loop as io_loop
+
+
+def get_worker(alive=True, ready=True):
+    worker = mock.Mock()
+    worker.is_alive.return_value = alive
+    worker.ready = ready
+    return worker
+
+
+@pytest.fixture
+def factory():
+    def create(ident, connection, **kwargs):
+        worker = get_worker(ready=False)
+        worker.ident = ident
+        return worker
+    return mock.Mock(side_effect=create)
+
+
+@pytest.fixture
+def loop():
+    return mock.Mock()
+
+
+@pytest.fixture
+def pool(factory, loop):
+    return WorkerPool("tcp://127.0.0.1:30000", loop, 2, factory)
+
+
+@allure.feature("Worker Pool")
+def test_pool_start(pool, factory):
+    pool.start()
+    assert_that(pool.idle, has_length(2))
+    assert_that(pool.workers, has_length(2))
+    for kall in factory.mock_calls:
+        assert_that(kall[1][1], equal_to(pool.connection))
+
+
+@allure.feature("Worker Pool")
+def test_pool_unique_idents(pool):
+    pool.start()
+    idents = [x.ident for x in pool.idle]
+    assert_that(set(idents), has_length(len(idents)))
+
+
+@allure.feature("Worker Pool")
+def test_pool_acquire_prefers_ready(pool, loop):
+    pool.start()
+    first, second = pool.idle
+    pool.on_ready(second.ident)
+    worker = pool.acquire()
+    assert_that(worker, same_instance(second))
+    assert_that(list(pool.idle), equal_to([first]))
+    assert_that(loop.add_callback.mock_calls,
+                equal_to([mock.call(pool.refill)]))
+
+
+@allure.feature("Worker Pool")
+def test_pool_acquire_empty(pool, factory):
+    worker = pool.acquire()
+    assert_that(factory.mock_calls, has_length(1))
+    assert_that(pool.get(worker.ident), same_instance(worker))
+    assert_that(pool.idle, has_length(0))
+
+
+@allure.feature("Worker Pool")
+def test_pool_acquire_skips_dead(pool):
+    pool.start()
+    first, second = pool.idle
+    first.is_alive.return_value = False
+    worker = pool.acquire()
+    assert_that(worker, same_instance(second))
+    assert_that(pool.get(first.ident), is_(none()))
+
+
+@allure.feature("Worker Pool")
+def test_pool_refill(pool, loop):
+    pool.start()
+    pool.acquire()
+    pool.acquire()
+    assert_that(pool.idle, has_length(0))
+    assert_that(loop.add_callback.mock_calls, has_length(1))
+    pool.refill()
+    assert_that(pool.idle, has_length(2))
+    assert_that(pool.workers, has_length(4))
+
+
+@allure.feature("Worker Pool")
+def test_pool_on_ready_unknown(pool):
+    assert_that(pool.on_ready("unknown"), is_(none()))
+
+
+@allure.feature("Worker Pool")
+def test_pool_close(pool):
+    pool.start()
+    workers = list(pool.idle)
+    pool.close()
+    for worker in workers:
+        assert_that(worker.kill.mock_calls, equal_to([mock.call()]))
+        assert_that(worker.join.mock_calls, equal_to([mock.call()]))
+    assert_that(pool.workers, has_length(0))
+
+
+@pytest.fixture
+def multiplexed(factory, loop):
+    return MultiplexedWorkerPool("tcp://127.0.0.1:30000", loop, 3, factory)
+
+
+@allure.feature("Worker Pool")
+def test_multiplexed_start(multiplexed, factory):
+    multiplexed.start()
+    assert_that(multiplexed.slots, has_length(3))
+    for kall in factory.mock_calls:
+        assert_that(kall[2], equal_to({"multiplexed": True}))
+
+
+@allure.feature("Worker Pool")
+def test_multiplexed_acquire_same_worker(multiplexed, factory):
+    multiplexed.start()
+    first = multiplexed.acquire("workbook")
+    assert_that(multiplexed.acquire("workbook"), same_instance(first))
+    assert_that(factory.mock_calls, has_length(3))
+
+
+@allure.feature("Worker Pool")
+def test_multiplexed_acquire_spreads(multiplexed):
+    multiplexed.start()
+    workers = set(multiplexed.acquire("workbook-%d" % x) for x in range(100))
+    assert_that(workers, has_length(3))
+
+
+@allure.feature("Worker Pool")
+def test_multiplexed_acquire_dead(multiplexed):
+    multiplexed.start()
+    dead = multiplexed.acquire("workbook")
+    dead.is_alive.return_value = False
+    worker = multiplexed.acquire("workbook")
+    assert_that(worker, is_not(same_instance(dead)))
+    assert_that(multiplexed.get(dead.ident), is_(none()))
+    assert_that(multiplexed.slots, has_length(3))
+
+
+@allure.feature("Worker Pool")
+def test_multiplexed_close(multiplexed):
+    multiplexed.start()
+    multiplexed.close()
+    assert_that(multiplexed.slots, has_length(0))
+    assert_that(multiplexed.workers, has_length(0))
+
+
+@allure.feature("Worker Pool")
+@pytest.mark.timeout(10)
+def test_thread_pool_inproc(io_loop):
+    backend = ZMQRouter()
+    backend.bind("inproc://test-thread-pool", io_loop)
+    pool = ThreadWorkerPool("inproc://test-thread-pool", io_loop, 1)
+    ready = []
+
+    def routine(msg):
+        if msg.is_signal() and \
+                Signal.deserialize(msg.payload).code == Signal.Code.Ready:
+            ready.append(pool.on_ready(msg.ident))
+            io_loop.stop()
+
+    backend.on_recv(routine)
+    pool.start()
+    io_loop.start()
+    worker = pool.acquire()
+    assert_that(ready, equal_to([worker]))
+    assert_that(worker.ready, is_(True))
+    assert_that(worker.is_alive(), is_(True))
+
+    pool.close()
+    backend.close()
+    assert_that(worker.is_alive(), is_(False))
+
+
+@allure.feature("Worker Pool")
+def test_pool_options(factory, loop):
+    pool = MultiplexedWorkerPool("tcp://127.0.0.1:30000", loop, 1, factory,
+                                 {"agent_timeout": 60})
+    pool.start()
+    assert_that(factory.mock_calls[0][2],
+                equal_to({"multiplexed": True, "agent_timeout": 60}))
@@ -2,9 +2,13 @@ import pytest
 import allure
 from hamcrest import *
 
+from comnsense_agent.automaton import State
+from comnsense_agent.data import Cell, Event, Request, Response
 from comnsense_agent.runtime import Runtime
 from comnsense_agent.message import Message
 
+from .fixtures.excel import workbook
+
 MESSAGE = Message.action("something")
 FIXTURES = [
     (None, Runtime.SpecialAnswer.noanswer),
@@ -34,3 +38,44 @@ def test_runtime_prepare_answer_finished(answer, _):
     runtime.currentState = None
     prepared = runtime.prepare_answer(answer)
     assert_that(prepared, equal_to(Runtime.SpecialAnswer.finished))
+
+
+@allure.feature("Automaton")
+@allure.story("Runtime - Save Context")
+def test_runtime_save(workbook):
+    runtime = Runtime()
+    assert_that(runtime.save(), equal_to([]))
+
+    runtime.run(Message.event(Event(Event.Type.WorkbookOpen, workbook)))
+    runtime.run(Message.response(Response.notfound()))
+    assert_that(runtime.currentState, is_(State.Ready))
+    assert_that(runtime.save(), equal_to([]))
+
+    runtime.run(Message.event(Event(Event.Type.SheetChange, workbook,
+                                    "sheet", [[Cell("$A$2", u"a")]])))
+    saved = runtime.save()
+    assert_that(saved, has_length(1))
+    request = Request.deserialize(saved[0].payload)
+    assert_that(request.type, equal_to(Request.Type.SaveContext))
+    assert_that(request.data["workbook"], equal_to(workbook))
+    assert_that(request.data["context"], equal_to(runtime.context.dumps()))
+    assert_that(runtime.save(), equal_to([]))
+
+
+@allure.feature("Automaton")
+@allure.story("Runtime - Deferred Events")
+def test_runtime_deferred(workbook):
+    change = Message.event(Event(Event.Type.SheetChange, workbook,
+                                 "sheet", [[Cell("$A$2", u"a")]]))
+    runtime = Runtime()
+    answer = runtime.run(change)
+    assert_that(answer, has_length(1))
+    assert_that(Request.deserialize(answer[0].payload).type,
+                equal_to(Request.Type.GetContext))
+    assert_that(runtime.deferred, contains(change))
+
+    answer = runtime.run(Message.response(Response.notfound()))
+    assert_that(runtime.currentState, is_(State.Ready))
+    assert_that(runtime.deferred, has_length(0))
+    assert_that(runtime.context.sheets, equal_to(["sheet"]))
+    assert_that(answer, is_not(Runtime.SpecialAnswer.noanswer))
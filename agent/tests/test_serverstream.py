@@ -38,6 +38,24 @@ class TestLocalFileStream(unittest.TestCase):
         self.assertEquals(res.code, 404)
         self.assertEquals(res.data, None)
 
+    def test_save_context(self):
+        workbook = "".join(random.sample(string.ascii_letters, 10))
+        ident = "".join(random.sample(string.ascii_letters, 10))
+        callback = mock.Mock()
+        self.stream.on_recv(callback)
+        self.stream.send(Message.request(
+            Request.savecontext(workbook, "context"), ident))
+        codes = [Response.deserialize(Message(*x[1][0]).payload).code
+                 for x in callback.mock_calls]
+        self.assertEquals(codes, [202, 201])
+
+        callback.reset_mock()
+        self.stream.send(Message.request(Request.getcontext(workbook), ident))
+        res = Message(*callback.mock_calls[0][1][0])
+        res = Response.deserialize(res.payload)
+        self.assertEquals(res.code, 200)
+        self.assertEquals(res.data, "context")
+
     def tearDown(self):
         if os.path.isdir(self.tmpdir):
             shutil.rmtree(self.tmpdir)
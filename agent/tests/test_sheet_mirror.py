@@ -0,0 +1,83 @@
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.data import Cell, Event
+from comnsense_agent.sheet_mirror import SheetMirror
+
+
+def response(*rows):
+    return Event(Event.Type.RangeResponse, "workbook", "sheet",
+                 [list(x) for x in rows])
+
+
+def change(key, value, prev_value):
+    return Event(Event.Type.SheetChange, "workbook", "sheet",
+                 [[Cell(key, value)]], [[Cell(key, prev_value)]])
+
+
+def values(rows):
+    return [[(x.key, x.value) for x in row] for row in rows]
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_lookup():
+    mirror = SheetMirror()
+    mirror.observe(response([Cell("$A$1", "a1"), Cell("$B$1", "b1")],
+                            [Cell("$A$2", "a2"), Cell("$B$2", "")]))
+    assert_that(values(mirror.lookup("sheet", "$A$1:$B$2")),
+                equal_to([[("$A$1", "a1"), ("$B$1", "b1")],
+                          [("$A$2", "a2"), ("$B$2", "")]]))
+    assert_that(values(mirror.lookup("sheet", "B1")),
+                equal_to([[("$B$1", "b1")]]))
+    assert_that(mirror.lookup("sheet", "$A$1:$A$3"), is_(none()))
+    assert_that(mirror.lookup("another", "$A$1"), is_(none()))
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_lookup_copies():
+    mirror = SheetMirror()
+    mirror.observe(response([Cell("$A$1", "a1")]))
+    mirror.lookup("sheet", "$A$1")[0][0].value = "changed"
+    assert_that(mirror.get("sheet", "$A$1").value, equal_to("a1"))
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_keeps_known_fields():
+    mirror = SheetMirror()
+    mirror.remember("sheet", Cell("$A$1", "a1", color=3, font="Arial"))
+    mirror.observe(change("$A$1", "new", "a1"))
+    cell = mirror.get("sheet", "$A$1")
+    assert_that((cell.value, cell.color, cell.font),
+                equal_to(("new", 3, "Arial")))
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_stale_sheet():
+    mirror = SheetMirror()
+    mirror.observe(response([Cell("$A$1", "a1"), Cell("$B$1", "b1")]))
+    mirror.observe(change("$A$1", "new", "recalculated"))
+    assert_that(mirror.get("sheet", "$B$1"), is_(none()))
+    assert_that(mirror.get("sheet", "$A$1").value, equal_to("new"))
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_eviction():
+    mirror = SheetMirror(2)
+    mirror.observe(response([Cell("$A$1", "a1")], [Cell("$A$2", "a2")]))
+    mirror.get("sheet", "$A$1")
+    mirror.observe(response([Cell("$A$3", "a3")]))
+    assert_that(mirror, has_length(2))
+    assert_that(mirror.get("sheet", "$A$2"), is_(none()))
+    assert_that(mirror.get("sheet", "$A$1"), is_not(none()))
+
+
+@allure.feature("Sheet Mirror")
+def test_sheet_mirror_forget():
+    mirror = SheetMirror()
+    mirror.observe(response([Cell("$A$1", "a1")]))
+    mirror.remember("another", Cell("$A$1", "a1"))
+    mirror.forget("sheet")
+    assert_that(mirror, has_length(1))
+    mirror.forget()
+    assert_that(mirror, has_length(0))
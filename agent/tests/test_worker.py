@@ -14,6 +14,8 @@ from comnsense_agent.message import Message
 from comnsense_agent.runtime import Runtime
 from comnsense_agent.worker import Worker
 from comnsense_agent.worker import WorkerProcess
+from comnsense_agent.worker import WorkerThread
+from comnsense_agent.worker import create_thread_worker
 from comnsense_agent.worker import get_worker_command
 from comnsense_agent.worker import get_worker_script
 
@@ -113,6 +115,31 @@ class TestWorkerProcess(unittest.TestCase):
         self.assertEquals(len(self.proc.terminate.mock_calls), 1)
 
 
+@allure.feature("Worker")
+class TestWorkerThread(unittest.TestCase):
+    def setUp(self):
+        self.thread = mock.Mock()
+        self.loop = mock.Mock()
+
+    def test_is_alive(self):
+        wt = WorkerThread(self.thread, self.loop)
+        self.thread.is_alive.return_value = True
+        self.assertTrue(wt.is_alive())
+        self.thread.is_alive.return_value = False
+        self.assertFalse(wt.is_alive())
+
+    def test_join(self):
+        wt = WorkerThread(self.thread, self.loop)
+        wt.join()
+        self.assertEquals(len(self.thread.join.mock_calls), 1)
+
+    def test_kill(self):
+        wt = WorkerThread(self.thread, self.loop)
+        wt.kill()
+        self.assertEquals(self.loop.add_callback.mock_calls,
+                          [mock.call(self.loop.stop)])
+
+
 @pytest.fixture(scope="module")
 def connection(host, port):
     return "tcp://%s:%d" % (host, port)
@@ -147,6 +174,7 @@ def worker(monkeypatch, workbook, connection, loop):
                         lambda *x, **y: None)
     worker = Worker(workbook, connection, loop)
     worker.runtime = mock.Mock()
+    worker.create_runtime = lambda ident: worker.runtime
     yield worker
     monkeypatch.undo()
 
@@ -194,7 +222,8 @@ def test_worker_runtime_finished(worker):
     worker.runtime.run.return_value = Runtime.SpecialAnswer.finished
     worker.routine(msg)
     assert_that(worker.runtime.run.mock_calls, equal_to([mock.call(msg)]))
-    assert_that(worker.client.send.mock_calls, equal_to([]))
+    assert_that(worker.client.send.mock_calls,
+                equal_to([mock.call(Message.signal(Signal.stop()))]))
     assert_that(worker.loop.stop.mock_calls, equal_to([mock.call()]))
 
 
@@ -228,3 +257,141 @@ def test_worker_start(worker):
                 equal_to([mock.call(Message.signal(Signal.ready()))]))
     assert_that(worker.loop.start.mock_calls, equal_to([mock.call()]))
     assert_that(worker.client.close.mock_calls, equal_to([mock.call()]))
+
+
+@allure.feature("Worker")
+def test_worker_answer_ident(worker, workbook):
+    event = Message.event("event", workbook)
+    action = Message.action("action")
+    worker.runtime.run.return_value = [action]
+    worker.routine(event)
+    assert_that(action.ident, equal_to(workbook))
+    assert_that(worker.client.send.mock_calls, equal_to([mock.call(action)]))
+
+
+@allure.feature("Worker")
+def test_worker_runtime_per_ident(worker):
+    runtimes = {}
+
+    def create_runtime(ident):
+        runtimes[ident] = mock.Mock()
+        runtimes[ident].run.return_value = []
+        return runtimes[ident]
+
+    worker.create_runtime = create_runtime
+    first = Message.event("event", "first")
+    second = Message.event("event", "second")
+    worker.routine(first)
+    worker.routine(second)
+    worker.routine(first)
+    assert_that(worker.runtimes, has_length(2))
+    assert_that(worker.runtimes["first"], same_instance(runtimes["first"]))
+    assert_that(worker.runtimes["second"].run.mock_calls,
+                equal_to([mock.call(second)]))
+
+
+@allure.feature("Worker")
+def test_worker_multiplexed_runtime_finished(worker):
+    worker.multiplexed = True
+    msg = Message.event("event", "first")
+    worker.runtime.run.return_value = Runtime.SpecialAnswer.finished
+    worker.routine(msg)
+    assert_that(worker.runtimes, is_not(has_key("first")))
+    assert_that(worker.loop.stop.mock_calls, equal_to([]))
+
+
+@allure.feature("Worker")
+def test_worker_multiplexed_command():
+    script = os.path.realpath("comnsense-worker.exe")
+    cmd, env = get_worker_command(
+        script, "ident", "tcp://127.0.0.1:30000", multiplexed=True)
+    assert_that(cmd, has_item("-m"))
+
+
+@allure.feature("Worker")
+@pytest.mark.timeout(10)
+def test_create_thread_worker(connection):
+    worker = create_thread_worker("ident", connection)
+    assert_that(worker.ident, equal_to("ident"))
+    assert_that(worker.is_alive(), is_(True))
+    worker.kill()
+    worker.join()
+    assert_that(worker.is_alive(), is_(False))
+
+
+@allure.feature("Worker")
+def test_worker_heartbeat(worker, workbook):
+    request = Message.request("request")
+    worker.runtime.save.return_value = [request]
+    worker.get_runtime(workbook)
+    worker.routine(Message.signal(Signal.heartbeat()))
+    assert_that(request.ident, equal_to(workbook))
+    assert_that(worker.client.send.mock_calls,
+                equal_to([mock.call(Message.signal(Signal.heartbeat())),
+                          mock.call(request)]))
+    assert_that(worker.heartbeat_at, equal_to(worker.loop.time()))
+
+
+@allure.feature("Worker")
+def test_worker_check_agent(worker):
+    worker.loop.time.return_value = 100
+    worker.heartbeat_at = 100 - Worker.AGENT_TIMEOUT
+    worker.check_agent()
+    assert_that(worker.loop.stop.mock_calls, equal_to([]))
+    assert_that(worker.loop.call_later.mock_calls,
+                equal_to([mock.call(Worker.AGENT_TIMEOUT,
+                                    worker.check_agent)]))
+    worker.heartbeat_at = 99 - Worker.AGENT_TIMEOUT
+    worker.check_agent()
+    assert_that(worker.loop.stop.mock_calls, equal_to([mock.call()]))
+
+
+@allure.feature("Worker")
+def test_worker_stop_runtime(worker, workbook):
+    request = Message.request("request")
+    worker.runtime.save.return_value = [request]
+    worker.multiplexed = True
+    worker.get_runtime(workbook)
+    worker.routine(Message.signal(Signal.stop(), workbook))
+    assert_that(worker.runtimes, is_not(has_key(workbook)))
+    assert_that(request.ident, equal_to(workbook))
+    assert_that(worker.client.send.mock_calls, equal_to([mock.call(request)]))
+    assert_that(worker.loop.stop.mock_calls, equal_to([]))
+
+    worker.multiplexed = False
+    worker.routine(Message.signal(Signal.stop(), workbook))
+    assert_that(worker.loop.stop.mock_calls, equal_to([mock.call()]))
+
+
+@allure.feature("Worker")
+def test_worker_agent_timeout(worker):
+    worker.agent_timeout = 150
+    worker.loop.time.return_value = 100
+    worker.heartbeat_at = 100 - 100
+    worker.check_agent()
+    assert_that(worker.loop.stop.mock_calls, equal_to([]))
+    assert_that(worker.loop.call_later.mock_calls,
+                equal_to([mock.call(150, worker.check_agent)]))
+
+
+@allure.feature("Worker")
+def test_worker_agent_timeout_command():
+    script = os.path.realpath("comnsense-worker.exe")
+    cmd, env = get_worker_command(
+        script, "ident", "tcp://127.0.0.1:30000", agent_timeout=150)
+    assert_that(" ".join(cmd), contains_string("-t 150"))
+
+
+@allure.feature("Worker")
+def test_worker_heartbeat_save_interval(worker, workbook):
+    request = Message.request("request")
+    worker.runtime.save.return_value = [request]
+    worker.get_runtime(workbook)
+    worker.loop.time.return_value = 100
+    worker.saved_at = 100 - Worker.SAVE_INTERVAL + 1
+    worker.routine(Message.signal(Signal.heartbeat()))
+    assert_that(worker.runtime.save.mock_calls, equal_to([]))
+    worker.loop.time.return_value = 101
+    worker.routine(Message.signal(Signal.heartbeat()))
+    assert_that(worker.runtime.save.mock_calls, equal_to([mock.call()]))
+    assert_that(worker.saved_at, equal_to(101))
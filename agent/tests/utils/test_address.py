@@ -0,0 +1,70 @@
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.utils import address
+
+
+COLUMNS = [("A", 1), ("Z", 26), ("AA", 27), ("AZ", 52), ("BA", 53),
+           ("ZZ", 702), ("AAA", 703), ("XFD", address.MAX_COLUMN)]
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("name, index", COLUMNS)
+def test_column_index(name, index):
+    assert_that(address.column_index(name), equal_to(index))
+    assert_that(address.column_name(index), equal_to(name))
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("name", ["", "a", "A1", "XFE"])
+def test_column_index_invalid(name):
+    with pytest.raises(ValueError):
+        address.column_index(name)
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("index", [0, -1, address.MAX_COLUMN + 1])
+def test_column_name_invalid(index):
+    with pytest.raises(ValueError):
+        address.column_name(index)
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("key", ["$AB$12", "AB12", u"$AB$12"])
+def test_parse(key):
+    assert_that(address.parse(key), equal_to(("AB", "12", 28, 12)))
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("key", ["", "$A$", "$1$1", "$A$0", "$A$1:$B$2",
+                                 "$A$%d" % (address.MAX_ROW + 1)])
+def test_parse_invalid(key):
+    with pytest.raises(ValueError):
+        address.parse(key)
+
+
+@allure.feature("Utils")
+def test_format():
+    assert_that(address.format(28, 12), equal_to("$AB$12"))
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("name, bounds", [("$B$3:$D$5", (2, 3, 4, 5)),
+                                          ("D5:B3", (2, 3, 4, 5)),
+                                          ("$B$3", (2, 3, 2, 3))])
+def test_parse_range(name, bounds):
+    assert_that(address.parse_range(name), equal_to(bounds))
+
+
+@allure.feature("Utils")
+@pytest.mark.parametrize("name", ["", ":", "$A$1:", "$A$1:$B"])
+def test_parse_range_invalid(name):
+    with pytest.raises(ValueError):
+        address.parse_range(name)
+
+
+@allure.feature("Utils")
+def test_format_range():
+    assert_that(address.format_range((2, 3, 4, 5)), equal_to("$B$3:$D$5"))
+    assert_that(address.format_range((2, 3, 2, 3)), equal_to("$B$3"))
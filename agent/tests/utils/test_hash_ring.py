@@ -0,0 +1,48 @@
+import allure
+import pytest
+from hamcrest import *
+
+from comnsense_agent.utils.hash_ring import HashRing
+
+
+@pytest.fixture
+def keys():
+    return ["workbook-%d" % x for x in range(1000)]
+
+
+@allure.feature("Utils")
+def test_hash_ring_empty():
+    assert_that(HashRing().get("workbook"), is_(none()))
+
+
+@allure.feature("Utils")
+def test_hash_ring_stable(keys):
+    first = HashRing(["a", "b", "c"])
+    second = HashRing(["c", "b", "a"])
+    for key in keys:
+        assert_that(first.get(key), equal_to(second.get(key)))
+
+
+@allure.feature("Utils")
+def test_hash_ring_all_nodes_used(keys):
+    ring = HashRing(["a", "b", "c"])
+    assert_that(set(ring.get(x) for x in keys), equal_to(set(ring.nodes)))
+
+
+@allure.feature("Utils")
+def test_hash_ring_remove_moves_only_own_keys(keys):
+    ring = HashRing(["a", "b", "c"])
+    before = dict((x, ring.get(x)) for x in keys)
+    ring.remove("b")
+    assert_that(ring, has_length(2))
+    for key in keys:
+        if before[key] != "b":
+            assert_that(ring.get(key), equal_to(before[key]))
+        else:
+            assert_that(ring.get(key), is_in(["a", "c"]))
+
+
+@allure.feature("Utils")
+def test_hash_ring_unicode():
+    ring = HashRing(["a", "b"])
+    assert_that(ring.get(u"\u043a\u043d\u0438\u0433\u0430"), is_in(["a", "b"]))
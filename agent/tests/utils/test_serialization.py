@@ -13,6 +13,14 @@ from ..fixtures.classes import complex_class_fields
 from comnsense_agent.utils.serialization import get_content
 from comnsense_agent.utils.serialization import restore_content
 from comnsense_agent.utils.serialization import Serializable
+from comnsense_agent.utils.serialization import NegotiableSerializable
+from comnsense_agent.utils.serialization import PROTOCOLS, detect
+from comnsense_agent.utils.serialization import ENCODERS, DECODERS
+from comnsense_agent.utils.serialization import register
+from comnsense_agent.utils.serialization import get_encoder, get_decoder
+from comnsense_agent.utils.serialization import encode_generic, walk_content
+from comnsense_agent.utils.serialization import serialize, deserialize
+from comnsense_agent.data import Border, Borders, Cell
 
 
 @allure.feature("Serialization")
@@ -47,3 +55,80 @@ def test_serialization(klass, serializer, simple_class_fields):
     serialized = obj.serialize()
     allure.attach("serialized", repr(serialized))
     assert_that(obj, cls.deserialize(serialized))
+
+
+@allure.feature("Serialization")
+@pytest.mark.parametrize("klass", CLASSES[1:],
+                         ids=[x.__name__ for x in CLASSES[1:]])
+@pytest.mark.parametrize("protocol", PROTOCOLS.keys())
+def test_negotiable_serialization(klass, protocol, simple_class_fields):
+    cls, obj = klass(simple_class_fields, NegotiableSerializable())
+    serialized = obj.serialize(protocol=protocol)
+    allure.attach("serialized", repr(serialized))
+    assert_that(detect(serialized), equal_to(PROTOCOLS[protocol]))
+    assert_that(obj, cls.deserialize(serialized))
+
+
+class Point(object):
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return (self.x, self.y) == (other.x, other.y)
+
+
+@pytest.fixture
+def registry(request):
+    encoders, decoders = dict(ENCODERS), dict(DECODERS)
+
+    def restore():
+        ENCODERS.clear()
+        ENCODERS.update(encoders)
+        DECODERS.clear()
+        DECODERS.update(decoders)
+    request.addfinalizer(restore)
+
+
+@allure.feature("Serialization")
+def test_get_content_registered(registry):
+    register(Point, lambda obj, protocol: [obj.x, obj.y])
+    assert_that(get_content({"point": Point(1, 2)}),
+                equal_to({"point": [1, 2]}))
+
+
+@allure.feature("Serialization")
+@pytest.mark.parametrize("serializer", ["json", "msgpack"])
+def test_serialization_registered(registry, serializer):
+    cls = type("SerializablePoint", (Serializable(serializer), Point), {})
+    register(cls, lambda obj, protocol: [obj.x, obj.y],
+             lambda content: cls(*content), serializer)
+    obj = cls(1, 2)
+    assert_that(detect(obj.serialize()), equal_to(serializer))
+    assert_that(cls.deserialize(obj.serialize()), equal_to(obj))
+    assert_that(get_encoder(cls, "unknown")(obj, None),
+                equal_to({"x": 1, "y": 2}))
+
+
+@allure.feature("Serialization")
+def test_generic_fallback(registry):
+    encoder = get_encoder(Point)
+    assert_that(encoder(Point(1, 2), None), equal_to({"x": 1, "y": 2}))
+    decoder = get_decoder(Point, "json")
+    assert_that(decoder({"x": 1, "y": 2}), equal_to(Point(1, 2)))
+
+
+@allure.feature("Serialization")
+@pytest.mark.parametrize("provider", ["json", "msgpack"])
+def test_cell_registered(provider):
+    cell = Cell("$A$1", "x", font="Arial",
+                borders=Borders(top=Border(2, 1)))
+    encoder = get_encoder(Cell, provider)
+    assert_that(encoder, is_not(same_instance(encode_generic)))
+    data = serialize(provider, encoder(cell, None))
+    restored = get_decoder(Cell, provider)(deserialize(provider, data))
+    assert_that(restored, equal_to(cell))
+    assert_that(get_content({"cell": cell}),
+                equal_to({"cell": walk_content(cell)}))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python2
+"""
+Compares reflective serialization (`walk_content` and `restore_content`)
+with encoders and decoders registered for a class in the serializer
+registry. Events and actions have no registered functions, they are
+encoded by their ``get_wire_state`` either way.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+try:
+    import comnsense_agent
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    import comnsense_agent
+
+from comnsense_agent.data import Border, Borders, Cell, Response, Signal
+from comnsense_agent.utils.address import format
+from comnsense_agent.utils.serialization import get_encoder, get_decoder
+from comnsense_agent.utils.serialization import walk_content
+from comnsense_agent.utils.serialization import restore_content
+from comnsense_agent.utils.serialization import serialize, deserialize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--number", type=int, default=1000,
+                        help="number of iterations for each message")
+    parser.add_argument("-c", "--cells", type=int, default=100,
+                        help="number of cells in table")
+    return parser.parse_args()
+
+
+def get_table(cells):
+    borders = Borders(top=Border(2, 1))
+    return [[Cell(format(column, row), "%d" % (row * column),
+                  borders=borders)
+             for column in xrange(1, 11)]
+            for row in xrange(1, cells / 10 + 1)]
+
+
+def get_messages(cells):
+    """
+    Returns tuples (name, object, providers).
+    """
+    return [("signal", Signal.ready("ident"), ["msgpack"]),
+            ("response", Response.ok({"key": "value"}), ["msgpack"]),
+            ("cells", get_table(cells), ["json", "msgpack"])]
+
+
+def measure(name, obj, provider, number):
+    rows = obj if isinstance(obj, list) else [[obj]]
+    cls = type(rows[0][0])
+    encoder = get_encoder(cls, provider)
+    decoder = get_decoder(cls, provider)
+    data = serialize(provider, [[encoder(x, None) for x in row]
+                                for row in rows])
+
+    def walked():
+        return serialize(provider, [[
+            walk_content(restore_content(cls.__new__(cls), x))
+            for x in row] for row in deserialize(provider, data)])
+
+    def registered():
+        return serialize(provider, [[encoder(decoder(x), None)
+                                     for x in row]
+                                    for row in deserialize(provider, data)])
+
+    before = timeit.timeit(walked, number=number) / number
+    after = timeit.timeit(registered, number=number) / number
+    print "%-8s %-8s walked: %8.1fus registered: %8.1fus (x%.2f)" % (
+        name, provider, before * 1e6, after * 1e6, before / after)
+
+
+def main(args):
+    for name, obj, providers in get_messages(args.cells):
+        for provider in providers:
+            measure(name, obj, provider, args.number)
+
+
+if __name__ == '__main__':
+    main(parse_args())
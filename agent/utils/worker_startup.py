@@ -0,0 +1,90 @@
+#!/usr/bin/env python2
+"""
+Measures time between worker start and its ready signal
+for new interpreter (cold start) and for fork server.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import zmq
+
+try:
+    import comnsense_agent
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    import comnsense_agent
+
+from comnsense_agent.data import Signal
+from comnsense_agent.fork_server import ForkServer
+from comnsense_agent.message import Message
+from comnsense_agent.worker import WorkerProcess
+from comnsense_agent.worker import get_worker_command, get_worker_script
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--number", type=int, default=10,
+                        help="number of started workers for each method")
+    parser.add_argument("-t", "--timeout", type=int, default=30,
+                        help="seconds to wait for ready signal")
+    return parser.parse_args()
+
+
+def wait_ready(socket, timeout):
+    deadline = time.time() + timeout
+    while socket.poll(max(deadline - time.time(), 0) * 1000):
+        msg = Message(*socket.recv_multipart())
+        if msg.is_signal() and \
+                Signal.deserialize(msg.payload).code == Signal.Code.Ready:
+            return msg.ident
+    raise RuntimeError("worker is not ready in %d seconds" % timeout)
+
+
+def get_cold_spawn(script):
+    def spawn(ident, connection):
+        cmd, env = get_worker_command(script, ident, connection, "ERROR")
+        return WorkerProcess(
+            subprocess.Popen(cmd, close_fds=True, env=env), ident)
+    return spawn
+
+
+def measure(name, spawn, socket, connection, number, timeout):
+    timings = []
+    for index in range(number):
+        begin = time.time()
+        worker = spawn("%s-%d" % (name, index), connection)
+        wait_ready(socket, timeout)
+        timings.append(time.time() - begin)
+        socket.send_multipart(list(Message.signal(Signal.stop(),
+                                                  worker.ident)))
+        worker.join()
+    timings.sort()
+    print "%-6s min: %.3fs median: %.3fs max: %.3fs" % (
+        name, timings[0], timings[len(timings) / 2], timings[-1])
+
+
+def main(args):
+    ctx = zmq.Context.instance()
+    socket = ctx.socket(zmq.ROUTER)
+    port = socket.bind_to_random_port("tcp://127.0.0.1")
+    connection = "tcp://127.0.0.1:%d" % port
+
+    script = get_worker_script(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     "..", "bin"))
+    server = ForkServer(script, "ERROR")
+    try:
+        measure("cold", get_cold_spawn(script), socket, connection,
+                args.number, args.timeout)
+        measure("forked", server.spawn, socket, connection,
+                args.number, args.timeout)
+    finally:
+        server.close()
+        socket.close(0)
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -1,4 +1,5 @@
 ﻿using System;
+using System.Collections.Generic;
 using System.Linq;
 using System.Text;
 using System.Threading;
@@ -212,20 +213,24 @@ namespace comnsense
                     ZPollItem.Create((ZSocket sock, out ZMessage msg, out ZError err) =>
                     {
                         msg = sock.ReceiveMessage();
+                        var kind = FrameToUnicodeString(msg[0]);
                         var payload = FrameToUnicodeString(msg[1]);
+                        var settings = new JsonSerializerSettings {NullValueHandling = NullValueHandling.Ignore};
 
-                        Action action = null;
+                        var actions = new List<Action>();
                         try
                         {
-                            action = JsonConvert.DeserializeObject<Action>(
-                                payload,
-                                new JsonSerializerSettings {NullValueHandling = NullValueHandling.Ignore});
+                            // "actions" carries all actions of one event
+                            if (kind == "actions")
+                                actions = JsonConvert.DeserializeObject<List<Action>>(payload, settings);
+                            else
+                                actions.Add(JsonConvert.DeserializeObject<Action>(payload, settings));
                         }
                         catch
                         {
                             // ignore deserialization errors
                         }
-                        if (action != null)
+                        foreach (var action in actions.Where(x => x != null))
                         {
                             if (action.type == Action.ActionType.ComnsenseChange)
                                 ApplyChange(action);